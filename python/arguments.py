@@ -1,7 +1,20 @@
 class Argument:
-    def __init__(self, name, value):
-        self.name = name
-        self.value = value
+    __slots__ = ("name", "value")
+
+    def __init__(self, name, value):  # arguments can't be changed once made, instructions cache encodings of them
+        object.__setattr__(self, "name", name)
+        object.__setattr__(self, "value", value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("{} is immutable, make a new one instead".format(type(self).__name__))
+
+    def __delattr__(self, name):
+        raise AttributeError("{} is immutable, make a new one instead".format(type(self).__name__))
+
+    def __reduce__(self):  # pickling/copying has to go through __init__ too
+        if type(self) == Argument:
+            return Argument, (self.name, self.value)
+        return type(self), (self.value,)
 
     def __repr__(self):
         return str(self.value)
@@ -14,6 +27,8 @@ class Argument:
 
 ## TODO: add validation to the arguments
 class Raw(Argument):  # 4 nibble value (16 bits)
+    __slots__ = ()
+
     def __init__(self, value):
         super().__init__("Raw", value)
 
@@ -22,6 +37,8 @@ class Raw(Argument):  # 4 nibble value (16 bits)
 
 
 class Address(Argument):  # 3 nibble value (12 bits)
+    __slots__ = ()
+
     def __init__(self, value):
         super().__init__("Address", value)
 
@@ -30,6 +47,8 @@ class Address(Argument):  # 3 nibble value (12 bits)
 
 
 class Constant(Argument):  # 2 nibble value (1 byte or 8 bits)
+    __slots__ = ()
+
     def __init__(self, value):
         super().__init__("Constant", value)
 
@@ -38,6 +57,8 @@ class Constant(Argument):  # 2 nibble value (1 byte or 8 bits)
 
 
 class Nibble(Argument):  # 1 nibble value (4 bits, half a byte)
+    __slots__ = ()
+
     def __init__(self, value):
         super().__init__("Nibble", value)
 
@@ -46,6 +67,8 @@ class Nibble(Argument):  # 1 nibble value (4 bits, half a byte)
 
 
 class Register(Argument):
+    __slots__ = ()
+
     def __init__(self, value):
         super().__init__("Register", value)
 
@@ -53,6 +76,16 @@ class Register(Argument):
         return "v%#x" % self.value
 
 
+class Label(Argument):  # a name standing in for an address, until lib.assemble resolves it
+    __slots__ = ()
+
+    def __init__(self, value):
+        super().__init__("Label", value)
+
+    def __repr__(self):
+        return "@%s" % self.value
+
+
 class AsmParser:
     """
     Parses an argument of form tNNN, where t is a character representing the type and NNN is a integer, into an "argument" object
@@ -76,6 +109,8 @@ class AsmParser:
 
     @staticmethod
     def parse_argument(string):
+        if string[0] == "@":  # label names keep their case
+            return Label(string[1:])
         string = string.lower()
         if string[0] == "a":
             return Address(int(string[1:], base=16))
@@ -0,0 +1,76 @@
+"""
+Decodes a whole rom into a numpy structured array in one vectorized pass, with no per instruction python objects.
+Meant for analysis over large sets of roms, where stats/searches become array operations, e.g.
+
+    decoded = decode_rom(rom)
+    draws = decoded[decoded["kind"] == kind_code(DrawSprite)]
+    counts = np.bincount(decoded["kind"], minlength=len(MATCHERS))
+
+Needs numpy (pip install numpy), which the rest of the python tools don't.
+"""
+import numpy as np
+
+from lib import *
+
+DECODED_DTYPE = np.dtype(
+    [
+        ("address", np.uint32),  # where the op code sits in memory (past 0xFFF for concatenated dumps)
+        ("op_code", np.uint16),  # the op code, read big endian from the rom
+        ("family", np.uint8),  # first nibble, 0x0 - 0xF
+        ("x", np.uint8),  # second nibble, usually a register
+        ("y", np.uint8),  # third nibble, usually a register
+        ("n", np.uint8),  # last nibble
+        ("nn", np.uint8),  # last byte
+        ("nnn", np.uint16),  # last 3 nibbles, usually an address
+        ("kind", np.uint8),  # index of the matcher in MATCHERS that the op code decodes with
+    ]
+)
+
+_kind_table = None
+_kind_classes = None
+
+
+# every op code's kind comes straight from the decode table in lib, so the kinds always agree with MATCHERS
+def get_kind_table():
+    global _kind_table, _kind_classes
+    if _kind_table is None:
+        kinds = {id(matcher): kind for kind, matcher in enumerate(MATCHERS)}
+        table = get_op_code_table()
+        _kind_table = np.array([kinds[id(matcher)] for matcher in table], dtype=np.uint8)
+        # the instruction class for each kind, found by decoding the first op code of that kind
+        first_op_codes = [table.index(matcher) for matcher in MATCHERS]
+        _kind_classes = [type(decode_op_code(op_code)) for op_code in first_op_codes]
+    return _kind_table
+
+
+# the Instruction class each kind decodes to (the FallBackMatcher kind decodes to the Instruction base class)
+def get_kind_classes():
+    get_kind_table()
+    return _kind_classes
+
+
+# the kind for an Instruction class, e.g. kind_code(DrawSprite)
+def kind_code(instruction_class):
+    return get_kind_classes().index(instruction_class)
+
+
+# decodes the rom (bytes, bytearray, memoryview or mmap) into a DECODED_DTYPE array.
+# start/end are memory addresses (end exclusive), where the first byte of the rom is loaded at base, like lib.disassemble
+def decode_rom(rom, start=None, end=None, base=PROGRAM_START):
+    with memoryview(rom) as view:
+        first = 0 if start is None else min(max(start - base, 0), len(view))
+        last = len(view) if end is None else max(min(end - base, len(view)), first)
+        count = (last - first) // 2
+        op_codes = np.frombuffer(view, dtype=">u2", count=count, offset=first).astype(np.uint16)
+
+    decoded = np.empty(count, dtype=DECODED_DTYPE)
+    decoded["address"] = base + first + 2 * np.arange(count, dtype=np.uint32)
+    decoded["op_code"] = op_codes
+    decoded["family"] = op_codes >> 12
+    decoded["x"] = (op_codes >> 8) & 0xF
+    decoded["y"] = (op_codes >> 4) & 0xF
+    decoded["n"] = op_codes & 0xF
+    decoded["nn"] = op_codes & 0xFF
+    decoded["nnn"] = op_codes & 0xFFF
+    decoded["kind"] = get_kind_table()[op_codes]
+    return decoded
@@ -1,19 +1,47 @@
 #!/usr/bin/env python3
 
-# usage: python3 disassembler.py ./PATH/TO/ROM
+# usage: python3 assembler.py --file ./PATH/TO/ASM -new_asm --output ./PATH/TO/ROM
+# labels are defined with "name:" in front of a line (or on a line of their own) and used with "@name" in place of an
+# address, e.g. "loop: ADD v0x1 c0x1" ... "JMP @loop". With --output, the labels' addresses are written to a symbol map
+# next to the binary (./PATH/TO/ROM.sym)
+# macros are defined with ".macro name param ..." up to ".endm", use their params as \param and are used like an
+# instruction ("name arg ..."), and ".rept count" up to ".endr" repeats the lines in between
+#
+# as a pipe, reading asm from stdin and writing the binary to stdout (the listing goes to stderr):
+#        some_code_generator | python3 assembler.py --stream -q --output - > ./PATH/TO/ROM
+# --stream assembles each line as it's read and writes the binary out in chunks, so memory stays the same however long
+# the input is, but labels can only be used after they're defined
+#
+# while editing, --watch assembles the file again every time it's saved, only re-parsing the lines that changed and
+# patching the output binary in place:
+#        python3 assembler.py --file ./PATH/TO/ASM --output ./PATH/TO/ROM --watch
+#
+# -O runs the peephole optimizer (see optimizer.py) over the program before it's encoded, and prints what it saved
 
-from lib import *
+from incremental import *
+from optimizer import optimize
 import argparse
+import os
+import sys
+import time
+
+WATCH_INTERVAL = 0.1  # seconds between checks for a new save with --watch
 
 parser = argparse.ArgumentParser(description="disassemble chip8 binaries into asm")
-parser.add_argument("--file", type=str, help="[required] file path", required=True)
+parser.add_argument("--file", type=str, default="-", help="file path, - (the default) reads stdin")
 parser.add_argument("-old_asm", help="output the original asm", action="store_true")
 parser.add_argument("-new_asm", help="output the asm after parsing", action="store_true")
 parser.add_argument("-op", help="output the op codes after parsing", action="store_true")
-parser.add_argument("--output", type=str, help="filepath for the output parsed binary")
+parser.add_argument("--output", type=str, help="filepath for the output parsed binary, - writes it to stdout")
+parser.add_argument("--symbols", type=str, help="filepath for the symbol map, defaults to the output's with .sym")
+parser.add_argument("--stream", help="assemble line by line in constant memory, no forward labels", action="store_true")
+parser.add_argument("--watch", help="re-assemble the file whenever it changes, until interrupted", action="store_true")
+parser.add_argument("-O", "--optimize", help="run the peephole optimizer before encoding", action="store_true")
+parser.add_argument("-q", "--quiet", help="don't format or print anything, only write the binary", action="store_true")
 
 args = parser.parse_args()
 
+
 # formats the output for printing
 def format_output(instruction):
     if instruction is None:
@@ -28,23 +56,97 @@ def format_output(instruction):
     return out.strip()
 
 
+# passes the instructions through, printing them to out as they go by (in chunks, like write_lines)
+def listed(instructions, out):
+    lines = []
+    for instruction in instructions:
+        lines.append(format_output(instruction))
+        if len(lines) == OUTPUT_CHUNK_LINES:
+            write_lines(lines, out)
+            lines.clear()
+        yield instruction
+    write_lines(lines, out)
+
+
+def write_symbols(symbols):
+    if args.symbols or args.output not in (None, "-"):
+        with open(args.symbols or os.path.splitext(args.output)[0] + ".sym", "w") as out:
+            write_lines(symbol_lines(symbols), out)
+
+
+# re-assembles the file whenever its modification time changes, patching the output with what changed since the
+# last build (the whole rom when there's no output yet). Errors are printed, and the watching carries on
+def watch():
+    assembler = IncrementalAssembler()
+    modified = None
+    while True:
+        time.sleep(0 if modified is None else WATCH_INTERVAL)
+        try:
+            stat = os.stat(args.file)
+            if stat.st_mtime_ns == modified:
+                continue
+            modified = stat.st_mtime_ns
+            with open(args.file, "r") as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:  # editors that save by renaming leave a moment with no file
+            continue
+        start = time.perf_counter()
+        try:
+            patches = assembler.update(lines)
+        except UnknownAsmException as e:
+            print("error: {!r}".format(e), file=sys.stderr)
+            continue
+        if args.output and os.path.exists(args.output):
+            patch_file(args.output, patches, len(assembler.rom))
+        elif args.output:
+            with open(args.output, "wb") as out:
+                out.write(assembler.rom)
+        write_symbols(assembler.symbols)
+        print(
+            "assembled {} bytes, patched {} in {:.1f} ms".format(
+                len(assembler.rom), sum(len(data) for offset, data in patches), 1000 * (time.perf_counter() - start)
+            ),
+            file=sys.stderr,
+        )
+
+
 def main():
-    out = None
-    if args.output:
-        out = open(args.output, "wb")
-    with open(args.file, "r") as f:
-        line = "placeholder"
-        while line:
-            line = f.readline()
-            if len(line) > 0:  # skip empty or short lines
-                line = line.strip()
-                instruction = parse_asm(line)
-                print(format_output(instruction))
-                if out:
-                    out.write(instruction.op_code.to_bytes(2, byteorder="big"))
-        if out:
-            # out.write(b"\x00")
-            out.close()
+    if args.optimize and (args.stream or args.watch):
+        parser.error("--optimize needs the whole program, so it can't be used with --stream or --watch")
+    if args.watch:
+        if args.file == "-" or args.output == "-":
+            parser.error("--watch needs a --file and an --output that aren't -")
+        try:
+            watch()
+        except KeyboardInterrupt:
+            pass
+        return
+    source = sys.stdin if args.file == "-" else open(args.file, "r")
+    with source:
+        # lines in, instructions out of the assembler, op codes out of encode_chunks
+        if args.stream:
+            symbols = {}
+            instructions = assemble_lines(source, symbols=symbols)
+        else:
+            instructions, symbols = assemble(source)
+        if args.optimize:
+            instructions, report = optimize(instructions)
+            symbols = {name: report.relocate(address) for name, address in symbols.items()}
+            print("optimized: {}".format(report), file=sys.stderr)
+        if not args.quiet:
+            instructions = listed(instructions, sys.stderr if args.output == "-" else sys.stdout)
+        if args.output == "-":
+            for chunk in encode_chunks(instructions):
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+        elif args.output:
+            with open(args.output, "wb") as out:
+                for chunk in encode_chunks(instructions):
+                    out.write(chunk)
+        else:
+            for instruction in instructions:
+                pass
+    write_symbols(symbols)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,408 @@
+"""
+Runs many chip8 machines in lockstep, for fuzzing and regression runs over hundreds of instances at once.
+The state of every instance lives in numpy arrays, one row per instance (the fields are the same as emulator.Chip8),
+and each cycle decodes the op code at every instance's program counter, groups the instances by the kind of
+instruction they're on (see array_decoder) and carries out each group with vectorized operations.
+Only RNG goes through the instances one at a time, so every instance can have its own seeded random.Random like Chip8.
+
+Instances behave exactly like emulator.Chip8 (the python port of emulateCycle in src/chip8.c), except that an error
+stops only the instance that hit it: it's marked halted with the EmulatorException in errors, and the rest carry on.
+Memory is decoded fresh every cycle, so code that writes over itself needs no special handling.
+
+Needs numpy (pip install numpy), which the rest of the python tools don't.
+"""
+import random
+
+import numpy as np
+
+from array_decoder import get_kind_classes, get_kind_table
+from emulator import *
+
+GRAPHICS_SIZE = GRAPHICS_WIDTH * GRAPHICS_HEIGHT
+
+
+class Chip8Batch:
+    """
+    count chip8 machines. Instance i's RNG is seeded with seed + i (or unseeded), the same as Chip8(seed=seed + i).
+    program_counter, index_counter, stack_pointer, delay_timer, sound_timer, draw_flag, dirty_rows, cycles and halted
+    have one entry per instance, reg/stack/key/memory one row per instance, and graphics is count x 32 rows x 64 pixels.
+    """
+
+    # the method that carries out each Instruction class for a group of instances
+    HANDLERS = {
+        ClearScreen: "_clear_screen",
+        ReturnFromFunction: "_return_from_function",
+        CallNativeCode: "_call_native_code",
+        JumpToAddress: "_jump_to_address",
+        CallFunction: "_call_function",
+        SkipNextInstructionIfEqualsConst: "_skip_if_equals_const",
+        SkipNextInstructionIfNotEqualsConst: "_skip_if_not_equals_const",
+        SkipNextInstructionIfRegistersEqual: "_skip_if_registers_equal",
+        LoadConstantIntoRegister: "_load_constant",
+        AddConstantToRegister: "_add_constant",
+        LoadRegisterIntoRegister: "_load_register",
+        OrRegisters: "_or_registers",
+        AndRegisters: "_and_registers",
+        XorRegisters: "_xor_registers",
+        AddRegisters: "_add_registers",
+        SubtractRegisters: "_subtract_registers",
+        ShiftRightRegister: "_shift_right",
+        ReverseSubtractRegisters: "_reverse_subtract_registers",
+        ShiftLeftRegister: "_shift_left",
+        SkipNextInstructionIfRegistersNotEquals: "_skip_if_registers_not_equal",
+        SetAddressRegister: "_set_index",
+        JumpToAddressPlusV0: "_jump_to_address_plus_v0",
+        GenerateRandomNumberWithMask: "_random",
+        DrawSprite: "_draw_sprite",
+        SkipIfKeyPressed: "_skip_if_key_pressed",
+        SkipIfKeyNotPressed: "_skip_if_key_not_pressed",
+        LoadDelayTimerIntoRegister: "_load_delay_timer",
+        WaitForKeyPressLoadIntoRegister: "_wait_for_key",
+        SetDelayTimer: "_set_delay_timer",
+        SetSoundTimer: "_set_sound_timer",
+        AddRegisterToAddressRegister: "_add_to_index",
+        SetAddressRegisterToSpriteInRegister: "_set_index_to_sprite",
+        BCDDecodeRegister: "_bcd",
+        StoreRegisters: "_store_registers",
+        ReadRegisters: "_read_registers",
+        Instruction: "_unknown",  # whatever the FallBackMatcher decoded
+    }
+
+    def __init__(self, count, seed=None, cycles_per_tick=1):
+        self.count = count
+        self.cycles_per_tick = cycles_per_tick  # like Chip8.cycles_per_tick
+        self.program_counter = np.full(count, PROGRAM_START, dtype=np.int64)
+        self.index_counter = np.zeros(count, dtype=np.int64)
+        self.stack_pointer = np.zeros(count, dtype=np.int64)
+
+        self.memory = np.zeros((count, MAX_MEMORY), dtype=np.uint8)
+        self.reg = np.zeros((count, REGISTERS), dtype=np.uint8)
+        self.stack = np.zeros((count, STACK_SIZE), dtype=np.int64)
+
+        self.delay_timer = np.zeros(count, dtype=np.int64)
+        self.sound_timer = np.zeros(count, dtype=np.int64)
+
+        self.graphics = np.zeros((count, GRAPHICS_HEIGHT, GRAPHICS_WIDTH), dtype=np.uint8)
+        self.key = np.zeros((count, KEYS), dtype=np.uint8)
+        self.draw_flag = np.zeros(count, dtype=bool)
+        self.dirty_rows = np.zeros(count, dtype=np.uint32)  # like Chip8.dirty_rows
+
+        self.cycles = np.zeros(count, dtype=np.int64)  # instructions executed so far by each instance
+        self.halted = np.zeros(count, dtype=bool)  # instances stopped by an error
+        self.errors = {}  # instance -> the EmulatorException that halted it
+        self._running = None  # the instances that aren't halted, worked out again after an instance halts
+        self.random = [random.Random(None if seed is None else seed + i) for i in range(count)]
+
+        self.memory[:, FONT_OFFSET : FONT_OFFSET + len(FONT_SET)] = np.frombuffer(FONT_SET, dtype=np.uint8)
+
+        kind_classes = get_kind_classes()
+        self._kind_table = get_kind_table()
+        self._handlers = [getattr(self, self.HANDLERS[kind_class]) for kind_class in kind_classes]
+
+    # loads the rom into the given instances (all of them by default)
+    def load_rom(self, rom, instances=slice(None)):
+        if len(rom) >= MAX_MEMORY - 1 - PROGRAM_START:
+            raise EmulatorException("ROM too large to fit in memory", size=len(rom))
+        self.memory[instances, PROGRAM_START : PROGRAM_START + len(rom)] = np.frombuffer(rom, dtype=np.uint8)
+
+    # writes op codes (ints) starting at the program counter of each of the given instances, like Chip8
+    def load_instructions(self, op_codes, instances=slice(None)):
+        data = np.frombuffer(b"".join(op_code.to_bytes(2, "big") for op_code in op_codes), dtype=np.uint8)
+        for i in np.arange(self.count)[instances].tolist():
+            start = int(self.program_counter[i])
+            self.memory[i, start : start + len(data)] = data
+
+    # copies instance i into a Chip8, e.g. to check it against one run on its own
+    def machine(self, i):
+        machine = Chip8(translate=False, cycles_per_tick=self.cycles_per_tick)
+        machine.program_counter = int(self.program_counter[i])
+        machine.index_counter = int(self.index_counter[i])
+        machine.stack_pointer = int(self.stack_pointer[i])
+        machine.memory[:] = self.memory[i].tobytes()
+        machine.reg[:] = self.reg[i].tobytes()
+        machine.stack = [int(address) for address in self.stack[i]]
+        machine.delay_timer = int(self.delay_timer[i])
+        machine.sound_timer = int(self.sound_timer[i])
+        machine.graphics = self.graphics[i].tobytes()
+        machine.dirty_rows = int(self.dirty_rows[i])
+        machine.key[:] = self.key[i].tobytes()
+        machine.draw_flag = bool(self.draw_flag[i])
+        machine.cycles = int(self.cycles[i])
+        machine.random.setstate(self.random[i].getstate())
+        return machine
+
+    # executes one instruction on every instance that isn't halted, without touching the timers.
+    # returns the instances that ran it (a slice when that's all of them, which indexes faster)
+    def step(self):
+        instances = self._running
+        if instances is None:
+            instances = self._running = np.flatnonzero(~self.halted)
+        if not len(instances):
+            return instances
+        address = self.program_counter[instances] & ADDRESS_MASK
+        op_codes = self.memory[instances, address].astype(np.int64) << 8
+        op_codes |= self.memory[instances, (address + 1) & ADDRESS_MASK]
+
+        kinds = self._kind_table[op_codes]
+        if (kinds == kinds[0]).all():  # every instance is on the same kind of instruction, the usual case
+            self._handlers[kinds[0]](instances, op_codes)
+        else:
+            order = np.argsort(kinds, kind="stable")
+            kinds = kinds[order]
+            starts = [0] + (np.flatnonzero(kinds[1:] != kinds[:-1]) + 1).tolist()
+            ends = starts[1:] + [len(kinds)]
+            for start, end in zip(starts, ends):
+                group = order[start:end]
+                self._handlers[kinds[start]](instances[group], op_codes[group])
+
+        if self._running is None:  # some instances halted on this instruction
+            instances = instances[~self.halted[instances]]
+        ran = slice(None) if len(instances) == self.count else instances
+        self.cycles[ran] += 1
+        return ran
+
+    # counts down the timers of the given instances (all of them by default)
+    def update_timers(self, instances=slice(None)):
+        for timer in (self.delay_timer, self.sound_timer):
+            timer[instances] = np.maximum(timer[instances] - 1, 0)
+
+    # one instruction followed by a timer update on every instance that didn't halt and ended a tick, like
+    # Chip8.emulate_cycle
+    def emulate_cycle(self):
+        ran = self.step()
+        if self.cycles_per_tick == 1:
+            self.update_timers(ran)
+        elif isinstance(ran, slice):
+            self.update_timers(np.flatnonzero(self.cycles % self.cycles_per_tick == 0))
+        else:
+            self.update_timers(ran[self.cycles[ran] % self.cycles_per_tick == 0])
+
+    # emulates the given number of cycles (fewer if every instance halts), returns how many were run
+    def run(self, cycles):
+        for cycle in range(cycles):
+            if self.halted.all():
+                return cycle
+            self.emulate_cycle()
+        return cycles
+
+    # stops the instances with the same error Chip8 would raise, op_codes are given for the unknown op code errors
+    def _halt(self, instances, message, op_codes=None):
+        for n, i in enumerate(instances.tolist()):
+            details = {} if op_codes is None else {"op_code": int(op_codes[n])}
+            self.errors[i] = EmulatorException(message, **details, program_counter=int(self.program_counter[i]))
+        self.halted[instances] = True
+        self._running = None
+
+    def _clear_screen(self, instances, op_codes):
+        self.graphics[instances] = 0
+        self.dirty_rows[instances] = ALL_ROWS
+        self.draw_flag[instances] = True
+        self.program_counter[instances] += 2
+
+    def _return_from_function(self, instances, op_codes):
+        empty = self.stack_pointer[instances] == 0
+        self._halt(instances[empty], "returned while stack is empty")
+        instances = instances[~empty]
+        self.stack_pointer[instances] -= 1
+        self.program_counter[instances] = self.stack[instances, self.stack_pointer[instances]] + 2
+
+    def _call_native_code(self, instances, op_codes):
+        self._halt(instances, "Unknown opcode", op_codes & 0xFFF)
+
+    def _jump_to_address(self, instances, op_codes):
+        self.program_counter[instances] = op_codes & 0xFFF
+
+    def _call_function(self, instances, op_codes):
+        full = self.stack_pointer[instances] >= STACK_SIZE
+        self._halt(instances[full], "ran out of stack")
+        instances, op_codes = instances[~full], op_codes[~full]
+        self.stack[instances, self.stack_pointer[instances]] = self.program_counter[instances]
+        self.stack_pointer[instances] += 1
+        self.program_counter[instances] = op_codes & 0xFFF
+
+    def _skip(self, instances, skip):
+        self.program_counter[instances] += np.where(skip, 4, 2)
+
+    def _skip_if_equals_const(self, instances, op_codes):
+        self._skip(instances, self.reg[instances, (op_codes >> 8) & 0xF] == op_codes & 0xFF)
+
+    def _skip_if_not_equals_const(self, instances, op_codes):
+        self._skip(instances, self.reg[instances, (op_codes >> 8) & 0xF] != op_codes & 0xFF)
+
+    def _skip_if_registers_equal(self, instances, op_codes):
+        x, y = (op_codes >> 8) & 0xF, (op_codes >> 4) & 0xF
+        self._skip(instances, self.reg[instances, x] == self.reg[instances, y])
+
+    def _load_constant(self, instances, op_codes):
+        self.reg[instances, (op_codes >> 8) & 0xF] = op_codes & 0xFF
+        self.program_counter[instances] += 2
+
+    def _add_constant(self, instances, op_codes):
+        x = (op_codes >> 8) & 0xF
+        self.reg[instances, x] = (self.reg[instances, x] + (op_codes & 0xFF)) & 0xFF
+        self.program_counter[instances] += 2
+
+    def _load_register(self, instances, op_codes):
+        self.reg[instances, (op_codes >> 8) & 0xF] = self.reg[instances, (op_codes >> 4) & 0xF]
+        self.program_counter[instances] += 2
+
+    def _or_registers(self, instances, op_codes):
+        x, y = (op_codes >> 8) & 0xF, (op_codes >> 4) & 0xF
+        self.reg[instances, x] |= self.reg[instances, y]
+        self.program_counter[instances] += 2
+
+    def _and_registers(self, instances, op_codes):
+        x, y = (op_codes >> 8) & 0xF, (op_codes >> 4) & 0xF
+        self.reg[instances, x] &= self.reg[instances, y]
+        self.program_counter[instances] += 2
+
+    def _xor_registers(self, instances, op_codes):
+        x, y = (op_codes >> 8) & 0xF, (op_codes >> 4) & 0xF
+        self.reg[instances, x] ^= self.reg[instances, y]
+        self.program_counter[instances] += 2
+
+    # like Chip8, the flag is written before the result, and the result is worked out from the registers after the flag
+    # was written (except for ADD, which adds before either is written). This matters when x or y is VF
+    def _add_registers(self, instances, op_codes):
+        x, y = (op_codes >> 8) & 0xF, (op_codes >> 4) & 0xF
+        total = self.reg[instances, x].astype(np.int64) + self.reg[instances, y]
+        self.reg[instances, 0xF] = total > 0xFF
+        self.reg[instances, x] = total & 0xFF
+        self.program_counter[instances] += 2
+
+    def _subtract_registers(self, instances, op_codes):
+        x, y = (op_codes >> 8) & 0xF, (op_codes >> 4) & 0xF
+        self.reg[instances, 0xF] = self.reg[instances, y] <= self.reg[instances, x]
+        self.reg[instances, x] = (self.reg[instances, x].astype(np.int64) - self.reg[instances, y]) & 0xFF
+        self.program_counter[instances] += 2
+
+    def _shift_right(self, instances, op_codes):
+        x = (op_codes >> 8) & 0xF
+        self.reg[instances, 0xF] = self.reg[instances, x] & 0x1
+        self.reg[instances, x] = self.reg[instances, x] >> 1
+        self.program_counter[instances] += 2
+
+    def _reverse_subtract_registers(self, instances, op_codes):
+        x, y = (op_codes >> 8) & 0xF, (op_codes >> 4) & 0xF
+        self.reg[instances, 0xF] = self.reg[instances, x] <= self.reg[instances, y]
+        self.reg[instances, x] = (self.reg[instances, y].astype(np.int64) - self.reg[instances, x]) & 0xFF
+        self.program_counter[instances] += 2
+
+    def _shift_left(self, instances, op_codes):
+        x = (op_codes >> 8) & 0xF
+        self.reg[instances, 0xF] = self.reg[instances, x] >> 7
+        self.reg[instances, x] = (self.reg[instances, x].astype(np.int64) << 1) & 0xFF
+        self.program_counter[instances] += 2
+
+    def _skip_if_registers_not_equal(self, instances, op_codes):
+        x, y = (op_codes >> 8) & 0xF, (op_codes >> 4) & 0xF
+        self._skip(instances, self.reg[instances, x] != self.reg[instances, y])
+
+    def _set_index(self, instances, op_codes):
+        self.index_counter[instances] = op_codes & 0xFFF
+        self.program_counter[instances] += 2
+
+    def _jump_to_address_plus_v0(self, instances, op_codes):
+        self.program_counter[instances] = (op_codes & 0xFFF) + self.reg[instances, 0]
+
+    # the slow path: every instance draws from its own random.Random, in the same order as Chip8 would
+    def _random(self, instances, op_codes):
+        for i, op_code in zip(instances.tolist(), op_codes.tolist()):
+            self.reg[i, (op_code >> 8) & 0xF] = self.random[i].getrandbits(8) & op_code & 0xFF
+        self.program_counter[instances] += 2
+
+    # every instance's sprite is drawn at once: a rows x 8 grid of sprite bits and the screen pixels they wrap to.
+    # the pixels in one instance's grid never repeat (15 rows and 8 columns fit in the screen), so they can all be read
+    # and xor-ed at once through their index in the flattened graphics
+    def _draw_sprite(self, instances, op_codes):
+        x = self.reg[instances, (op_codes >> 8) & 0xF].astype(np.int64)
+        y = self.reg[instances, (op_codes >> 4) & 0xF].astype(np.int64)
+        height = op_codes & 0xF
+        rows = np.arange(height.max())
+        sprite = self.memory[instances[:, None], (self.index_counter[instances, None] + rows) & ADDRESS_MASK]
+        sprite[rows >= height[:, None]] = 0
+        bits = np.unpackbits(sprite, axis=1).reshape(len(instances), len(rows), 8)
+
+        screen_rows = (y[:, None] + rows) % GRAPHICS_HEIGHT
+        dirty = np.where(sprite != 0, 1 << screen_rows, 0)
+        self.dirty_rows[instances] |= np.bitwise_or.reduce(dirty, axis=1).astype(np.uint32)
+        screen_y = screen_rows * GRAPHICS_WIDTH + instances[:, None] * GRAPHICS_SIZE
+        screen_x = (x[:, None] + np.arange(8)) % GRAPHICS_WIDTH
+        pixels = (screen_y[:, :, None] + screen_x[:, None, :]).reshape(-1)
+        screen = self.graphics.reshape(-1)
+        drawn = bits.reshape(-1)
+        before = screen[pixels]
+        self.reg[instances, 0xF] = (before & drawn).reshape(len(instances), -1).any(axis=1)
+        screen[pixels] = before ^ drawn
+        self.draw_flag[instances] = True
+        self.program_counter[instances] += 2
+
+    def _skip_if_key_pressed(self, instances, op_codes):
+        self._skip(instances, self.key[instances, self.reg[instances, (op_codes >> 8) & 0xF] & 0xF] != 0)
+
+    def _skip_if_key_not_pressed(self, instances, op_codes):
+        self._skip(instances, self.key[instances, self.reg[instances, (op_codes >> 8) & 0xF] & 0xF] == 0)
+
+    def _load_delay_timer(self, instances, op_codes):
+        self.reg[instances, (op_codes >> 8) & 0xF] = self.delay_timer[instances] & 0xFF
+        self.program_counter[instances] += 2
+
+    # instances with no key down stay on this instruction, the others load the highest pressed key
+    def _wait_for_key(self, instances, op_codes):
+        keys = self.key[instances] != 0
+        pressed = keys.any(axis=1)
+        highest = KEYS - 1 - np.argmax(keys[:, ::-1], axis=1)
+        instances, op_codes, highest = instances[pressed], op_codes[pressed], highest[pressed]
+        self.reg[instances, (op_codes >> 8) & 0xF] = highest
+        self.program_counter[instances] += 2
+
+    def _set_delay_timer(self, instances, op_codes):
+        self.delay_timer[instances] = self.reg[instances, (op_codes >> 8) & 0xF]
+        self.program_counter[instances] += 2
+
+    def _set_sound_timer(self, instances, op_codes):
+        self.sound_timer[instances] = self.reg[instances, (op_codes >> 8) & 0xF]
+        self.program_counter[instances] += 2
+
+    def _add_to_index(self, instances, op_codes):
+        x = (op_codes >> 8) & 0xF
+        self.reg[instances, 0xF] = self.index_counter[instances] + self.reg[instances, x] > 0x0FFF
+        self.index_counter[instances] = (self.index_counter[instances] + self.reg[instances, x]) & 0xFFFF
+        self.program_counter[instances] += 2
+
+    def _set_index_to_sprite(self, instances, op_codes):
+        self.index_counter[instances] = self.reg[instances, (op_codes >> 8) & 0xF].astype(np.int64) * 0x5
+        self.program_counter[instances] += 2
+
+    def _bcd(self, instances, op_codes):
+        value = self.reg[instances, (op_codes >> 8) & 0xF]
+        digits = np.stack([value // 100, (value // 10) % 10, value % 10], axis=1)
+        self.memory[instances[:, None], (self.index_counter[instances, None] + np.arange(3)) & ADDRESS_MASK] = digits
+        self.program_counter[instances] += 2
+
+    # registers 0 to x, done one register at a time across every instance that's storing/reading that many
+    def _store_registers(self, instances, op_codes):
+        x = (op_codes >> 8) & 0xF
+        for i in range(REGISTERS):
+            storing = instances[x >= i]
+            if not len(storing):
+                break
+            self.memory[storing, (self.index_counter[storing] + i) & ADDRESS_MASK] = self.reg[storing, i]
+        self.index_counter[instances] += x + 1
+        self.program_counter[instances] += 2
+
+    def _read_registers(self, instances, op_codes):
+        x = (op_codes >> 8) & 0xF
+        for i in range(REGISTERS):
+            reading = instances[x >= i]
+            if not len(reading):
+                break
+            self.reg[reading, i] = self.memory[reading, (self.index_counter[reading] + i) & ADDRESS_MASK]
+        self.index_counter[instances] += x + 1
+        self.program_counter[instances] += 2
+
+    # like Chip8, unknown 0xF... op codes are skipped and any other unknown op code is an error
+    def _unknown(self, instances, op_codes):
+        family_f = (op_codes & 0xF000) == 0xF000
+        self._halt(instances[~family_f], "Unknown opcode", op_codes[~family_f])
+        self.program_counter[instances[family_f]] += 2
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+
+"""
+Benchmarks for the assembler/disassembler/Instruction-class DSL and the emulator, run against the roms in ./roms
+Each benchmark reports ops/sec and peak memory. Results can be saved as json and compared against a saved baseline,
+which fails (exit code 1) when a benchmark got slower or used more memory than the threshold allows.
+
+usage: python3 python/benchmark.py --save baseline.json
+       python3 python/benchmark.py --baseline baseline.json --threshold 0.1
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from functools import partial
+
+from lib import *
+import emulator
+
+try:
+    import batch_emulator
+except ImportError:  # numpy isn't installed, the batch benchmark is skipped
+    batch_emulator = None
+
+ROM_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "roms")
+EMULATE_CYCLES = 20000  # per rom, for the emulator benchmark
+BATCH_INSTANCES = 256  # per rom, for the batch emulator benchmark
+BATCH_CYCLES = 200
+# roms that also get benchmarked on their own, translated and interpreted, for ROM_CYCLES each
+TRANSLATED_ROMS = ["BLINKY", "INVADERS"]
+ROM_CYCLES = 100000
+
+
+# returns (name, contents) for every rom in the directory, sorted by name so runs are comparable
+def load_roms(rom_dir):
+    roms = []
+    for name in sorted(os.listdir(rom_dir)):
+        path = os.path.join(rom_dir, name)
+        if os.path.isfile(path):
+            with open(path, "rb") as f:
+                roms.append((name, f.read()))
+    return roms
+
+
+# builds the inputs the benchmarks share, so none of this is part of what gets timed
+def prepare(roms):
+    listings = [[instruction.asm for instruction in disassemble(rom)] for name, rom in roms]
+    return {
+        "roms": [rom for name, rom in roms],
+        "roms_by_name": dict(roms),
+        "op_codes": [rom[i : i + 2] for name, rom in roms for i in range(0, len(rom) - 1, 2)],
+        "listings": listings,
+        "lines": [line for listing in listings for line in listing],
+    }
+
+
+# each benchmark does one pass over its input and returns how many operations that was
+def bench_parse_op_code(inputs):
+    for op_code in inputs["op_codes"]:
+        parse_op_code(op_code)
+    return len(inputs["op_codes"])
+
+
+def bench_parse_asm(inputs):
+    for line in inputs["lines"]:
+        parse_asm(line)
+    return len(inputs["lines"])
+
+
+def bench_disassemble_roms(inputs):
+    count = 0
+    for rom in inputs["roms"]:
+        count += len(list(disassemble(rom)))
+    return count
+
+
+def bench_assemble_listings(inputs):
+    count = 0
+    for listing in inputs["listings"]:
+        encode(parse_asm(line) for line in listing)
+        count += len(listing)
+    return count
+
+
+# runs every rom headless on a fresh machine for a fixed number of cycles, ops are the instructions executed.
+# a rom that hits an error only counts the instructions it got through
+def bench_emulate_roms(inputs, translate=True):
+    count = 0
+    for rom in inputs["roms"]:
+        machine = emulator.Chip8(seed=0, translate=translate)
+        machine.load_rom(rom)
+        try:
+            machine.run(EMULATE_CYCLES)
+        except emulator.EmulatorException:
+            pass
+        count += machine.cycles
+    return count
+
+
+def bench_interpret_roms(inputs):
+    return bench_emulate_roms(inputs, translate=False)
+
+
+# one rom for ROM_CYCLES, which is long enough for the translated blocks to be reused far more than translated. With one
+# tick per cycle (best of 5, 0.2s each) the translated blocks ran:
+#   BLINKY      ~5.0M ops/sec, interpreted ~1.4M (3.5x)
+#   INVADERS    ~2.4M ops/sec, interpreted ~1.0M (2.4x), most of it in DRAW
+def bench_emulate_rom(inputs, name, translate=True):
+    if name not in inputs["roms_by_name"]:
+        return 0
+    machine = emulator.Chip8(seed=0, translate=translate)
+    machine.load_rom(inputs["roms_by_name"][name])
+    try:
+        machine.run(ROM_CYCLES)
+    except emulator.EmulatorException:
+        pass
+    return machine.cycles
+
+
+# the same, with BATCH_INSTANCES differently seeded copies of each rom run in lockstep
+def bench_emulate_batch(inputs):
+    count = 0
+    for rom in inputs["roms"]:
+        batch = batch_emulator.Chip8Batch(BATCH_INSTANCES, seed=0)
+        batch.load_rom(rom)
+        batch.run(BATCH_CYCLES)
+        count += int(batch.cycles.sum())
+    return count
+
+
+BENCHMARKS = {
+    "parse_op_code": bench_parse_op_code,
+    "parse_asm": bench_parse_asm,
+    "disassemble_roms": bench_disassemble_roms,
+    "assemble_listings": bench_assemble_listings,
+    "emulate_roms": bench_emulate_roms,
+    "interpret_roms": bench_interpret_roms,
+}
+for name in TRANSLATED_ROMS:
+    BENCHMARKS["emulate_" + name.lower()] = partial(bench_emulate_rom, name=name)
+    BENCHMARKS["interpret_" + name.lower()] = partial(bench_emulate_rom, name=name, translate=False)
+if batch_emulator is not None:
+    BENCHMARKS["emulate_batch"] = bench_emulate_batch
+
+
+# times the benchmark (best of repeat runs, each run lasting at least min_time), then runs it once more under
+# tracemalloc for the peak memory, as tracing slows everything down too much to time at the same time
+def run_benchmark(benchmark, inputs, repeat, min_time):
+    best = None
+    for _ in range(repeat):
+        ops = 0
+        start = time.perf_counter()
+        while True:
+            ops += benchmark(inputs)
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        ops_per_sec = ops / elapsed
+        if best is None or ops_per_sec > best:
+            best = ops_per_sec
+
+    tracemalloc.start()
+    try:
+        benchmark(inputs)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"ops_per_sec": best, "peak_bytes": peak}
+
+
+class DictArgument:
+    """
+    An Argument laid out like before the classes had __slots__, with its attributes in a per instance __dict__.
+    """
+
+    def __init__(self, argument):
+        self.name = argument.name
+        self.value = argument.value
+
+
+class DictInstruction:
+    """
+    An Instruction laid out like before the classes had __slots__: the args in a list plus each of them again as a named
+    attribute (self.address etc.), all in a per instance __dict__.
+    """
+
+    def __init__(self, instruction):
+        self.args = [DictArgument(arg) for arg in instruction.args]
+        self._op_code = instruction._op_code
+        self._asm = instruction._asm
+        for index, arg in enumerate(self.args):
+            setattr(self, "arg%d" % index, arg)
+
+
+# returns (what make returned, the bytes it allocated that are still held)
+def held_bytes(make):
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        made = make()
+        used = tracemalloc.get_traced_memory()[0] - start
+    finally:
+        tracemalloc.stop()
+    return made, used
+
+
+# disassembles every rom into one list that's kept alive, and reports how much memory each held instruction costs
+# (the instruction, its args and its slot in the list). The same instructions as DictInstructions are the baseline
+# the __slots__ classes are compared against
+def memory_per_instruction(roms):
+    get_op_code_table()  # built up front so the table isn't counted against the instructions
+    instructions, used = held_bytes(lambda: [instruction for name, rom in roms for instruction in disassemble(rom)])
+    dict_instructions, dict_used = held_bytes(lambda: [DictInstruction(instruction) for instruction in instructions])
+    return {
+        "instructions": len(instructions),
+        "bytes": used,
+        "bytes_per_instruction": used / len(instructions),
+        "dict_bytes_per_instruction": dict_used / len(dict_instructions),
+    }
+
+
+# returns a description of every benchmark that regressed past the threshold compared to the baseline
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, result in results["benchmarks"].items():
+        if name not in baseline["benchmarks"]:
+            continue
+        base = baseline["benchmarks"][name]
+        if result["ops_per_sec"] < base["ops_per_sec"] * (1 - threshold):
+            regressions.append(
+                "{}: {:.0f} ops/sec, baseline {:.0f} ops/sec".format(name, result["ops_per_sec"], base["ops_per_sec"])
+            )
+        if result["peak_bytes"] > base["peak_bytes"] * (1 + threshold):
+            regressions.append(
+                "{}: {} peak bytes, baseline {} peak bytes".format(name, result["peak_bytes"], base["peak_bytes"])
+            )
+    memory, base_memory = results["memory"], baseline.get("memory")
+    if base_memory and memory["bytes_per_instruction"] > base_memory["bytes_per_instruction"] * (1 + threshold):
+        regressions.append(
+            "memory: {:.1f} bytes/instruction, baseline {:.1f} bytes/instruction".format(
+                memory["bytes_per_instruction"], base_memory["bytes_per_instruction"]
+            )
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmark the chip8 assembler/disassembler")
+    parser.add_argument("--roms", type=str, default=ROM_DIR, help="directory of roms to benchmark against")
+    parser.add_argument("--only", type=str, nargs="+", choices=list(BENCHMARKS), help="benchmarks to run")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per benchmark, the best one is reported")
+    parser.add_argument("--min_time", type=float, default=0.2, help="minimum seconds per timed run")
+    parser.add_argument("--save", type=str, help="write the results as json to this path")
+    parser.add_argument("--baseline", type=str, help="json results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed regression vs the baseline (0.1 = 10%%)")
+    args = parser.parse_args()
+
+    roms = load_roms(args.roms)
+    get_op_code_table()  # one off setup cost, not part of any benchmark
+    inputs = prepare(roms)
+
+    results = {"python": platform.python_version(), "roms": len(roms), "benchmarks": {}}
+    for name in args.only or BENCHMARKS:
+        result = run_benchmark(BENCHMARKS[name], inputs, args.repeat, args.min_time)
+        results["benchmarks"][name] = result
+        print("{:<20}{:>14.0f} ops/sec{:>14} peak bytes".format(name, result["ops_per_sec"], result["peak_bytes"]))
+
+    results["memory"] = memory_per_instruction(roms)
+    memory = results["memory"]
+    print(
+        "memory:\t{} instructions from {} roms\t{:.1f} bytes/instruction ({:.1f} with a __dict__ per instance)".format(
+            memory["instructions"], len(roms), memory["bytes_per_instruction"], memory["dict_bytes_per_instruction"]
+        )
+    )
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for regression in regressions:
+            print("REGRESSION:\t" + regression)
+        if regressions:
+            sys.exit(1)
+        print("no regressions against {}".format(args.baseline))
+
+
+if __name__ == "__main__":
+    main()
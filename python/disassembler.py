@@ -1,20 +1,36 @@
 #!/usr/bin/env python3
 
 # usage: python3 disassembler.py --file ./PATH/TO/ROM -asm
+#        python3 disassembler.py --batch ./roms --output_dir ./bin/asm --index ./bin/asm/index.tsv -asm
 
 from lib import *
 import argparse
+import glob
+import hashlib
+import multiprocessing
+import os
+import sys
 
 parser = argparse.ArgumentParser(description="disassemble chip8 binaries into asm")
-parser.add_argument("--file", type=str, help="[required] file path", required=True)
+source = parser.add_mutually_exclusive_group(required=True)
+source.add_argument("--file", type=str, help="file path (this or --batch is required)")
+source.add_argument("--batch", type=str, help="directory or glob of roms, each disassembled into --output_dir")
+parser.add_argument("--output_dir", type=str, help="[required with --batch] directory for the per rom listings")
+parser.add_argument("--index", type=str, help="with --batch, write a merged index of every rom/listing to this path")
+parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="with --batch, number of worker processes")
 parser.add_argument("-old_op", help="output the original op code", action="store_true")
 parser.add_argument("-new_op", help="output the op code after parsing", action="store_true")
 parser.add_argument("-asm", help="output the parsed asm instruction", action="store_true")
 parser.add_argument(
     "-validate_op", help="checks that the outputted op codes are the same as the input", action="store_true"
 )
+parser.add_argument("--start", type=lambda s: int(s, 0), help="first address to disassemble (rom is loaded at 0x200)")
+parser.add_argument("--end", type=lambda s: int(s, 0), help="address to stop disassembling at (exclusive)")
+parser.add_argument("-q", "--quiet", help="don't format or print anything (e.g. with -validate_op)", action="store_true")
 
 args = parser.parse_args()
+if args.workers < 1:
+    parser.error("--workers has to be at least 1")
 
 # formats the output for printing
 def format_output(instruction):
@@ -30,20 +46,75 @@ def format_output(instruction):
     return out.strip()
 
 
+# passes the instructions through, checking that each one encodes back to the op code it was decoded from
+def validate(instructions):
+    for instruction in instructions:
+        assert (
+            int.from_bytes(instruction._op_code, byteorder="big") == instruction.op_code
+        ), "parsed op code is not the same: {}\t{}".format(
+            int.from_bytes(instruction._op_code, byteorder="big"), instruction.op_code
+        )
+        yield instruction
+
+
+# returns the rom paths for a --batch argument, sorted so the output order doesn't depend on the file system
+def find_roms(pattern):
+    if os.path.isdir(pattern):
+        paths = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+    else:
+        paths = glob.glob(pattern, recursive=True)
+    return sorted(path for path in paths if os.path.isfile(path))
+
+
+# runs in the worker processes: writes the listing for one rom, and returns its line for the index
+def disassemble_to_listing(job):
+    rom_path, listing_path = job
+    with open(rom_path, "rb") as f:
+        rom = f.read()
+    instructions = disassemble(rom)
+    if args.validate_op:
+        instructions = validate(instructions)
+    os.makedirs(os.path.dirname(listing_path) or ".", exist_ok=True)
+    with open(listing_path, "w") as out:
+        write_lines((format_output(instruction) for instruction in instructions), out)
+    return "{}\t{}\t{}\t{}".format(rom_path, listing_path, len(rom) // 2, hashlib.sha1(rom).hexdigest())
+
+
+def main_batch():
+    if not args.output_dir:
+        parser.error("--batch requires --output_dir")
+    rom_paths = find_roms(args.batch)
+    if not rom_paths:
+        parser.error("no roms found for {}".format(args.batch))
+    root = os.path.dirname(rom_paths[0]) if len(rom_paths) == 1 else os.path.commonpath(rom_paths)
+    jobs = [(path, os.path.join(args.output_dir, os.path.relpath(path, root) + ".asm")) for path in rom_paths]
+
+    # forked workers inherit a table built here. With spawn/forkserver nothing is inherited, so the initializer has
+    # each worker build its own once, before its first job
+    if multiprocessing.get_start_method() == "fork":
+        get_op_code_table()
+    with multiprocessing.Pool(processes=args.workers, initializer=get_op_code_table) as pool:
+        # imap hands back results in job order, so the index is the same no matter which worker finishes first
+        index = list(pool.imap(disassemble_to_listing, jobs, chunksize=max(len(jobs) // (args.workers * 4), 1)))
+    if args.index:
+        with open(args.index, "w") as out:
+            write_lines(["rom\tlisting\tinstructions\tsha1"] + index, out)
+
+
 def main():
+    if args.batch:
+        main_batch()
+        return
     with open(args.file, "rb") as f:
-        op_code = None
-        while op_code != b"":
-            op_code = f.read(2)
-            if len(op_code) == 2:
-                instruction = parse_op_code(op_code)
-                print(format_output(instruction))
-                if args.validate_op:
-                    assert (
-                        int.from_bytes(op_code, byteorder="big") == instruction.op_code
-                    ), "parsed op code is not the same: {}\t{}".format(
-                        int.from_bytes(op_code, byteorder="big"), instruction.op_code
-                    )
+        rom = f.read()
+    instructions = disassemble(rom, start=args.start, end=args.end)
+    if args.validate_op:
+        instructions = validate(instructions)
+    if args.quiet:
+        for instruction in instructions:
+            pass
+    else:
+        write_lines((format_output(instruction) for instruction in instructions), sys.stdout)
 
 
 if __name__ == "__main__":
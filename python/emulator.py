@@ -0,0 +1,903 @@
+"""
+Headless chip8 interpreter, a python port of emulateCycle in src/chip8.c that can be driven from the python tools.
+The Instruction classes decide what each op code does: every address is decoded (through lib) at most once into a
+handler for its Instruction class plus the values of the instruction's args, and that entry is reused on every fetch
+until the memory under it gets written to.
+run() goes one step further and translates straight-line runs of instructions (basic blocks) into generated python
+functions, see BlockCache. emulate_cycle/step always go one instruction at a time.
+
+Differences from src/chip8.c:
+    * errors (unknown op codes, stack over/underflow) raise instead of exiting the process
+    * CALL raises once all STACK_SIZE (16) stack entries are in use. src/chip8.c only checks stackPointer > STACK_SIZE,
+      so its 17th nested CALL writes one entry past the end of the stack and only the 18th exits
+    * the screen is one int per row (bit-packed, the leftmost pixel is the highest bit), graphics unpacks it into the
+      one byte per pixel layout of the C struct
+    * WKPL waits until a key is pressed, then loads the (highest) pressed key into the register and moves on. In
+      src/chip8.c keyPressed is never set, so it loads the key but never moves on. Either way every cycle spent waiting
+      counts as a cycle, and the timers keep counting down while it waits
+    * the timers count down every cycles_per_tick instructions, the default of 1 is every cycle like emulateCycle
+      (runTick in src/chip8.c is the same with more than one)
+"""
+
+import random
+import re
+from functools import partial
+
+from lib import *
+
+MAX_MEMORY = 4096
+REGISTERS = 16
+STACK_SIZE = 16
+KEYS = 16
+GRAPHICS_WIDTH = 64
+GRAPHICS_HEIGHT = 32
+FONT_OFFSET = 0
+ADDRESS_MASK = MAX_MEMORY - 1
+ROW_MASK = (1 << GRAPHICS_WIDTH) - 1
+ALL_ROWS = (1 << GRAPHICS_HEIGHT) - 1  # dirty_rows with every row set
+SPRITE_SHIFT = GRAPHICS_WIDTH - 8  # puts a sprite row at the left edge of a screen row
+
+# between the characters of a row formatted as binary and the 0/1 bytes of graphics
+PIXELS_FROM_BINARY = bytes.maketrans(b"01", b"\x00\x01")
+BINARY_FROM_PIXELS = bytes.maketrans(b"\x00\x01", b"01")
+MAX_BLOCK_LENGTH = 64  # instructions per translated block
+
+FONT_SET = bytes(
+    [
+        0xF0, 0x90, 0x90, 0x90, 0xF0,  # 0
+        0x20, 0x60, 0x20, 0x20, 0x70,  # 1
+        0xF0, 0x10, 0xF0, 0x80, 0xF0,  # 2
+        0xF0, 0x10, 0xF0, 0x10, 0xF0,  # 3
+        0x90, 0x90, 0xF0, 0x10, 0x10,  # 4
+        0xF0, 0x80, 0xF0, 0x10, 0xF0,  # 5
+        0xF0, 0x80, 0xF0, 0x90, 0xF0,  # 6
+        0xF0, 0x10, 0x20, 0x40, 0x40,  # 7
+        0xF0, 0x90, 0xF0, 0x90, 0xF0,  # 8
+        0xF0, 0x90, 0xF0, 0x10, 0xF0,  # 9
+        0xF0, 0x90, 0xF0, 0x90, 0x90,  # A
+        0xE0, 0x90, 0xE0, 0x90, 0xE0,  # B
+        0xF0, 0x80, 0x80, 0x80, 0xF0,  # C
+        0xE0, 0x90, 0x90, 0x90, 0xE0,  # D
+        0xF0, 0x80, 0xF0, 0x80, 0xF0,  # E
+        0xF0, 0x80, 0xF0, 0x80, 0x80,  # F
+    ]
+)  # fmt: skip
+
+
+# a screen (row ints, see Chip8.screen) as one byte (0 or 1) per pixel, row after row, like graphics in src/chip8.h
+def pixels_from_screen(screen):
+    rows = ("{:064b}".format(row) for row in screen)
+    return bytes("".join(rows), "ascii").translate(PIXELS_FROM_BINARY)
+
+
+# the other way round, returns the list of row ints
+def screen_from_pixels(pixels):
+    pixels = bytes(pixels).translate(BINARY_FROM_PIXELS)
+    return [int(pixels[y * GRAPHICS_WIDTH : (y + 1) * GRAPHICS_WIDTH], 2) for y in range(GRAPHICS_HEIGHT)]
+
+
+class EmulatorException(Exception):  # raised where src/chip8.c would print an error and exit
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args)
+        self.kwargs = kwargs
+
+    def __repr__(self):
+        return super().__repr__() + str(self.kwargs)
+
+
+# a frame_diff as bytes, for sending/storing frames as deltas: a 4 byte little endian mask of the rows in it, then each
+# row as 8 bytes big endian (so the bytes read left to right like the screen)
+def pack_frame_diff(diff):
+    mask = sum(1 << y for y, row in diff)
+    return mask.to_bytes(4, "little") + b"".join(row.to_bytes(8, "big") for y, row in diff)
+
+
+# applies a packed frame diff to a screen (a list of row ints), returns the rows it changed
+def apply_frame_diff(screen, data):
+    mask, offset, changed = int.from_bytes(data[:4], "little"), 4, []
+    for y in range(GRAPHICS_HEIGHT):
+        if mask >> y & 1:
+            screen[y] = int.from_bytes(data[offset : offset + 8], "big")
+            offset += 8
+            changed.append(y)
+    return changed
+
+
+# the condition under which each skip instruction skips, {0}/{1} are the values of its args
+SKIP_CONDITIONS = {
+    SkipNextInstructionIfEqualsConst: "v{0:x} == {1}",
+    SkipNextInstructionIfNotEqualsConst: "v{0:x} != {1}",
+    SkipNextInstructionIfRegistersEqual: "v{0:x} == v{1:x}",
+    SkipNextInstructionIfRegistersNotEquals: "v{0:x} != v{1:x}",
+    SkipIfKeyPressed: "m.key[v{0:x} & 0xF]",
+    SkipIfKeyNotPressed: "not m.key[v{0:x} & 0xF]",
+}
+
+# python source for each Instruction class inside a translated block. The block function gets the machine as m, with
+# the registers in the locals v0 to vf, I in index, memory = m.memory and pc = the program counter the block was entered
+# with. {0}, {1}, {2} are the values of the instruction's args, {i} is how many instructions of the block ran before
+# it, and {here}/{next}/{skip} are the program counter at it/the one after it/the one after that. {sync} writes the
+# locals back to the machine, which has to happen before anything that leaves the block or uses the machine's registers.
+# Inside a block the timers aren't counted down until it ends, so they hold their value plus the ticks that ended in the
+# block before the instruction: reads subtract {t} and writes add it, which gives the same values as counting down at
+# the end of every tick. With a tick per cycle {t} is {i}.
+TEMPLATES = {
+    ClearScreen: ["m._clear_screen()"],
+    ReturnFromFunction: [
+        "if m.stack_pointer == 0:",
+        "    {sync}",
+        "    m.program_counter = {here}",
+        "    m.retire({i})",
+        "    m._return_from_function()",
+        "m.stack_pointer -= 1",
+        "m.program_counter = m.stack[m.stack_pointer] + 2",
+    ],
+    JumpToAddress: ["m.program_counter = {0}"],
+    CallFunction: [
+        "if m.stack_pointer >= STACK_SIZE:",
+        "    {sync}",
+        "    m.program_counter = {here}",
+        "    m.retire({i})",
+        "    m._call_function({0})",
+        "m.stack[m.stack_pointer] = {here}",
+        "m.stack_pointer += 1",
+        "m.program_counter = {0}",
+    ],
+    LoadConstantIntoRegister: ["v{0:x} = {1}"],
+    AddConstantToRegister: ["v{0:x} = (v{0:x} + {1}) & 0xFF"],
+    LoadRegisterIntoRegister: ["v{0:x} = v{1:x}"],
+    OrRegisters: ["v{0:x} |= v{1:x}"],
+    AndRegisters: ["v{0:x} &= v{1:x}"],
+    XorRegisters: ["v{0:x} ^= v{1:x}"],
+    AddRegisters: ["total = v{0:x} + v{1:x}", "vf = total > 0xFF", "v{0:x} = total & 0xFF"],
+    SubtractRegisters: ["vf = v{1:x} <= v{0:x}", "v{0:x} = (v{0:x} - v{1:x}) & 0xFF"],
+    ShiftRightRegister: ["vf = v{0:x} & 0x1", "v{0:x} = v{0:x} >> 1"],
+    ReverseSubtractRegisters: ["vf = v{0:x} <= v{1:x}", "v{0:x} = (v{1:x} - v{0:x}) & 0xFF"],
+    ShiftLeftRegister: ["vf = v{0:x} >> 7", "v{0:x} = (v{0:x} << 1) & 0xFF"],
+    SetAddressRegister: ["index = {0}"],
+    JumpToAddressPlusV0: ["m.program_counter = {0} + v0"],
+    GenerateRandomNumberWithMask: ["v{0:x} = m.random.getrandbits(8) & {1}"],
+    # the start of a sprite, followed by DRAW_ROW for each of its rows and then DRAW_END
+    DrawSprite: ["rotated = ROTATED[v{0:x} & 0x3F]", "y, screen = v{1:x}, m.screen", "collision = dirty = 0"],
+    LoadDelayTimerIntoRegister: ["v{0:x} = max(0, m.delay_timer - {t})"],
+    WaitForKeyPressLoadIntoRegister: [
+        "if any(m.key):",
+        "    v{0:x} = max(key for key, down in enumerate(m.key) if down)",
+        "    m.program_counter = {next}",
+        "else:",
+        "    m.program_counter = {here}",
+    ],
+    SetDelayTimer: ["m.delay_timer = v{0:x} + {t}"],
+    SetSoundTimer: ["m.sound_timer = v{0:x} + {t}"],
+    AddRegisterToAddressRegister: ["vf = index + v{0:x} > 0x0FFF", "index = (index + v{0:x}) & 0xFFFF"],
+    SetAddressRegisterToSpriteInRegister: ["index = v{0:x} * 0x5"],
+    BCDDecodeRegister: ["m.program_counter = {here}", "{sync}", "m._bcd({0})"],
+    StoreRegisters: ["m.program_counter = {here}", "{sync}", "m._store_registers({0})", "index = m.index_counter"],
+    # {registers} is v0 up to the last register read
+    ReadRegisters: [
+        "if index + {0} <= 0xFFF:",
+        "    {registers}, = memory[index : index + {0} + 1]",
+        "else:",
+        "    {registers}, = (memory[(index + i) & 0xFFF] for i in range({0} + 1))",
+        "index += {0} + 1",
+    ],
+    Instruction: [],  # only unknown 0xF... op codes get translated, and those do nothing
+}
+for kind, condition in SKIP_CONDITIONS.items():
+    TEMPLATES[kind] = ["m.program_counter = {skip} if " + condition + " else {next}"]
+
+# a DRAW is unrolled, since its height is known: DRAW_ROW is the row {row} of the sprite, the same as _draw_sprite does
+DRAW_ROW = [
+    "pixels = rotated[memory[(index + {row}) & 0xFFF]]",
+    "if pixels:",
+    "    row = (y + {row}) & 0x1F",
+    "    collision |= screen[row] & pixels",
+    "    screen[row] ^= pixels",
+    "    dirty |= 1 << row",
+]
+DRAW_END = ["vf = collision != 0", "m.dirty_rows |= dirty", "m.draw_flag = True"]
+# ROTATED[x][byte] is a sprite row rotated into place at x in a screen row, for the translated DRAW
+ROTATED = [
+    [(byte << SPRITE_SHIFT >> x | byte << SPRITE_SHIFT << (GRAPHICS_WIDTH - x)) & ROW_MASK for byte in range(256)]
+    for x in range(GRAPHICS_WIDTH)
+]
+# a RTN back to a CALL earlier in the same block, which is followed like a JMP. The CALL's template already wrote the
+# stack, so nothing can be over/underflowed
+INLINE_RETURN = ["m.stack_pointer -= 1"]
+# the names of the locals the registers are kept in
+REGISTER_NAMES = ["v{:x}".format(x) for x in range(REGISTERS)]
+SYNC = "# sync"  # what {sync} is until the registers a block writes are known
+ASSIGNED = re.compile(r"^\s*((?:v[0-9a-f], )*v[0-9a-f]),? [|&^+]?= ")
+
+# instructions that end a block: anything that sets the program counter to something only known when it runs, plus
+# the writes to memory (which can invalidate the block that's running). JMP and CALL are followed to their address
+# instead, and a skip over one instruction becomes an if around it, but both still end the block when they get skipped
+BLOCK_ENDS = {
+    ReturnFromFunction,
+    JumpToAddress,
+    CallFunction,
+    JumpToAddressPlusV0,
+    WaitForKeyPressLoadIntoRegister,
+    BCDDecodeRegister,
+    StoreRegisters,
+}.union(SKIP_CONDITIONS)
+
+
+# translations shared by every machine, since the same code (e.g. the same rom) always translates the same way:
+# (start address, cycles per tick) -> [(covered addresses, the bytes they held, code, length)], newest last
+TRANSLATIONS = {}
+TRANSLATIONS_PER_ADDRESS = 8
+
+
+# what an idle loop waits for, see find_idle_loop
+IDLE_FOREVER = "forever"  # something that can't happen during a run, keys only change between runs
+IDLE_DELAY = "delay"  # the delay timer to reach 0
+
+
+# finds a loop at start that only waits, going round the same way (writing nothing but the same register values, or the
+# delay timer's value) until the delay timer runs out or the keys change.
+# Returns (what it waits for, instructions per time round) or None. The loops are:
+#   JMP start                       IDLE_FOREVER, 1
+#   WKPL vX                         IDLE_FOREVER, 1 (while no key is down)
+#   SKP/SKNP vX, JMP start          IDLE_FOREVER, 2 (while the key doesn't change)
+#   LDD vX, SE vX 0, JMP start      IDLE_DELAY, 3
+def find_idle_loop(memory, start):
+    op_codes = [
+        memory[at & ADDRESS_MASK] << 8 | memory[(at + 1) & ADDRESS_MASK] for at in (start, start + 2, start + 4)
+    ]
+    first, second, third = op_codes
+    jump_to_start = 0x1000 | start
+    if first == jump_to_start or first & 0xF0FF == 0xF00A:
+        return IDLE_FOREVER, 1
+    if first & 0xF0FF in (0xE09E, 0xE0A1) and second == jump_to_start:
+        return IDLE_FOREVER, 2
+    if first & 0xF0FF == 0xF007 and second == 0x3000 | first & 0x0F00 and third == jump_to_start:
+        return IDLE_DELAY, 3
+    return None
+
+
+# SYS and unknown op codes (other than 0xF...) always raise, so they're left to step
+def translatable(instruction):
+    kind = type(instruction)
+    return kind != CallNativeCode and (kind != Instruction or instruction.op_code & 0xF000 == 0xF000)
+
+
+# translates the block starting at start, returns the addresses of memory it was translated from, its compiled code
+# (None when the op code at start isn't translatable) and its length
+def translate_block(memory, start, cycles_per_tick=1):
+    decode = lambda address: decode_op_code(memory[address] << 8 | memory[address + 1])
+
+    lines = []
+    covered = {start, (start + 1) & ADDRESS_MASK}
+    address = start
+    jumped = False  # the program counter is written relative to pc until a jump, after that it's a constant
+    count, conditional = 0, 0  # instructions that always run, and instructions that only run when not skipped
+    longest = 0  # the most instructions run on a path that returns early (a skipped block end that wasn't skipped)
+    ended = False
+    calls = []  # (address, jumped) of the CALLs followed so far that haven't returned yet
+
+    # how many instructions have run so far, plus more
+    def executed(more=0):
+        return "({} + extra)".format(count + more) if conditional else str(count + more)
+
+    def position(at):
+        return "{:#05x}".format(at) if jumped else "pc + {}".format(at - start)
+
+    def emit(kind, values, at, indent=""):
+        fields = dict(i=executed(), here=position(at), next=position(at + 2), skip=position(at + 4))
+        fields["t"] = fields["i"] if cycles_per_tick == 1 else "(phase + {}) // {}".format(fields["i"], cycles_per_tick)
+        fields["sync"] = SYNC
+        if kind == ReadRegisters:
+            fields["registers"] = ", ".join(REGISTER_NAMES[: values[0] + 1])
+        lines.extend(indent + line.format(*values, **fields) for line in TEMPLATES[kind])
+        if kind == DrawSprite:
+            for row in range(values[2]):
+                lines.extend(indent + line.format(row=row) for line in DRAW_ROW)
+            lines.extend(indent + line for line in DRAW_END)
+
+    while count + conditional < MAX_BLOCK_LENGTH and address + 2 <= MAX_MEMORY:
+        instruction = decode(address)
+        kind = type(instruction)
+        if not translatable(instruction):
+            break
+        covered.update((address, address + 1))
+        values = [arg.value for arg in instruction.args]
+
+        if kind == JumpToAddress:
+            count += 1
+            address, jumped = values[0], True
+            continue
+        if kind == CallFunction:
+            emit(kind, values, address)
+            lines.pop()  # everything but setting the program counter
+            count += 1
+            calls.append((address, jumped))
+            address, jumped = values[0], True
+            continue
+        if kind == ReturnFromFunction and calls:
+            lines.extend(INLINE_RETURN)
+            count += 1
+            address, jumped = calls.pop()
+            address += 2
+            continue
+        if kind in SKIP_CONDITIONS and count + conditional + 2 <= MAX_BLOCK_LENGTH and address + 4 <= MAX_MEMORY:
+            skipped = decode(address + 2)
+            if translatable(skipped):
+                covered.update((address + 2, address + 3))
+                skipped_kind = type(skipped)
+                skipped_values = [arg.value for arg in skipped.args]
+                lines.append("if not ({}):".format(SKIP_CONDITIONS[kind].format(*values)))
+                count += 1
+                emit(skipped_kind, skipped_values, address + 2, indent="    ")
+                if skipped_kind in BLOCK_ENDS:
+                    # the block ends here when the instruction isn't skipped, and carries on after it when it is
+                    lines.extend(["    " + SYNC, "    return {}".format(executed(1))])
+                    longest = max(longest, count + conditional + 1)
+                else:
+                    lines.append("    extra += 1")
+                    conditional += 1
+                address += 4
+                continue
+
+        emit(kind, values, address)
+        count += 1
+        address += 2
+        if kind in BLOCK_ENDS:
+            ended = True
+            break
+
+    if not ended:
+        lines.append("m.program_counter = {}".format(position(address)))
+
+    lines.extend([SYNC, "return {}".format(executed())])
+
+    code, length = None, max(count + conditional, longest)
+    if length:
+        # only the registers the block assigns get written back
+        written = set()
+        for line in lines:
+            assigned = ASSIGNED.match(line)
+            if assigned:
+                written.update(REGISTER_NAMES.index(name) for name in assigned.group(1).split(", "))
+        sync = ["m.index_counter = index"]
+        if written:
+            targets = ", ".join("reg[{}]".format(x) for x in sorted(written))
+            sync.append("{} = {}".format(targets, ", ".join(REGISTER_NAMES[x] for x in sorted(written))))
+        source = "def block(m):\n    reg, memory = m.reg, m.memory\n    {} = reg\n".format(", ".join(REGISTER_NAMES))
+        source += "    index, pc = m.index_counter, m.program_counter\n"
+        if cycles_per_tick > 1:
+            source += "    phase = m.cycles % {}\n".format(cycles_per_tick)
+        if conditional:
+            source += "    extra = 0\n"
+        for line in lines:
+            if line.strip() == SYNC:
+                indent = line[: len(line) - len(SYNC)]
+                source += "".join("    {}{}\n".format(indent, statement) for statement in sync)
+            else:
+                source += "    {}\n".format(line)
+        code = compile(source, "<block {:#05x}>".format(start), "exec")
+    return tuple(sorted(covered)), code, length
+
+
+class BlockCache:
+    """
+    Translated basic blocks, cached by the address they start at. A block is every instruction from its start up to and
+    including the next one in BLOCK_ENDS, compiled into one python function that returns how many instructions it ran.
+    Blocks can take different paths (skips), so a block's length is the most it can run.
+    When a CALL/RTN in a block would over/underflow the stack, the instructions before it are retired and the error is
+    raised by the handler, leaving the machine in the same state as running one instruction at a time would.
+    Addresses that start with an op code that isn't translatable get an empty block (function None), which means step.
+    hits/misses count block lookups, invalidations count blocks dropped because the memory under them was written.
+    idle has the find_idle_loop of each block's start address, for run to fast-forward.
+    """
+
+    def __init__(self, cycles_per_tick=1):
+        self.cycles_per_tick = cycles_per_tick  # blocks are translated for machines with this many
+        self.blocks = [None] * MAX_MEMORY  # (function, length) by start address
+        self.owners = [None] * MAX_MEMORY  # the start addresses of the blocks covering each byte of memory
+        self.idle = [None] * MAX_MEMORY
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return sum(block is not None for block in self.blocks)
+
+    def get(self, machine, address):
+        block = self.blocks[address]
+        if block is None:
+            return self.translate(machine, address)
+        self.hits += 1
+        return block
+
+    def translate(self, machine, start):
+        self.misses += 1
+        memory = machine.memory
+        translations = TRANSLATIONS.setdefault((start, self.cycles_per_tick), [])
+        for covered, expected, code, length in translations:
+            if bytes(map(memory.__getitem__, covered)) == expected:
+                break
+        else:
+            covered, code, length = translate_block(memory, start, self.cycles_per_tick)
+            translations.append((covered, bytes(map(memory.__getitem__, covered)), code, length))
+            del translations[:-TRANSLATIONS_PER_ADDRESS]
+
+        function = None
+        if code is not None:
+            namespace = {"STACK_SIZE": STACK_SIZE, "ROTATED": ROTATED}
+            exec(code, namespace)
+            function = namespace["block"]
+
+        block = self.blocks[start] = (function, length)
+        self.idle[start] = find_idle_loop(memory, start)
+        for address in covered:
+            owners = self.owners[address]
+            if owners is None:
+                owners = self.owners[address] = set()
+            owners.add(start)
+        return block
+
+    # drops the blocks covering any byte in [start, end)
+    def invalidate(self, start, end):
+        blocks, all_owners = self.blocks, self.owners
+        for address in range(start, end):
+            owners = all_owners[address & ADDRESS_MASK]
+            if owners:
+                for owner in owners:
+                    if blocks[owner] is not None:
+                        blocks[owner] = None
+                        self.idle[owner] = None
+                        self.invalidations += 1
+                owners.clear()
+
+
+class Chip8:
+    """
+    The machine state (same layout as the Chip8 struct in src/chip8.h) and the interpreter loop.
+    memory, reg and key are flat bytearrays, so they can be read/written directly like the C struct fields,
+    but memory should be written through write_memory/load_rom so the decoded instructions stay in sync.
+    The screen is a list of GRAPHICS_HEIGHT row ints, see graphics for the C layout.
+    """
+
+    # the method that carries out each Instruction class, called with the values of the instruction's args
+    HANDLERS = {
+        ClearScreen: "_clear_screen",
+        ReturnFromFunction: "_return_from_function",
+        CallNativeCode: "_call_native_code",
+        JumpToAddress: "_jump_to_address",
+        CallFunction: "_call_function",
+        SkipNextInstructionIfEqualsConst: "_skip_if_equals_const",
+        SkipNextInstructionIfNotEqualsConst: "_skip_if_not_equals_const",
+        SkipNextInstructionIfRegistersEqual: "_skip_if_registers_equal",
+        LoadConstantIntoRegister: "_load_constant",
+        AddConstantToRegister: "_add_constant",
+        LoadRegisterIntoRegister: "_load_register",
+        OrRegisters: "_or_registers",
+        AndRegisters: "_and_registers",
+        XorRegisters: "_xor_registers",
+        AddRegisters: "_add_registers",
+        SubtractRegisters: "_subtract_registers",
+        ShiftRightRegister: "_shift_right",
+        ReverseSubtractRegisters: "_reverse_subtract_registers",
+        ShiftLeftRegister: "_shift_left",
+        SkipNextInstructionIfRegistersNotEquals: "_skip_if_registers_not_equal",
+        SetAddressRegister: "_set_index",
+        JumpToAddressPlusV0: "_jump_to_address_plus_v0",
+        GenerateRandomNumberWithMask: "_random",
+        DrawSprite: "_draw_sprite",
+        SkipIfKeyPressed: "_skip_if_key_pressed",
+        SkipIfKeyNotPressed: "_skip_if_key_not_pressed",
+        LoadDelayTimerIntoRegister: "_load_delay_timer",
+        WaitForKeyPressLoadIntoRegister: "_wait_for_key",
+        SetDelayTimer: "_set_delay_timer",
+        SetSoundTimer: "_set_sound_timer",
+        AddRegisterToAddressRegister: "_add_to_index",
+        SetAddressRegisterToSpriteInRegister: "_set_index_to_sprite",
+        BCDDecodeRegister: "_bcd",
+        StoreRegisters: "_store_registers",
+        ReadRegisters: "_read_registers",
+        Instruction: "_unknown",  # whatever the FallBackMatcher decoded
+    }
+
+    def __init__(self, seed=None, translate=True, cycles_per_tick=1):
+        self.program_counter = PROGRAM_START
+        self.index_counter = 0
+        self.stack_pointer = 0
+
+        self.memory = bytearray(MAX_MEMORY)
+        self.reg = bytearray(REGISTERS)
+        self.stack = [0] * STACK_SIZE
+
+        self.delay_timer = 0
+        self.sound_timer = 0
+
+        self.screen = [0] * GRAPHICS_HEIGHT  # one int per row, the leftmost pixel is the highest bit
+        self.key = bytearray(KEYS)
+        self.draw_flag = False
+        self.dirty_rows = 0  # bit y is set when row y may have changed since the last frame_diff
+        self._presented = [0] * GRAPHICS_HEIGHT  # the screen as of the last frame_diff
+
+        self.cycles = 0  # instructions executed so far
+        self.skipped_cycles = 0  # how many of those run fast-forwarded through idle loops, see _skip_idle
+        self.cycles_per_tick = cycles_per_tick  # the timers count down each time cycles reaches a multiple of this
+        self.random = random.Random(seed)  # used by RNG, seeding it makes runs repeatable
+        self._decoded = [None] * MAX_MEMORY  # per address dispatch table, filled in as addresses get executed
+        # used by run, None runs one instruction at a time
+        self.blocks = BlockCache(cycles_per_tick) if translate else None
+
+        self.memory[FONT_OFFSET : FONT_OFFSET + len(FONT_SET)] = FONT_SET
+
+    # the screen as one byte (0 or 1) per pixel, row after row, like graphics in src/chip8.h
+    @property
+    def graphics(self):
+        return pixels_from_screen(self.screen)
+
+    @graphics.setter
+    def graphics(self, pixels):
+        self.screen[:] = screen_from_pixels(pixels)
+        self.dirty_rows = ALL_ROWS
+
+    # the rows that changed since the last call, as (y, row) with the row bit-packed like screen, in order of y.
+    # Only the rows in dirty_rows get compared, so this is cheap when little was drawn
+    def frame_diff(self):
+        diff = []
+        dirty, screen, presented = self.dirty_rows, self.screen, self._presented
+        while dirty:
+            y = (dirty & -dirty).bit_length() - 1
+            dirty &= dirty - 1
+            if screen[y] != presented[y]:
+                presented[y] = screen[y]
+                diff.append((y, screen[y]))
+        self.dirty_rows = 0
+        return diff
+
+    def load_rom(self, rom):
+        if len(rom) >= MAX_MEMORY - 1 - PROGRAM_START:
+            raise EmulatorException("ROM too large to fit in memory", size=len(rom))
+        self.write_memory(PROGRAM_START, rom)
+
+    # writes op codes (ints) starting at the program counter, like loadInstructions in src/chip8.c
+    def load_instructions(self, op_codes):
+        self.write_memory(self.program_counter, b"".join(op_code.to_bytes(2, "big") for op_code in op_codes))
+
+    def write_memory(self, address, data):
+        self.memory[address : address + len(data)] = data
+        self.invalidate(address, address + len(data))
+
+    # forgets the decoded instructions overlapping [start, end), an op code starts up to 1 byte before what changed.
+    # addresses past the end of memory wrap around, the same as the writes that use them
+    def invalidate(self, start=0, end=MAX_MEMORY):
+        for address in range(start - 1, end):
+            self._decoded[address & ADDRESS_MASK] = None
+        if self.blocks is not None:
+            self.blocks.invalidate(start, end)
+
+    def _decode(self, address):
+        op_code = self.memory[address] << 8 | self.memory[(address + 1) & ADDRESS_MASK]
+        instruction = decode_op_code(op_code)
+        handler = getattr(self, self.HANDLERS[type(instruction)])
+        entry = self._decoded[address] = partial(handler, *[arg.value for arg in instruction.args])
+        return entry
+
+    # executes the instruction at the program counter, without touching the timers
+    def step(self):
+        address = self.program_counter & ADDRESS_MASK
+        (self._decoded[address] or self._decode(address))()
+        self.cycles += 1
+
+    def update_timers(self):
+        if self.delay_timer > 0:
+            self.delay_timer -= 1
+        if self.sound_timer > 0:
+            self.sound_timer -= 1
+
+    # one instruction followed by a timer update when it ends a tick, with a tick per cycle (the default) the same as
+    # a call to emulateCycle in src/chip8.c
+    def emulate_cycle(self):
+        self.step()
+        if self.cycles % self.cycles_per_tick == 0:
+            self.update_timers()
+
+    # emulates the given number of cycles, returns how many were run. With translation on, whole blocks are run while
+    # they fit in the cycles left, and the timers are counted down by the block's length afterwards. A block that went
+    # round an idle loop (see find_idle_loop) back to its start is fast-forwarded by _skip_idle
+    def run(self, cycles):
+        if self.blocks is None:
+            return self._run_interpreted(cycles)
+        if self.cycles_per_tick > 1:
+            return self._run_ticked(cycles)
+        blocks = self.blocks
+        table, idle = blocks.blocks, blocks.idle
+        remaining = cycles
+        hits = 0
+        try:
+            while remaining > 0:
+                address = self.program_counter & ADDRESS_MASK
+                block = table[address]
+                if block is None:
+                    block = blocks.translate(self, address)
+                else:
+                    hits += 1
+                function, length = block
+                if function is None or length > remaining:
+                    self.step()
+                    done = 1
+                else:
+                    done = function(self)
+                    self.cycles += done
+                remaining -= done
+                if self.delay_timer:
+                    self.delay_timer = max(0, self.delay_timer - done)
+                if self.sound_timer:
+                    self.sound_timer = max(0, self.sound_timer - done)
+                if self.program_counter == address and idle[address] is not None and remaining:
+                    remaining -= self._skip_idle(address, remaining)
+        finally:
+            blocks.hits += hits
+        return cycles
+
+    # counts the instructions a block ran before it stopped on an error, like run does when a block returns
+    def retire(self, done):
+        ticks = (self.cycles % self.cycles_per_tick + done) // self.cycles_per_tick
+        self.cycles += done
+        self.delay_timer = max(0, self.delay_timer - ticks)
+        self.sound_timer = max(0, self.sound_timer - ticks)
+
+    # the idle loop at address just went round, so it keeps going round the same way until what it waits for happens:
+    # skips as many whole times round as that takes (at most the cycles left), leaving the machine as running them
+    # would have. Returns how many cycles were skipped
+    def _skip_idle(self, address, remaining):
+        wait, length = self.blocks.idle[address]
+        per_tick = self.cycles_per_tick
+        phase = self.cycles % per_tick
+        rounds = remaining // length
+        if wait == IDLE_DELAY:
+            # time round i reads the delay timer (phase + length * i) // per_tick ticks from now, the first to read 0
+            # leaves the loop
+            rounds = min(rounds, -((phase - self.delay_timer * per_tick) // length))
+            if rounds <= 0:
+                return 0
+            self.reg[self.memory[address] & 0xF] = self.delay_timer - (phase + length * (rounds - 1)) // per_tick
+        skipped = rounds * length
+        ticks = (phase + skipped) // per_tick
+        self.delay_timer = max(0, self.delay_timer - ticks)
+        self.sound_timer = max(0, self.sound_timer - ticks)
+        self.cycles += skipped
+        self.skipped_cycles += skipped
+        return skipped
+
+    # run with more than one instruction per tick, the timers are counted down by the ticks that ended in each block
+    def _run_ticked(self, cycles):
+        blocks = self.blocks
+        table, idle = blocks.blocks, blocks.idle
+        per_tick = self.cycles_per_tick
+        remaining = cycles
+        hits = 0
+        try:
+            while remaining > 0:
+                address = self.program_counter & ADDRESS_MASK
+                block = table[address]
+                if block is None:
+                    block = blocks.translate(self, address)
+                else:
+                    hits += 1
+                function, length = block
+                phase = self.cycles % per_tick
+                if function is None or length > remaining:
+                    self.step()
+                    done = 1
+                else:
+                    done = function(self)
+                    self.cycles += done
+                remaining -= done
+                ticks = (phase + done) // per_tick
+                if ticks:
+                    self.delay_timer = max(0, self.delay_timer - ticks)
+                    self.sound_timer = max(0, self.sound_timer - ticks)
+                if self.program_counter == address and idle[address] is not None and remaining:
+                    remaining -= self._skip_idle(address, remaining)
+        finally:
+            blocks.hits += hits
+        return cycles
+
+    # run without translation, one dispatch per instruction
+    def _run_interpreted(self, cycles):
+        decoded = self._decoded
+        decode = self._decode
+        per_tick = self.cycles_per_tick
+        for _ in range(cycles):
+            address = self.program_counter & ADDRESS_MASK
+            (decoded[address] or decode(address))()
+            self.cycles += 1
+            if self.cycles % per_tick == 0:
+                if self.delay_timer > 0:
+                    self.delay_timer -= 1
+                if self.sound_timer > 0:
+                    self.sound_timer -= 1
+        return cycles
+
+    def _clear_screen(self):
+        self.screen[:] = [0] * GRAPHICS_HEIGHT
+        self.dirty_rows = ALL_ROWS
+        self.draw_flag = True
+        self.program_counter += 2
+
+    def _return_from_function(self):
+        if self.stack_pointer == 0:
+            raise EmulatorException("returned while stack is empty", program_counter=self.program_counter)
+        self.stack_pointer -= 1
+        self.program_counter = self.stack[self.stack_pointer] + 2
+
+    def _call_native_code(self, address):
+        raise EmulatorException("Unknown opcode", op_code=address, program_counter=self.program_counter)
+
+    def _jump_to_address(self, address):
+        self.program_counter = address
+
+    def _call_function(self, address):
+        if self.stack_pointer >= STACK_SIZE:
+            raise EmulatorException("ran out of stack", program_counter=self.program_counter)
+        self.stack[self.stack_pointer] = self.program_counter
+        self.stack_pointer += 1
+        self.program_counter = address
+
+    def _skip_if_equals_const(self, x, const):
+        self.program_counter += 4 if self.reg[x] == const else 2
+
+    def _skip_if_not_equals_const(self, x, const):
+        self.program_counter += 4 if self.reg[x] != const else 2
+
+    def _skip_if_registers_equal(self, x, y):
+        self.program_counter += 4 if self.reg[x] == self.reg[y] else 2
+
+    def _load_constant(self, x, const):
+        self.reg[x] = const
+        self.program_counter += 2
+
+    def _add_constant(self, x, const):
+        self.reg[x] = (self.reg[x] + const) & 0xFF
+        self.program_counter += 2
+
+    def _load_register(self, x, y):
+        self.reg[x] = self.reg[y]
+        self.program_counter += 2
+
+    def _or_registers(self, x, y):
+        self.reg[x] |= self.reg[y]
+        self.program_counter += 2
+
+    def _and_registers(self, x, y):
+        self.reg[x] &= self.reg[y]
+        self.program_counter += 2
+
+    def _xor_registers(self, x, y):
+        self.reg[x] ^= self.reg[y]
+        self.program_counter += 2
+
+    # the flag is set before the result is written, in the same order as src/chip8.c (this matters when x or y is VF)
+    def _add_registers(self, x, y):
+        total = self.reg[x] + self.reg[y]
+        self.reg[0xF] = total > 0xFF
+        self.reg[x] = total & 0xFF
+        self.program_counter += 2
+
+    def _subtract_registers(self, x, y):
+        reg = self.reg
+        reg[0xF] = reg[y] <= reg[x]
+        reg[x] = (reg[x] - reg[y]) & 0xFF
+        self.program_counter += 2
+
+    def _shift_right(self, x, y):
+        reg = self.reg
+        reg[0xF] = reg[x] & 0x1
+        reg[x] = reg[x] >> 1
+        self.program_counter += 2
+
+    def _reverse_subtract_registers(self, x, y):
+        reg = self.reg
+        reg[0xF] = reg[x] <= reg[y]
+        reg[x] = (reg[y] - reg[x]) & 0xFF
+        self.program_counter += 2
+
+    def _shift_left(self, x, y):
+        reg = self.reg
+        reg[0xF] = reg[x] >> 7
+        reg[x] = (reg[x] << 1) & 0xFF
+        self.program_counter += 2
+
+    def _skip_if_registers_not_equal(self, x, y):
+        self.program_counter += 4 if self.reg[x] != self.reg[y] else 2
+
+    def _set_index(self, address):
+        self.index_counter = address
+        self.program_counter += 2
+
+    def _jump_to_address_plus_v0(self, address):
+        self.program_counter = address + self.reg[0]
+
+    def _random(self, x, mask):
+        self.reg[x] = self.random.getrandbits(8) & mask
+        self.program_counter += 2
+
+    # each sprite row is rotated into place in a screen row (the part past the right edge wraps to the left), then
+    # checked against the row for collisions and xor-ed into it
+    def _draw_sprite(self, x, y, height):
+        x, y = self.reg[x] % GRAPHICS_WIDTH, self.reg[y]
+        memory, screen, index = self.memory, self.screen, self.index_counter
+        collision = dirty = 0
+        for y_line in range(height):
+            sprite = memory[(index + y_line) & ADDRESS_MASK] << SPRITE_SHIFT
+            if sprite:
+                pixels = (sprite >> x | sprite << (GRAPHICS_WIDTH - x)) & ROW_MASK
+                row = (y + y_line) % GRAPHICS_HEIGHT
+                collision |= screen[row] & pixels
+                screen[row] ^= pixels
+                dirty |= 1 << row
+        self.reg[0xF] = collision != 0
+        self.dirty_rows |= dirty
+        self.draw_flag = True
+        self.program_counter += 2
+
+    def _skip_if_key_pressed(self, x):
+        self.program_counter += 4 if self.key[self.reg[x] & 0xF] else 2
+
+    def _skip_if_key_not_pressed(self, x):
+        self.program_counter += 2 if self.key[self.reg[x] & 0xF] else 4
+
+    def _load_delay_timer(self, x):
+        self.reg[x] = self.delay_timer & 0xFF
+        self.program_counter += 2
+
+    # keeps executing this same instruction until a key is down, then loads the (highest) pressed key into x
+    def _wait_for_key(self, x):
+        for i in range(KEYS - 1, -1, -1):
+            if self.key[i]:
+                self.reg[x] = i
+                self.program_counter += 2
+                return
+
+    def _set_delay_timer(self, x):
+        self.delay_timer = self.reg[x]
+        self.program_counter += 2
+
+    def _set_sound_timer(self, x):
+        self.sound_timer = self.reg[x]
+        self.program_counter += 2
+
+    def _add_to_index(self, x):
+        self.reg[0xF] = self.index_counter + self.reg[x] > 0x0FFF
+        self.index_counter = (self.index_counter + self.reg[x]) & 0xFFFF
+        self.program_counter += 2
+
+    def _set_index_to_sprite(self, x):
+        self.index_counter = self.reg[x] * 0x5
+        self.program_counter += 2
+
+    def _bcd(self, x):
+        value, index = self.reg[x], self.index_counter
+        for i, digit in enumerate((value // 100, (value // 10) % 10, value % 10)):
+            self.memory[(index + i) & ADDRESS_MASK] = digit
+        self.invalidate(index, index + 3)
+        self.program_counter += 2
+
+    def _store_registers(self, x):
+        index = self.index_counter
+        for i in range(x + 1):
+            self.memory[(index + i) & ADDRESS_MASK] = self.reg[i]
+        self.invalidate(index, index + x + 1)
+        self.index_counter += x + 1
+        self.program_counter += 2
+
+    def _read_registers(self, x):
+        index = self.index_counter
+        for i in range(x + 1):
+            self.reg[i] = self.memory[(index + i) & ADDRESS_MASK]
+        self.index_counter += x + 1
+        self.program_counter += 2
+
+    # src/chip8.c skips over unknown 0xF... op codes but stops on any other unknown op code
+    def _unknown(self, raw):
+        op_code = int.from_bytes(raw, byteorder="big")
+        if op_code & 0xF000 != 0xF000:
+            raise EmulatorException("Unknown opcode", op_code=op_code, program_counter=self.program_counter)
+        self.program_counter += 2
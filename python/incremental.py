@@ -0,0 +1,202 @@
+"""
+Incremental re-assembly, for edit-and-run loops where the same source gets assembled on every save.
+IncrementalAssembler keeps the last build around and, given the new lines of the source, only redoes what the edit
+touched:
+
+- every line text is tokenized/matched once (parsed caches it by the text), so only new or edited lines get parsed
+- the lines before and after the edit keep their instructions. When the edit adds or removes instructions the lines
+  after it move, and of the lines that use labels (dependents, by label) only the ones using a label that moved are
+  resolved again
+- the rom is patched in place, and update returns the patches so a binary on disk can be patched the same way
+
+Macros and .rept blocks span lines, so a source with any directives is assembled whole each time instead (still
+patching the rom with only the bytes that changed).
+Whatever the edits, the instructions, symbols and rom are the same as lib.assemble would make from the whole source.
+"""
+from lib import *
+
+CACHE_SLACK = 4096  # line texts the parse cache can hold beyond the source's before it's pruned
+
+
+class Line:
+    """
+    A line of the source as of the last update. labels are the names it defines and references the ones its
+    instruction uses, address is the address of its instruction (or of the next one, when it has none).
+    """
+
+    __slots__ = ("text", "labels", "tokens", "references", "instruction", "address")
+
+    def __init__(self, text, labels, tokens, references, instruction, address):
+        self.text = text
+        self.labels = labels
+        self.tokens = tokens  # (mnemonic, args, asm) from tokenize_line, None when there's no instruction
+        self.references = references
+        self.instruction = instruction
+        self.address = address
+
+
+class IncrementalAssembler:
+    """
+    The last build: lines (Line objects), symbols (label -> address) and rom (the op codes, a bytearray).
+    hits/misses count the lines found in/missing from the parse cache. An update that raises leaves an empty build,
+    so the one after it starts from scratch (still with the parse cache).
+    """
+
+    def __init__(self, base=PROGRAM_START):
+        self.base = base
+        self.lines = []
+        self.symbols = {}
+        self.rom = bytearray()
+        self.dependents = {}  # label -> the set of Lines that use it
+        self.expanded = None  # the instructions, when the last update assembled the whole source
+        self.parsed = {}  # line text -> (labels, tokens, references, instruction), the instruction only without labels
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def instructions(self):
+        if self.expanded is not None:
+            return self.expanded
+        return [line.instruction for line in self.lines if line.tokens is not None]
+
+    # rebuilds from the new lines of the source, returns the patches that turn the last rom into the new one as
+    # (offset, bytes). When the rom changed size the last patch runs to its end
+    def update(self, texts):
+        texts = list(texts)
+        try:
+            if any(text.lstrip().startswith(".") and text.split(None, 1)[0] in DIRECTIVES for text in texts):
+                return self._assemble_whole(texts)
+            return self._update(texts)
+        except Exception:
+            self.lines, self.symbols, self.rom, self.dependents, self.expanded = [], {}, bytearray(), {}, None
+            raise
+
+    def _update(self, texts):
+        if self.expanded is not None:  # no lines to go by, start from scratch
+            self.rom, self.expanded = bytearray(), None
+        old, base = self.lines, self.base
+        # the edit is everything between the lines that stayed the same at the start and at the end
+        start, common = 0, min(len(old), len(texts))
+        while start < common and old[start].text == texts[start]:
+            start += 1
+        old_end, new_end = len(old), len(texts)
+        while old_end > start and new_end > start and old[old_end - 1].text == texts[new_end - 1]:
+            old_end -= 1
+            new_end -= 1
+        after = old[old_end:]
+        start_address = old[start].address if start < len(old) else base + len(self.rom)
+        end_address = after[0].address if after else base + len(self.rom)
+
+        moved = {}  # label -> its address before the edit, for every label that may have moved
+        for line in old[start:old_end]:
+            for name in line.labels:
+                moved[name] = self.symbols.pop(name)
+            for name in line.references:
+                self.dependents[name].discard(line)
+
+        added = []
+        address = start_address
+        for number, text in enumerate(texts[start:new_end], start + 1):
+            labels, tokens, references, instruction = self._parse(text, number)
+            for name in labels:
+                if name in self.symbols:
+                    raise UnknownAsmException("Label defined twice", label=name, line=number)
+                self.symbols[name] = address
+            line = Line(text, labels, tokens, references, instruction, address)
+            if references:
+                for name in references:
+                    self.dependents.setdefault(name, set()).add(line)
+            added.append(line)
+            if tokens is not None:
+                address += 2
+
+        shift = address - end_address
+        if shift:
+            for line in after:
+                line.address += shift
+                for name in line.labels:
+                    moved[name] = self.symbols[name]
+                    self.symbols[name] += shift
+        self.lines = old[:start] + added + after
+
+        for line in added:
+            if line.references:
+                line.instruction = self._resolve(line)
+        offset = start_address - base
+        self.rom[offset : end_address - base] = b"".join(
+            line.instruction.op_code_bytes for line in added if line.tokens is not None
+        )
+
+        # the lines outside the edit that use a label that moved (or went away, which raises)
+        stale = set()
+        for name, was in moved.items():
+            if self.symbols.get(name) != was:
+                stale.update(self.dependents.get(name, ()))
+        stale.difference_update(added)
+        changed = []
+        for line in stale:
+            instruction = self._resolve(line)
+            if instruction.op_code != line.instruction.op_code:
+                at = line.address - base
+                self.rom[at : at + 2] = instruction.op_code_bytes
+                changed.append(at)
+            line.instruction = instruction
+
+        if len(self.parsed) > len(self.lines) + CACHE_SLACK:
+            self.parsed = {line.text: self.parsed[line.text] for line in self.lines}
+
+        patches = [(at, bytes(self.rom[at : at + 2])) for at in sorted(changed) if not shift or at < offset]
+        if shift:
+            patches.append((offset, bytes(self.rom[offset:])))
+        elif address > start_address:
+            patches.append((offset, bytes(self.rom[offset : address - base])))
+        return patches
+
+    def _assemble_whole(self, texts):
+        instructions, symbols = assemble(texts, self.base)
+        old, rom = self.rom, bytearray(encode(instructions))
+        self.lines, self.symbols, self.rom, self.dependents, self.expanded = [], symbols, rom, {}, instructions
+        start, common = 0, min(len(old), len(rom))
+        while start < common and old[start] == rom[start]:
+            start += 1
+        if len(old) != len(rom):
+            return [(start, bytes(rom[start:]))]
+        end = len(rom)
+        while end > start and old[end - 1] == rom[end - 1]:
+            end -= 1
+        return [(start, bytes(rom[start:end]))] if end > start else []
+
+    # what the line's text tokenizes to, from the cache when the same text was seen before
+    def _parse(self, text, number):
+        entry = self.parsed.get(text)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        labels = {}
+        tokens = tokenize_line(text, number, 0, labels)
+        references, instruction = (), None
+        if tokens is not None:
+            references = tuple(arg.value for arg in tokens[1] if type(arg) == Label)
+            if not references:
+                instruction = match_asm(*tokens)
+        entry = self.parsed[text] = (tuple(labels), tokens, references, instruction)
+        return entry
+
+    # the line's instruction with its labels swapped for their current addresses
+    def _resolve(self, line):
+        ins, args, asm = line.tokens
+        try:
+            return resolve_line(ins, args, asm, None, self.symbols)
+        except UnknownAsmException as e:
+            e.kwargs["line"] = self.lines.index(line) + 1
+            raise
+
+
+# applies update's patches to the binary at path (which has the rom from before the update), leaving it size bytes
+def patch_file(path, patches, size):
+    with open(path, "r+b") as out:
+        for offset, data in patches:
+            out.seek(offset)
+            out.write(data)
+        out.truncate(size)
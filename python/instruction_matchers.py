@@ -15,44 +15,59 @@ class InstructionMatcher:
     def from_op_code(self, op_code):
         raise NotYetImplemented(op_code=op_code)
 
+    MNEMONIC = None  # mnemonic the asm has to start with, None matches any mnemonic
+    ARG_TYPES = ()  # Argument types that have to follow the mnemonic
+
     def matches_asm(self, asm):
-        raise NotYetImplemented(asm=asm)
+        ins, args = AsmParser.parse_asm(asm)
+        return ins == self.MNEMONIC and self.matches_args(args)
 
     def from_asm(self, asm):
-        raise NotYetImplemented(asm=asm)
+        ins, args = AsmParser.parse_asm(asm)
+        return self.from_args(args, asm)
+
+    # the *_args methods work on an already tokenized line, so the asm only has to be split/parsed once
+    def matches_args(self, args):
+        return len(args) == len(self.ARG_TYPES) and all(
+            type(arg) == arg_type for arg, arg_type in zip(args, self.ARG_TYPES)
+        )
+
+    def from_args(self, args, asm):
+        raise NotYetImplemented(args=args, asm=asm)
 
 
 class ClearScreenMatcher(InstructionMatcher):
+    MNEMONIC = ClearScreen.MNEMONIC
+    ARG_TYPES = ()
+
     def matches_op_code(self, op_code):
         return int.from_bytes(op_code, "big") == 0x00E0
 
     def from_op_code(self, op_code):
         return ClearScreen(op_code=op_code)
 
-    def matches_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
-        return ins == ClearScreen.MNEMONIC and len(args) == 0
-
-    def from_asm(self, asm):
+    def from_args(self, args, asm):
         return ClearScreen(asm=asm)
 
 
 class ReturnFromFunctionMatcher(InstructionMatcher):
+    MNEMONIC = ReturnFromFunction.MNEMONIC
+    ARG_TYPES = ()
+
     def matches_op_code(self, op_code):
         return int.from_bytes(op_code, "big") == 0x00EE
 
     def from_op_code(self, op_code):
         return ReturnFromFunction(op_code=op_code)
 
-    def matches_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
-        return ins == ReturnFromFunction.MNEMONIC and len(args) == 0
-
-    def from_asm(self, asm):
+    def from_args(self, args, asm):
         return ReturnFromFunction(asm=asm)
 
 
 class CallNativeCodeMatcher(InstructionMatcher):
+    MNEMONIC = CallNativeCode.MNEMONIC
+    ARG_TYPES = (Address,)
+
     def matches_op_code(self, op_code):
         return (op_code[0] & 0xF0) == 0x00
 
@@ -60,16 +75,14 @@ class CallNativeCodeMatcher(InstructionMatcher):
         address = Address(int.from_bytes(op_code, "big") & 0x0FFF)
         return CallNativeCode(address, op_code=op_code)
 
-    def matches_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
-        return ins == CallNativeCode.MNEMONIC and len(args) == 1 and type(args[0]) == Address
-
-    def from_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
+    def from_args(self, args, asm):
         return CallNativeCode(args[0], asm=asm)
 
 
 class JumpToAddressMatcher(InstructionMatcher):
+    MNEMONIC = JumpToAddress.MNEMONIC
+    ARG_TYPES = (Address,)
+
     def matches_op_code(self, op_code):
         return (op_code[0] & 0xF0) == 0x10
 
@@ -77,16 +90,14 @@ class JumpToAddressMatcher(InstructionMatcher):
         address = Address(int.from_bytes(op_code, "big") & 0x0FFF)
         return JumpToAddress(address, op_code=op_code)
 
-    def matches_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
-        return ins == JumpToAddress.MNEMONIC and len(args) == 1 and type(args[0]) == Address
-
-    def from_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
+    def from_args(self, args, asm):
         return JumpToAddress(args[0], asm=asm)
 
 
 class CallFunctionMatcher(InstructionMatcher):
+    MNEMONIC = CallFunction.MNEMONIC
+    ARG_TYPES = (Address,)
+
     def matches_op_code(self, op_code):
         return (op_code[0] & 0xF0) == 0x20
 
@@ -94,16 +105,14 @@ class CallFunctionMatcher(InstructionMatcher):
         address = Address(int.from_bytes(op_code, "big") & 0x0FFF)
         return CallFunction(address, op_code=op_code)
 
-    def matches_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
-        return ins == CallFunction.MNEMONIC and len(args) == 1 and type(args[0]) == Address
-
-    def from_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
+    def from_args(self, args, asm):
         return CallFunction(args[0], asm=asm)
 
 
 class SkipNextInstructionIfEqualsConstMatcher(InstructionMatcher):
+    MNEMONIC = SkipNextInstructionIfEqualsConst.MNEMONIC
+    ARG_TYPES = (Register, Constant)
+
     def matches_op_code(self, op_code):
         return (op_code[0] & 0xF0) == 0x30
 
@@ -112,21 +121,14 @@ class SkipNextInstructionIfEqualsConstMatcher(InstructionMatcher):
         const = Constant(op_code[1] & 0xFF)
         return SkipNextInstructionIfEqualsConst(register, const, op_code=op_code)
 
-    def matches_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
-        return (
-            ins == SkipNextInstructionIfEqualsConst.MNEMONIC
-            and len(args) == 2
-            and type(args[0]) == Register
-            and type(args[1]) == Constant
-        )
-
-    def from_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
+    def from_args(self, args, asm):
         return SkipNextInstructionIfEqualsConst(args[0], args[1], asm=asm)
 
 
 class SkipNextInstructionIfNotEqualsConstMatcher(InstructionMatcher):
+    MNEMONIC = SkipNextInstructionIfNotEqualsConst.MNEMONIC
+    ARG_TYPES = (Register, Constant)
+
     def matches_op_code(self, op_code):
         return (op_code[0] & 0xF0) == 0x40
 
@@ -135,21 +137,14 @@ class SkipNextInstructionIfNotEqualsConstMatcher(InstructionMatcher):
         const = Constant(op_code[1] & 0xFF)
         return SkipNextInstructionIfNotEqualsConst(register, const, op_code)
 
-    def matches_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
-        return (
-            ins == SkipNextInstructionIfNotEqualsConst.MNEMONIC
-            and len(args) == 2
-            and type(args[0]) == Register
-            and type(args[1]) == Constant
-        )
-
-    def from_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
+    def from_args(self, args, asm):
         return SkipNextInstructionIfNotEqualsConst(args[0], args[1], asm=asm)
 
 
 class SkipNextInstructionIfRegistersEqualMatcher(InstructionMatcher):
+    MNEMONIC = SkipNextInstructionIfRegistersEqual.MNEMONIC
+    ARG_TYPES = (Register, Register)
+
     def matches_op_code(self, op_code):
         return (op_code[0] & 0xF0) == 0x50
         # the spec actually expects this op code to end with a 0 -> e.g. 0x5XY0, but I'm going to allow any kind of value in the last nibble (which might be out of spec)
@@ -159,21 +154,14 @@ class SkipNextInstructionIfRegistersEqualMatcher(InstructionMatcher):
         reg2 = Register((op_code[1] & 0xF0) >> 4)
         return SkipNextInstructionIfRegistersEqual(reg1, reg2, op_code=op_code)
 
-    def matches_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
-        return (
-            ins == SkipNextInstructionIfRegistersEqual.MNEMONIC
-            and len(args) == 2
-            and type(args[0]) == Register
-            and type(args[1]) == Register
-        )
-
-    def from_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
+    def from_args(self, args, asm):
         return SkipNextInstructionIfRegistersEqual(args[0], args[1], asm=asm)
 
 
 class LoadConstantIntoRegisterMatcher(InstructionMatcher):
+    MNEMONIC = LoadConstantIntoRegister.MNEMONIC
+    ARG_TYPES = (Register, Constant)
+
     def matches_op_code(self, op_code):
         return (op_code[0] & 0xF0) == 0x60
 
@@ -182,21 +170,14 @@ class LoadConstantIntoRegisterMatcher(InstructionMatcher):
         const = Constant(op_code[1] & 0xFF)
         return LoadConstantIntoRegister(register, const, op_code=op_code)
 
-    def matches_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
-        return (
-            ins == LoadConstantIntoRegister.MNEMONIC
-            and len(args) == 2
-            and type(args[0]) == Register
-            and type(args[1]) == Constant
-        )
-
-    def from_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
+    def from_args(self, args, asm):
         return LoadConstantIntoRegister(args[0], args[1], asm=asm)
 
 
 class AddConstantToRegisterMatcher(InstructionMatcher):
+    MNEMONIC = AddConstantToRegister.MNEMONIC
+    ARG_TYPES = (Register, Constant)
+
     def matches_op_code(self, op_code):
         return (op_code[0] & 0xF0) == 0x70
 
@@ -205,21 +186,14 @@ class AddConstantToRegisterMatcher(InstructionMatcher):
         const = Constant(op_code[1] & 0xFF)
         return AddConstantToRegister(register, const, op_code=op_code)
 
-    def matches_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
-        return (
-            ins == AddConstantToRegister.MNEMONIC
-            and len(args) == 2
-            and type(args[0]) == Register
-            and type(args[1]) == Constant
-        )
-
-    def from_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
+    def from_args(self, args, asm):
         return AddConstantToRegister(args[0], args[1], asm=asm)
 
 
 class LoadRegisterIntoRegisterMatcher(InstructionMatcher):
+    MNEMONIC = LoadRegisterIntoRegister.MNEMONIC
+    ARG_TYPES = (Register, Register)
+
     def matches_op_code(self, op_code):
         return (op_code[0] & 0xF0) == 0x80 and (op_code[1] & 0x0F) == 0x00
 
@@ -228,21 +202,14 @@ class LoadRegisterIntoRegisterMatcher(InstructionMatcher):
         reg2 = Register((op_code[1] & 0xF0) >> 4)
         return LoadRegisterIntoRegister(reg1, reg2, op_code=op_code)
 
-    def matches_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
-        return (
-            ins == LoadRegisterIntoRegister.MNEMONIC
-            and len(args) == 2
-            and type(args[0]) == Register
-            and type(args[1]) == Register
-        )
-
-    def from_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
+    def from_args(self, args, asm):
         return LoadRegisterIntoRegister(args[0], args[1], asm=asm)
 
 
 class OrRegistersMatcher(InstructionMatcher):
+    MNEMONIC = OrRegisters.MNEMONIC
+    ARG_TYPES = (Register, Register)
+
     def matches_op_code(self, op_code):
         return (op_code[0] & 0xF0) == 0x80 and (op_code[1] & 0x0F) == 0x01
 
@@ -251,18 +218,14 @@ class OrRegistersMatcher(InstructionMatcher):
         reg2 = Register((op_code[1] & 0xF0) >> 4)
         return OrRegisters(reg1, reg2, op_code=op_code)
 
-    def matches_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
-        return (
-            ins == OrRegisters.MNEMONIC and len(args) == 2 and type(args[0]) == Register and type(args[1]) == Register
-        )
-
-    def from_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
+    def from_args(self, args, asm):
         return OrRegisters(args[0], args[1], asm=asm)
 
 
 class AndRegistersMatcher(InstructionMatcher):
+    MNEMONIC = AndRegisters.MNEMONIC
+    ARG_TYPES = (Register, Register)
+
     def matches_op_code(self, op_code):
         return (op_code[0] & 0xF0) == 0x80 and (op_code[1] & 0x0F) == 0x02
 
@@ -271,18 +234,14 @@ class AndRegistersMatcher(InstructionMatcher):
         reg2 = Register((op_code[1] & 0xF0) >> 4)
         return AndRegisters(reg1, reg2, op_code=op_code)
 
-    def matches_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
-        return (
-            ins == AndRegisters.MNEMONIC and len(args) == 2 and type(args[0]) == Register and type(args[1]) == Register
-        )
-
-    def from_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
+    def from_args(self, args, asm):
         return AndRegisters(args[0], args[1], asm=asm)
 
 
 class XorRegistersMatcher(InstructionMatcher):
+    MNEMONIC = XorRegisters.MNEMONIC
+    ARG_TYPES = (Register, Register)
+
     def matches_op_code(self, op_code):
         return (op_code[0] & 0xF0) == 0x80 and (op_code[1] & 0x0F) == 0x03
 
@@ -291,18 +250,14 @@ class XorRegistersMatcher(InstructionMatcher):
         reg2 = Register((op_code[1] & 0xF0) >> 4)
         return XorRegisters(reg1, reg2, op_code=op_code)
 
-    def matches_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
-        return (
-            ins == XorRegisters.MNEMONIC and len(args) == 2 and type(args[0]) == Register and type(args[1]) == Register
-        )
-
-    def from_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
+    def from_args(self, args, asm):
         return XorRegisters(args[0], args[1], asm=asm)
 
 
 class AddRegistersMatcher(InstructionMatcher):
+    MNEMONIC = AddRegisters.MNEMONIC
+    ARG_TYPES = (Register, Register)
+
     def matches_op_code(self, op_code):
         return (op_code[0] & 0xF0) == 0x80 and (op_code[1] & 0x0F) == 0x04
 
@@ -311,18 +266,14 @@ class AddRegistersMatcher(InstructionMatcher):
         reg2 = Register((op_code[1] & 0xF0) >> 4)
         return AddRegisters(reg1, reg2, op_code=op_code)
 
-    def matches_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
-        return (
-            ins == AddRegisters.MNEMONIC and len(args) == 2 and type(args[0]) == Register and type(args[1]) == Register
-        )
-
-    def from_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
+    def from_args(self, args, asm):
         return AddRegisters(args[0], args[1], asm=asm)
 
 
 class SubtractRegistersMatcher(InstructionMatcher):
+    MNEMONIC = SubtractRegisters.MNEMONIC
+    ARG_TYPES = (Register, Register)
+
     def matches_op_code(self, op_code):
         return (op_code[0] & 0xF0) == 0x80 and (op_code[1] & 0x0F) == 0x05
 
@@ -331,21 +282,14 @@ class SubtractRegistersMatcher(InstructionMatcher):
         reg2 = Register((op_code[1] & 0xF0) >> 4)
         return SubtractRegisters(reg1, reg2, op_code=op_code)
 
-    def matches_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
-        return (
-            ins == SubtractRegisters.MNEMONIC
-            and len(args) == 2
-            and type(args[0]) == Register
-            and type(args[1]) == Register
-        )
-
-    def from_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
+    def from_args(self, args, asm):
         return SubtractRegisters(args[0], args[1], asm=asm)
 
 
 class ShiftRightRegisterMatcher(InstructionMatcher):
+    MNEMONIC = ShiftRightRegister.MNEMONIC
+    ARG_TYPES = (Register, Register)
+
     def matches_op_code(self, op_code):
         return (op_code[0] & 0xF0) == 0x80 and (op_code[1] & 0x0F) == 0x06
 
@@ -354,21 +298,14 @@ class ShiftRightRegisterMatcher(InstructionMatcher):
         reg2 = Register((op_code[1] & 0xF0) >> 4)
         return ShiftRightRegister(reg1, reg2, op_code=op_code)
 
-    def matches_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
-        return (
-            ins == ShiftRightRegister.MNEMONIC
-            and len(args) == 2
-            and type(args[0]) == Register
-            and type(args[1]) == Register
-        )
-
-    def from_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
+    def from_args(self, args, asm):
         return ShiftRightRegister(args[0], args[1], asm=asm)
 
 
 class ReverseSubtractRegistersMatcher(InstructionMatcher):
+    MNEMONIC = ReverseSubtractRegisters.MNEMONIC
+    ARG_TYPES = (Register, Register)
+
     def matches_op_code(self, op_code):
         return (op_code[0] & 0xF0) == 0x80 and (op_code[1] & 0x0F) == 0x07
 
@@ -377,21 +314,14 @@ class ReverseSubtractRegistersMatcher(InstructionMatcher):
         reg2 = Register((op_code[1] & 0xF0) >> 4)
         return ReverseSubtractRegisters(reg1, reg2, op_code=op_code)
 
-    def matches_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
-        return (
-            ins == ReverseSubtractRegisters.MNEMONIC
-            and len(args) == 2
-            and type(args[0]) == Register
-            and type(args[1]) == Register
-        )
-
-    def from_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
+    def from_args(self, args, asm):
         return ReverseSubtractRegisters(args[0], args[1], asm=asm)
 
 
 class ShiftLeftRegisterMatcher(InstructionMatcher):
+    MNEMONIC = ShiftLeftRegister.MNEMONIC
+    ARG_TYPES = (Register, Register)
+
     def matches_op_code(self, op_code):
         return (op_code[0] & 0xF0) == 0x80 and (op_code[1] & 0x0F) == 0x0E
 
@@ -400,21 +330,14 @@ class ShiftLeftRegisterMatcher(InstructionMatcher):
         reg2 = Register((op_code[1] & 0xF0) >> 4)
         return ShiftLeftRegister(reg1, reg2, op_code=op_code)
 
-    def matches_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
-        return (
-            ins == ShiftLeftRegister.MNEMONIC
-            and len(args) == 2
-            and type(args[0]) == Register
-            and type(args[1]) == Register
-        )
-
-    def from_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
+    def from_args(self, args, asm):
         return ShiftLeftRegister(args[0], args[1], asm=asm)
 
 
 class SkipNextInstructionIfRegistersNotEqualsMatcher(InstructionMatcher):
+    MNEMONIC = SkipNextInstructionIfRegistersNotEquals.MNEMONIC
+    ARG_TYPES = (Register, Register)
+
     def matches_op_code(self, op_code):
         return (op_code[0] & 0xF0) == 0x90
         # the spec actually expects this op code to end with a 0 -> e.g. 0x5XY0, but I'm going to allow any kind of value in the last nibble (which might be out of spec)
@@ -425,21 +348,14 @@ class SkipNextInstructionIfRegistersNotEqualsMatcher(InstructionMatcher):
         reg2 = Register((op_code[1] & 0xF0) >> 4)
         return SkipNextInstructionIfRegistersNotEquals(reg1, reg2, op_code=op_code)
 
-    def matches_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
-        return (
-            ins == SkipNextInstructionIfRegistersNotEquals.MNEMONIC
-            and len(args) == 2
-            and type(args[0]) == Register
-            and type(args[1]) == Register
-        )
-
-    def from_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
+    def from_args(self, args, asm):
         return SkipNextInstructionIfRegistersNotEquals(args[0], args[1], asm=asm)
 
 
 class SetAddressRegisterMatcher(InstructionMatcher):
+    MNEMONIC = SetAddressRegister.MNEMONIC
+    ARG_TYPES = (Address,)
+
     def matches_op_code(self, op_code):
         return (op_code[0] & 0xF0) == 0xA0
 
@@ -447,16 +363,14 @@ class SetAddressRegisterMatcher(InstructionMatcher):
         address = Address(int.from_bytes(op_code, "big") & 0x0FFF)
         return SetAddressRegister(address, op_code=op_code)
 
-    def matches_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
-        return ins == SetAddressRegister.MNEMONIC and len(args) == 1 and type(args[0]) == Address
-
-    def from_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
+    def from_args(self, args, asm):
         return SetAddressRegister(args[0], asm=asm)
 
 
 class JumpToAddressPlusV0Matcher(InstructionMatcher):
+    MNEMONIC = JumpToAddressPlusV0.MNEMONIC
+    ARG_TYPES = (Address,)
+
     def matches_op_code(self, op_code):
         return (op_code[0] & 0xF0) == 0xB0
 
@@ -464,16 +378,14 @@ class JumpToAddressPlusV0Matcher(InstructionMatcher):
         address = Address(int.from_bytes(op_code, "big") & 0x0FFF)
         return JumpToAddressPlusV0(address, op_code=op_code)
 
-    def matches_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
-        return ins == JumpToAddressPlusV0.MNEMONIC and len(args) == 1 and type(args[0]) == Address
-
-    def from_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
+    def from_args(self, args, asm):
         return JumpToAddressPlusV0(args[0], asm=asm)
 
 
 class GenerateRandomNumberWithMaskMatcher(InstructionMatcher):
+    MNEMONIC = GenerateRandomNumberWithMask.MNEMONIC
+    ARG_TYPES = (Register, Constant)
+
     def matches_op_code(self, op_code):
         return (op_code[0] & 0xF0) == 0xC0
 
@@ -482,21 +394,14 @@ class GenerateRandomNumberWithMaskMatcher(InstructionMatcher):
         const = Constant(op_code[1] & 0xFF)
         return GenerateRandomNumberWithMask(register, const, op_code=op_code)
 
-    def matches_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
-        return (
-            ins == GenerateRandomNumberWithMask.MNEMONIC
-            and len(args) == 2
-            and type(args[0]) == Register
-            and type(args[1]) == Constant
-        )
-
-    def from_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
+    def from_args(self, args, asm):
         return GenerateRandomNumberWithMask(args[0], args[1], asm=asm)
 
 
 class DrawSpriteMatcher(InstructionMatcher):
+    MNEMONIC = DrawSprite.MNEMONIC
+    ARG_TYPES = (Register, Register, Nibble)
+
     def matches_op_code(self, op_code):
         return (op_code[0] & 0xF0) == 0xD0
 
@@ -506,22 +411,14 @@ class DrawSpriteMatcher(InstructionMatcher):
         nibble = Nibble(op_code[1] & 0x0F)
         return DrawSprite(reg1, reg2, nibble, op_code=op_code)
 
-    def matches_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
-        return (
-            ins == DrawSprite.MNEMONIC
-            and len(args) == 3
-            and type(args[0]) == Register
-            and type(args[1]) == Register
-            and type(args[2]) == Nibble
-        )
-
-    def from_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
+    def from_args(self, args, asm):
         return DrawSprite(args[0], args[1], args[2], asm=asm)
 
 
 class SkipIfKeyPressedMatcher(InstructionMatcher):
+    MNEMONIC = SkipIfKeyPressed.MNEMONIC
+    ARG_TYPES = (Register,)
+
     def matches_op_code(self, op_code):
         return (op_code[0] & 0xF0) == 0xE0 and (op_code[1] & 0xFF) == 0x9E
 
@@ -529,16 +426,14 @@ class SkipIfKeyPressedMatcher(InstructionMatcher):
         reg = Register(op_code[0] & 0x0F)
         return SkipIfKeyPressed(reg, op_code=op_code)
 
-    def matches_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
-        return ins == SkipIfKeyPressed.MNEMONIC and len(args) == 1 and type(args[0]) == Register
-
-    def from_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
+    def from_args(self, args, asm):
         return SkipIfKeyPressed(args[0], asm=asm)
 
 
 class SkipIfKeyNotPressedMatcher(InstructionMatcher):
+    MNEMONIC = SkipIfKeyNotPressed.MNEMONIC
+    ARG_TYPES = (Register,)
+
     def matches_op_code(self, op_code):
         return (op_code[0] & 0xF0) == 0xE0 and (op_code[1] & 0xFF) == 0xA1
 
@@ -546,16 +441,14 @@ class SkipIfKeyNotPressedMatcher(InstructionMatcher):
         reg = Register(op_code[0] & 0x0F)
         return SkipIfKeyNotPressed(reg, op_code=op_code)
 
-    def matches_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
-        return ins == SkipIfKeyNotPressed.MNEMONIC and len(args) == 1 and type(args[0]) == Register
-
-    def from_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
+    def from_args(self, args, asm):
         return SkipIfKeyNotPressed(args[0], asm=asm)
 
 
 class LoadDelayTimerIntoRegisterMatcher(InstructionMatcher):
+    MNEMONIC = LoadDelayTimerIntoRegister.MNEMONIC
+    ARG_TYPES = (Register,)
+
     def matches_op_code(self, op_code):
         return (op_code[0] & 0xF0) == 0xF0 and (op_code[1] & 0xFF) == 0x07
 
@@ -563,16 +456,14 @@ class LoadDelayTimerIntoRegisterMatcher(InstructionMatcher):
         reg = Register(op_code[0] & 0x0F)
         return LoadDelayTimerIntoRegister(reg, op_code=op_code)
 
-    def matches_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
-        return ins == LoadDelayTimerIntoRegister.MNEMONIC and len(args) == 1 and type(args[0]) == Register
-
-    def from_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
+    def from_args(self, args, asm):
         return LoadDelayTimerIntoRegister(args[0], asm=asm)
 
 
 class WaitForKeyPressLoadIntoRegisterMatcher(InstructionMatcher):
+    MNEMONIC = WaitForKeyPressLoadIntoRegister.MNEMONIC
+    ARG_TYPES = (Register,)
+
     def matches_op_code(self, op_code):
         return (op_code[0] & 0xF0) == 0xF0 and (op_code[1] & 0xFF) == 0x0A
 
@@ -580,16 +471,14 @@ class WaitForKeyPressLoadIntoRegisterMatcher(InstructionMatcher):
         reg = Register(op_code[0] & 0x0F)
         return WaitForKeyPressLoadIntoRegister(reg, op_code=op_code)
 
-    def matches_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
-        return ins == WaitForKeyPressLoadIntoRegister.MNEMONIC and len(args) == 1 and type(args[0]) == Register
-
-    def from_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
+    def from_args(self, args, asm):
         return WaitForKeyPressLoadIntoRegister(args[0], asm=asm)
 
 
 class SetDelayTimerMatcher(InstructionMatcher):
+    MNEMONIC = SetDelayTimer.MNEMONIC
+    ARG_TYPES = (Register,)
+
     def matches_op_code(self, op_code):
         return (op_code[0] & 0xF0) == 0xF0 and (op_code[1] & 0xFF) == 0x15
 
@@ -597,16 +486,14 @@ class SetDelayTimerMatcher(InstructionMatcher):
         reg = Register(op_code[0] & 0x0F)
         return SetDelayTimer(reg, op_code=op_code)
 
-    def matches_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
-        return ins == SetDelayTimer.MNEMONIC and len(args) == 1 and type(args[0]) == Register
-
-    def from_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
+    def from_args(self, args, asm):
         return SetDelayTimer(args[0], asm=asm)
 
 
 class SetSoundTimerMatcher(InstructionMatcher):
+    MNEMONIC = SetSoundTimer.MNEMONIC
+    ARG_TYPES = (Register,)
+
     def matches_op_code(self, op_code):
         return (op_code[0] & 0xF0) == 0xF0 and (op_code[1] & 0xFF) == 0x18
 
@@ -614,16 +501,14 @@ class SetSoundTimerMatcher(InstructionMatcher):
         reg = Register(op_code[0] & 0x0F)
         return SetSoundTimer(reg, op_code=op_code)
 
-    def matches_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
-        return ins == SetSoundTimer.MNEMONIC and len(args) == 1 and type(args[0]) == Register
-
-    def from_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
+    def from_args(self, args, asm):
         return SetSoundTimer(args[0], asm=asm)
 
 
 class AddRegisterToAddressRegisterMatcher(InstructionMatcher):
+    MNEMONIC = AddRegisterToAddressRegister.MNEMONIC
+    ARG_TYPES = (Register,)
+
     def matches_op_code(self, op_code):
         return (op_code[0] & 0xF0) == 0xF0 and (op_code[1] & 0xFF) == 0x1E
 
@@ -631,16 +516,14 @@ class AddRegisterToAddressRegisterMatcher(InstructionMatcher):
         reg = Register(op_code[0] & 0x0F)
         return AddRegisterToAddressRegister(reg, op_code=op_code)
 
-    def matches_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
-        return ins == AddRegisterToAddressRegister.MNEMONIC and len(args) == 1 and type(args[0]) == Register
-
-    def from_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
+    def from_args(self, args, asm):
         return AddRegisterToAddressRegister(args[0], asm=asm)
 
 
 class SetAddressRegisterToSpriteInRegisterMatcher(InstructionMatcher):
+    MNEMONIC = SetAddressRegisterToSpriteInRegister.MNEMONIC
+    ARG_TYPES = (Register,)
+
     def matches_op_code(self, op_code):
         return (op_code[0] & 0xF0) == 0xF0 and (op_code[1] & 0xFF) == 0x29
 
@@ -648,16 +531,14 @@ class SetAddressRegisterToSpriteInRegisterMatcher(InstructionMatcher):
         reg = Register(op_code[0] & 0x0F)
         return SetAddressRegisterToSpriteInRegister(reg, op_code=op_code)
 
-    def matches_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
-        return ins == SetAddressRegisterToSpriteInRegister.MNEMONIC and len(args) == 1 and type(args[0]) == Register
-
-    def from_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
+    def from_args(self, args, asm):
         return SetAddressRegisterToSpriteInRegister(args[0], asm=asm)
 
 
 class BCDDecodeRegisterMatcher(InstructionMatcher):
+    MNEMONIC = BCDDecodeRegister.MNEMONIC
+    ARG_TYPES = (Register,)
+
     def matches_op_code(self, op_code):
         return (op_code[0] & 0xF0) == 0xF0 and (op_code[1] & 0xFF) == 0x33
 
@@ -665,16 +546,14 @@ class BCDDecodeRegisterMatcher(InstructionMatcher):
         reg = Register(op_code[0] & 0x0F)
         return BCDDecodeRegister(reg, op_code=op_code)
 
-    def matches_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
-        return ins == BCDDecodeRegister.MNEMONIC and len(args) == 1 and type(args[0]) == Register
-
-    def from_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
+    def from_args(self, args, asm):
         return BCDDecodeRegister(args[0], asm=asm)
 
 
 class StoreRegistersMatcher(InstructionMatcher):
+    MNEMONIC = StoreRegisters.MNEMONIC
+    ARG_TYPES = (Register,)
+
     def matches_op_code(self, op_code):
         return (op_code[0] & 0xF0) == 0xF0 and (op_code[1] & 0xFF) == 0x55
 
@@ -682,16 +561,14 @@ class StoreRegistersMatcher(InstructionMatcher):
         reg = Register(op_code[0] & 0x0F)
         return StoreRegisters(reg, op_code=op_code)
 
-    def matches_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
-        return ins == StoreRegisters.MNEMONIC and len(args) == 1 and type(args[0]) == Register
-
-    def from_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
+    def from_args(self, args, asm):
         return StoreRegisters(args[0], asm=asm)
 
 
 class ReadRegistersMatcher(InstructionMatcher):
+    MNEMONIC = ReadRegisters.MNEMONIC
+    ARG_TYPES = (Register,)
+
     def matches_op_code(self, op_code):
         return (op_code[0] & 0xF0) == 0xF0 and (op_code[1] & 0xFF) == 0x65
 
@@ -699,12 +576,7 @@ class ReadRegistersMatcher(InstructionMatcher):
         reg = Register(op_code[0] & 0x0F)
         return ReadRegisters(reg, op_code=op_code)
 
-    def matches_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
-        return ins == ReadRegisters.MNEMONIC and len(args) == 1 and type(args[0]) == Register
-
-    def from_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
+    def from_args(self, args, asm):
         return ReadRegisters(args[0], asm=asm)
 
 
@@ -718,8 +590,10 @@ class FallBackMatcher(InstructionMatcher):
     def matches_asm(self, asm):
         return True
 
-    def from_asm(self, asm):
-        ins, args = AsmParser.parse_asm(asm)
+    def matches_args(self, args):
+        return True
+
+    def from_args(self, args, asm):
         return Instruction(args, op_code=None, asm="ERR!")
 
 
@@ -1,33 +1,84 @@
 from arguments import *
 
+_set = object.__setattr__  # for writing the slots of an Instruction, which otherwise refuses writes
+
+
+# read only attribute that returns one of the instruction's args, so subclasses don't store each arg a second time
+def argument(index):
+    return property(lambda self: self.args[index])
+
 
 class Instruction:
     """
     Represents a chip8 instruction/op code. These objects can output representations of themselves in binary/op-code or asm
   """
 
+    __slots__ = (  # no per instance __dict__, millions of these get held in memory
+        "args",
+        "_op_code",
+        "_asm",
+        "_cached_op_code",
+        "_cached_asm",
+        "_cached_op_code_bytes",
+    )
+
     def __init__(
         self,
         args,  # list of Argument objects
         op_code=None,  # original op code, from disassembling e.g. 0x00EE
         asm=None,  # e.g. original asm instruction, eg. CALL 0x123
     ):
-        self.args = args
-        self._op_code = op_code
-        self._asm = (
-            asm  # these are mostly populated from cowgod's reverse engineered spec, but they may be slightly different
-        )
+        # instructions can't be changed once made (the args neither), so their encodings can be cached and the same
+        # object shared by everything that decodes the op code (see lib.InstructionCache). The _cached_ slots are left
+        # unset until they're first needed, every write in here costs a call
+        _set(self, "args", tuple(args))
+        _set(self, "_op_code", op_code)
+        # these are mostly populated from cowgod's reverse engineered spec, but they may be slightly different
+        _set(self, "_asm", asm)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("{} is immutable, make a new one instead".format(type(self).__name__))
+
+    def __delattr__(self, name):
+        raise AttributeError("{} is immutable, make a new one instead".format(type(self).__name__))
+
+    def __reduce__(self):  # pickling/copying has to go through __init__ too, every subclass takes its args in order
+        if type(self) == Instruction:
+            return Instruction, (self.args, self._op_code, self._asm)
+        return type(self), self.args + (self._op_code, self._asm)
+
+    @property
+    def op_code(self):
+        try:
+            return self._cached_op_code
+        except AttributeError:  # only computed the first time it's accessed
+            _set(self, "_cached_op_code", self.compute_op_code())
+            return self._cached_op_code
 
     @property
-    def op_code(self):  # computes the op_code from the instruction and args
+    def op_code_bytes(self):  # the op code as the 2 big endian bytes that get written to a rom
+        try:
+            return self._cached_op_code_bytes
+        except AttributeError:
+            _set(self, "_cached_op_code_bytes", self.op_code.to_bytes(2, byteorder="big"))
+            return self._cached_op_code_bytes
+
+    @property
+    def asm(self):
+        try:
+            return self._cached_asm
+        except AttributeError:  # only computed the first time it's accessed
+            _set(self, "_cached_asm", self.compute_asm())
+            return self._cached_asm
+
+    def compute_op_code(self):  # computes the op_code from the instruction and args
         if type(self._op_code) == bytes:
             return int.from_bytes(self._op_code, byteorder="big")
         if len(self.args) > 0 and self.args[0]:
             return self.args[0].value
         return self._op_code
 
-    @property
-    def asm(self):  # computes the asm string from the instruction and the args
+    def compute_asm(self):  # computes the asm string from the instruction and the args
         return "{}\t{}".format(self._asm, "r%#x" % self.op_code)
 
     def __repr__(self):
@@ -41,579 +92,540 @@ class Instruction:
 
 class ClearScreen(Instruction):
     MNEMONIC = "CLS"  # (Applies to everywhere this pattern is used) I would like to make this a constant, but it seems like python doesn't support it out-of-the-box (I think mypy supports it, but I'm not using mypy)
+    __slots__ = ()
 
     def __init__(self, op_code=None, asm=None):
         super().__init__([], op_code, asm)
 
-    @property
-    def op_code(self):
+    def compute_op_code(self):
         return 0x00E0
 
-    @property
-    def asm(self):
+    def compute_asm(self):
         return ClearScreen.MNEMONIC
 
 
 class ReturnFromFunction(Instruction):
     MNEMONIC = "RTN"
+    __slots__ = ()
 
     def __init__(self, op_code=None, asm=None):
         super().__init__([], op_code, asm)
 
-    @property
-    def op_code(self):
+    def compute_op_code(self):
         return 0x00EE
 
-    @property
-    def asm(self):
+    def compute_asm(self):
         return ReturnFromFunction.MNEMONIC
 
 
 class CallNativeCode(Instruction):
     MNEMONIC = "SYS"
+    __slots__ = ()
+    address = argument(0)
 
     def __init__(self, address, op_code=None, asm=None):
         super().__init__([address], op_code, asm)
-        self.address = address
 
-    @property
-    def op_code(self):
+    def compute_op_code(self):
         return 0x0000 ^ self.address.value
 
-    @property
-    def asm(self):
+    def compute_asm(self):
         return "{}\t{}".format(self.MNEMONIC, self.address)
 
 
 class JumpToAddress(Instruction):
     MNEMONIC = "JMP"
+    __slots__ = ()
+    address = argument(0)
 
     def __init__(self, address, op_code=None, asm=None):
         super().__init__([address], op_code, asm)
-        self.address = address
 
-    @property
-    def op_code(self):
+    def compute_op_code(self):
         return 0x1000 ^ self.address.value
 
-    @property
-    def asm(self):
+    def compute_asm(self):
         return "{}\t{}".format(self.MNEMONIC, self.address)
 
 
 class CallFunction(Instruction):
     MNEMONIC = "CALL"
+    __slots__ = ()
+    address = argument(0)
 
     def __init__(self, address, op_code=None, asm=None):
         super().__init__([address], op_code, asm)
-        self.address = address
 
-    @property
-    def op_code(self):
+    def compute_op_code(self):
         return 0x2000 ^ self.address.value
 
-    @property
-    def asm(self):
+    def compute_asm(self):
         return "{}\t{}".format(self.MNEMONIC, self.address)
 
 
 class SkipNextInstructionIfEqualsConst(Instruction):
     MNEMONIC = "SE"
+    __slots__ = ()
+    register = argument(0)
+    const = argument(1)
 
     def __init__(self, register, const, op_code=None, asm=None):
         super().__init__([register, const], op_code, asm)
-        self.register = register
-        self.const = const
 
-    @property
-    def op_code(self):
+    def compute_op_code(self):
         return 0x3000 ^ (self.register.value << 8) ^ (self.const.value)
 
-    @property
-    def asm(self):
+    def compute_asm(self):
         return "{}\t{} {}".format(self.MNEMONIC, self.register, self.const)
 
 
 class SkipNextInstructionIfNotEqualsConst(Instruction):
     MNEMONIC = "SNE"
+    __slots__ = ()
+    register = argument(0)
+    const = argument(1)
 
     def __init__(self, register, const, op_code=None, asm=None):
         super().__init__([register, const], op_code, asm)
-        self.register = register
-        self.const = const
 
-    @property
-    def op_code(self):
+    def compute_op_code(self):
         return 0x4000 ^ (self.register.value << 8) ^ (self.const.value)
 
-    @property
-    def asm(self):
+    def compute_asm(self):
         return "{}\t{} {}".format(self.MNEMONIC, self.register, self.const)
 
 
 class SkipNextInstructionIfRegistersEqual(Instruction):
     MNEMONIC = "SRE"
+    __slots__ = ()
+    reg1 = argument(0)
+    reg2 = argument(1)
 
     def __init__(self, reg1, reg2, op_code=None, asm=None):
         super().__init__([reg1, reg2], op_code, asm)
-        self.reg1 = reg1
-        self.reg2 = reg2
 
-    @property
-    def op_code(self):
+    def compute_op_code(self):
         return 0x5000 ^ (self.reg1.value << 8) ^ (self.reg2.value << 4)
 
-    @property
-    def asm(self):
+    def compute_asm(self):
         return "{}\t{} {}".format(self.MNEMONIC, self.reg1, self.reg2)
 
 
 class LoadConstantIntoRegister(Instruction):
     MNEMONIC = "LD"
+    __slots__ = ()
+    register = argument(0)
+    const = argument(1)
 
     def __init__(self, register, const, op_code=None, asm=None):
         super().__init__([register, const], op_code, asm)
-        self.register = register
-        self.const = const
 
-    @property
-    def op_code(self):
+    def compute_op_code(self):
         return 0x6000 ^ (self.register.value << 8) ^ (self.const.value)
 
-    @property
-    def asm(self):
+    def compute_asm(self):
         return "{}\t{} {}".format(self.MNEMONIC, self.register, self.const)
 
 
 class AddConstantToRegister(Instruction):
     MNEMONIC = "ADD"
+    __slots__ = ()
+    register = argument(0)
+    const = argument(1)
 
     def __init__(self, register, const, op_code=None, asm=None):
         super().__init__([register, const], op_code, asm)
-        self.register = register
-        self.const = const
 
-    @property
-    def op_code(self):
+    def compute_op_code(self):
         return 0x7000 ^ (self.register.value << 8) ^ (self.const.value)
 
-    @property
-    def asm(self):
+    def compute_asm(self):
         return "{}\t{} {}".format(self.MNEMONIC, self.register, self.const)
 
 
 class LoadRegisterIntoRegister(Instruction):
     MNEMONIC = "LDR"
+    __slots__ = ()
+    reg1 = argument(0)
+    reg2 = argument(1)
 
     def __init__(self, reg1, reg2, op_code=None, asm=None):
         super().__init__([reg1, reg2], op_code, asm)
-        self.reg1 = reg1
-        self.reg2 = reg2
 
-    @property
-    def op_code(self):
+    def compute_op_code(self):
         return 0x8000 ^ (self.reg1.value << 8) ^ (self.reg2.value << 4)
 
-    @property
-    def asm(self):
+    def compute_asm(self):
         return "{}\t{} {}".format(self.MNEMONIC, self.reg1, self.reg2)
 
 
 class OrRegisters(Instruction):
     MNEMONIC = "OR"
+    __slots__ = ()
+    reg1 = argument(0)
+    reg2 = argument(1)
 
     def __init__(self, reg1, reg2, op_code=None, asm=None):
         super().__init__([reg1, reg2], op_code=op_code, asm=asm)
-        self.reg1 = reg1
-        self.reg2 = reg2
 
-    @property
-    def op_code(self):
+    def compute_op_code(self):
         return 0x8001 ^ (self.reg1.value << 8) ^ (self.reg2.value << 4)
 
-    @property
-    def asm(self):
+    def compute_asm(self):
         return "{}\t{} {}".format(self.MNEMONIC, self.reg1, self.reg2)
 
 
 class AndRegisters(Instruction):
     MNEMONIC = "AND"
+    __slots__ = ()
+    reg1 = argument(0)
+    reg2 = argument(1)
 
     def __init__(self, reg1, reg2, op_code=None, asm=None):
         super().__init__([reg1, reg2], op_code=op_code, asm=asm)
-        self.reg1 = reg1
-        self.reg2 = reg2
 
-    @property
-    def op_code(self):
+    def compute_op_code(self):
         return 0x8002 ^ (self.reg1.value << 8) ^ (self.reg2.value << 4)
 
-    @property
-    def asm(self):
+    def compute_asm(self):
         return "{}\t{} {}".format(self.MNEMONIC, self.reg1, self.reg2)
 
 
 class XorRegisters(Instruction):
     MNEMONIC = "XOR"
+    __slots__ = ()
+    reg1 = argument(0)
+    reg2 = argument(1)
 
     def __init__(self, reg1, reg2, op_code=None, asm=None):
         super().__init__([reg1, reg2], op_code=op_code, asm=asm)
-        self.reg1 = reg1
-        self.reg2 = reg2
 
-    @property
-    def op_code(self):
+    def compute_op_code(self):
         return 0x8003 ^ (self.reg1.value << 8) ^ (self.reg2.value << 4)
 
-    @property
-    def asm(self):
+    def compute_asm(self):
         return "{}\t{} {}".format(self.MNEMONIC, self.reg1, self.reg2)
 
 
 class AddRegisters(Instruction):
     MNEMONIC = "ADD"
+    __slots__ = ()
+    reg1 = argument(0)
+    reg2 = argument(1)
 
     def __init__(self, reg1, reg2, op_code=None, asm=None):
         super().__init__([reg1, reg2], op_code=op_code, asm=asm)
-        self.reg1 = reg1
-        self.reg2 = reg2
 
-    @property
-    def op_code(self):
+    def compute_op_code(self):
         return 0x8004 ^ (self.reg1.value << 8) ^ (self.reg2.value << 4)
 
-    @property
-    def asm(self):
+    def compute_asm(self):
         return "{}\t{} {}".format(self.MNEMONIC, self.reg1, self.reg2)
 
 
 class SubtractRegisters(Instruction):
     MNEMONIC = "SUB"
+    __slots__ = ()
+    reg1 = argument(0)
+    reg2 = argument(1)
 
     def __init__(self, reg1, reg2, op_code=None, asm=None):
         super().__init__([reg1, reg2], op_code=op_code, asm=asm)
-        self.reg1 = reg1
-        self.reg2 = reg2
 
-    @property
-    def op_code(self):
+    def compute_op_code(self):
         return 0x8005 ^ (self.reg1.value << 8) ^ (self.reg2.value << 4)
 
-    @property
-    def asm(self):
+    def compute_asm(self):
         return "{}\t{} {}".format(self.MNEMONIC, self.reg1, self.reg2)
 
 
 class ShiftRightRegister(Instruction):
     MNEMONIC = "SHR"
+    __slots__ = ()
+    reg1 = argument(0)
+    reg2 = argument(1)  # from the spec - seems like this is an accepted input, but only reg1 is actually right/left shifted
 
     def __init__(self, reg1, reg2, op_code=None, asm=None):
         super().__init__([reg1, reg2], op_code=op_code, asm=asm)
-        self.reg1 = reg1
-        self.reg2 = (
-            reg2  # from the spec - seems like this is an accepted input, but only reg1 is actually right/left shifted
-        )
 
-    @property
-    def op_code(self):
+    def compute_op_code(self):
         return 0x8006 ^ (self.reg1.value << 8) ^ (self.reg2.value << 4)
 
-    @property
-    def asm(self):
+    def compute_asm(self):
         return "{}\t{} {}".format(self.MNEMONIC, self.reg1, self.reg2)
 
 
 class ReverseSubtractRegisters(Instruction):
     MNEMONIC = "SUBN"
+    __slots__ = ()
+    reg1 = argument(0)
+    reg2 = argument(1)
 
     def __init__(self, reg1, reg2, op_code=None, asm=None):
         super().__init__([reg1, reg2], op_code=op_code, asm=asm)
-        self.reg1 = reg1
-        self.reg2 = reg2
 
-    @property
-    def op_code(self):
+    def compute_op_code(self):
         return 0x8007 ^ (self.reg1.value << 8) ^ (self.reg2.value << 4)
 
-    @property
-    def asm(self):
+    def compute_asm(self):
         return "{}\t{} {}".format(self.MNEMONIC, self.reg1, self.reg2)
 
 
 class ShiftLeftRegister(Instruction):
     MNEMONIC = "SHL"
+    __slots__ = ()
+    reg1 = argument(0)
+    reg2 = argument(1)  # from the spec - seems like this is an accepted input, but only reg1 is actually right/left shifted
 
     def __init__(self, reg1, reg2, op_code=None, asm=None):
         super().__init__([reg1, reg2], op_code=op_code, asm=asm)
-        self.reg1 = reg1
-        self.reg2 = (
-            reg2  # from the spec - seems like this is an accepted input, but only reg1 is actually right/left shifted
-        )
 
-    @property
-    def op_code(self):
+    def compute_op_code(self):
         return 0x800E ^ (self.reg1.value << 8) ^ (self.reg2.value << 4)
 
-    @property
-    def asm(self):
+    def compute_asm(self):
         return "{}\t{} {}".format(self.MNEMONIC, self.reg1, self.reg2)
 
 
 class SkipNextInstructionIfRegistersNotEquals(Instruction):
     MNEMONIC = "SRNE"
+    __slots__ = ()
+    reg1 = argument(0)
+    reg2 = argument(1)
 
     def __init__(self, reg1, reg2, op_code=None, asm=None):
         super().__init__([reg1, reg2], op_code=op_code, asm=asm)
-        self.reg1 = reg1
-        self.reg2 = reg2
 
-    @property
-    def op_code(self):
+    def compute_op_code(self):
         return 0x9000 ^ (self.reg1.value << 8) ^ (self.reg2.value << 4)
 
-    @property
-    def asm(self):
+    def compute_asm(self):
         return "{}\t{} {}".format(self.MNEMONIC, self.reg1, self.reg2)
 
 
 class SetAddressRegister(Instruction):
     MNEMONIC = "LDI"
+    __slots__ = ()
+    address = argument(0)
 
     def __init__(self, address, op_code=None, asm=None):
         super().__init__([address], op_code=op_code, asm=asm)
-        self.address = address
 
-    @property
-    def op_code(self):
+    def compute_op_code(self):
         return 0xA000 ^ (self.address.value)
 
-    @property
-    def asm(self):
+    def compute_asm(self):
         return "{}\t{}".format(self.MNEMONIC, self.address)
 
 
 class JumpToAddressPlusV0(Instruction):
     MNEMONIC = "JMPR"
+    __slots__ = ()
+    address = argument(0)
 
     def __init__(self, address, op_code=None, asm=None):
         super().__init__([address], op_code=op_code, asm=asm)
-        self.address = address
 
-    @property
-    def op_code(self):
+    def compute_op_code(self):
         return 0xB000 ^ (self.address.value)
 
-    @property
-    def asm(self):
+    def compute_asm(self):
         return "{}\t{}".format(self.MNEMONIC, self.address)
 
 
 class GenerateRandomNumberWithMask(Instruction):
     MNEMONIC = "RNG"
+    __slots__ = ()
+    reg = argument(0)
+    const = argument(1)
 
     def __init__(self, register, mask, op_code=None, asm=None):
         super().__init__([register, mask], op_code=op_code, asm=asm)
-        self.reg = register
-        self.const = mask
 
-    @property
-    def op_code(self):
+    def compute_op_code(self):
         return 0xC000 ^ (self.reg.value << 8) ^ (self.const.value)
 
-    @property
-    def asm(self):
+    def compute_asm(self):
         return "{}\t{} {}".format(self.MNEMONIC, self.reg, self.const)
 
 
 class DrawSprite(Instruction):
     MNEMONIC = "DRAW"
+    __slots__ = ()
+    reg1 = argument(0)
+    reg2 = argument(1)
+    nibble = argument(2)
 
     def __init__(self, reg1, reg2, nibble, op_code=None, asm=None):
         super().__init__([reg1, reg2, nibble], op_code=op_code, asm=asm)
-        self.reg1 = reg1
-        self.reg2 = reg2
-        self.nibble = nibble
 
-    @property
-    def op_code(self):
+    def compute_op_code(self):
         return 0xD000 ^ (self.reg1.value << 8) ^ (self.reg2.value << 4) ^ (self.nibble.value)
 
-    @property
-    def asm(self):
+    def compute_asm(self):
         return "{}\t{} {} {}".format(self.MNEMONIC, self.reg1, self.reg2, self.nibble)
 
 
 class SkipIfKeyPressed(Instruction):
     MNEMONIC = "SKP"
+    __slots__ = ()
+    reg = argument(0)
 
     def __init__(self, reg, op_code=None, asm=None):
         super().__init__([reg], op_code=op_code, asm=asm)
-        self.reg = reg
 
-    @property
-    def op_code(self):
+    def compute_op_code(self):
         return 0xE09E ^ (self.reg.value << 8)
 
-    @property
-    def asm(self):
+    def compute_asm(self):
         return "{}\t{}".format(self.MNEMONIC, self.reg)
 
 
 class SkipIfKeyNotPressed(Instruction):
     MNEMONIC = "SKNP"
+    __slots__ = ()
+    reg = argument(0)
 
     def __init__(self, reg, op_code=None, asm=None):
         super().__init__([reg], op_code=op_code, asm=asm)
-        self.reg = reg
 
-    @property
-    def op_code(self):
+    def compute_op_code(self):
         return 0xE0A1 ^ (self.reg.value << 8)
 
-    @property
-    def asm(self):
+    def compute_asm(self):
         return "{}\t{}".format(self.MNEMONIC, self.reg)
 
 
 class LoadDelayTimerIntoRegister(Instruction):
     MNEMONIC = "LDD"
+    __slots__ = ()
+    reg = argument(0)
 
     def __init__(self, reg, op_code=None, asm=None):
         super().__init__([reg], op_code=op_code, asm=asm)
-        self.reg = reg
 
-    @property
-    def op_code(self):
+    def compute_op_code(self):
         return 0xF007 ^ (self.reg.value << 8)
 
-    @property
-    def asm(self):
+    def compute_asm(self):
         return "{}\t{}".format(self.MNEMONIC, self.reg)
 
 
 class WaitForKeyPressLoadIntoRegister(Instruction):
     MNEMONIC = "WKPL"
+    __slots__ = ()
+    reg = argument(0)
 
     def __init__(self, reg, op_code=None, asm=None):
         super().__init__([reg], op_code=op_code, asm=asm)
-        self.reg = reg
 
-    @property
-    def op_code(self):
+    def compute_op_code(self):
         return 0xF00A ^ (self.reg.value << 8)
 
-    @property
-    def asm(self):
+    def compute_asm(self):
         return "{}\t{}".format(self.MNEMONIC, self.reg)
 
 
 class SetDelayTimer(Instruction):
     MNEMONIC = "SDT"
+    __slots__ = ()
+    reg = argument(0)
 
     def __init__(self, reg, op_code=None, asm=None):
         super().__init__([reg], op_code=op_code, asm=asm)
-        self.reg = reg
 
-    @property
-    def op_code(self):
+    def compute_op_code(self):
         return 0xF015 ^ (self.reg.value << 8)
 
-    @property
-    def asm(self):
+    def compute_asm(self):
         return "{}\t{}".format(self.MNEMONIC, self.reg)
 
 
 class SetSoundTimer(Instruction):
     MNEMONIC = "SST"
+    __slots__ = ()
+    reg = argument(0)
 
     def __init__(self, reg, op_code=None, asm=None):
         super().__init__([reg], op_code=op_code, asm=asm)
-        self.reg = reg
 
-    @property
-    def op_code(self):
+    def compute_op_code(self):
         return 0xF018 ^ (self.reg.value << 8)
 
-    @property
-    def asm(self):
+    def compute_asm(self):
         return "{}\t{}".format(self.MNEMONIC, self.reg)
 
 
 class AddRegisterToAddressRegister(Instruction):
     MNEMONIC = "ADDI"
+    __slots__ = ()
+    reg = argument(0)
 
     def __init__(self, reg, op_code=None, asm=None):
         super().__init__([reg], op_code=op_code, asm=asm)
-        self.reg = reg
 
-    @property
-    def op_code(self):
+    def compute_op_code(self):
         return 0xF01E ^ (self.reg.value << 8)
 
-    @property
-    def asm(self):
+    def compute_asm(self):
         return "{}\t{}".format(self.MNEMONIC, self.reg)
 
 
 class SetAddressRegisterToSpriteInRegister(Instruction):
     MNEMONIC = "SISR"
+    __slots__ = ()
+    reg = argument(0)
 
     def __init__(self, reg, op_code=None, asm=None):
         super().__init__([reg], op_code=op_code, asm=asm)
-        self.reg = reg
 
-    @property
-    def op_code(self):
+    def compute_op_code(self):
         return 0xF029 ^ (self.reg.value << 8)
 
-    @property
-    def asm(self):
+    def compute_asm(self):
         return "{}\t{}".format(self.MNEMONIC, self.reg)
 
 
 class BCDDecodeRegister(Instruction):
     MNEMONIC = "BCD"
+    __slots__ = ()
+    reg = argument(0)
 
     def __init__(self, reg, op_code=None, asm=None):
         super().__init__([reg], op_code=op_code, asm=asm)
-        self.reg = reg
 
-    @property
-    def op_code(self):
+    def compute_op_code(self):
         return 0xF033 ^ (self.reg.value << 8)
 
-    @property
-    def asm(self):
+    def compute_asm(self):
         return "{}\t{}".format(self.MNEMONIC, self.reg)
 
 
 class StoreRegisters(Instruction):
     MNEMONIC = "STR"
+    __slots__ = ()
+    reg = argument(0)
 
     def __init__(self, reg, op_code=None, asm=None):
         super().__init__([reg], op_code=op_code, asm=asm)
-        self.reg = reg
 
-    @property
-    def op_code(self):
+    def compute_op_code(self):
         return 0xF055 ^ (self.reg.value << 8)
 
-    @property
-    def asm(self):
+    def compute_asm(self):
         return "{}\t{}".format(self.MNEMONIC, self.reg)
 
 
 class ReadRegisters(Instruction):
     MNEMONIC = "LDIR"
+    __slots__ = ()
+    reg = argument(0)
 
     def __init__(self, reg, op_code=None, asm=None):
         super().__init__([reg], op_code=op_code, asm=asm)
-        self.reg = reg
 
-    @property
-    def op_code(self):
+    def compute_op_code(self):
         return 0xF065 ^ (self.reg.value << 8)
 
-    @property
-    def asm(self):
+    def compute_asm(self):
         return "{}\t{}".format(self.MNEMONIC, self.reg)
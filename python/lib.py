@@ -1,19 +1,375 @@
+import re
+import struct
+from collections import OrderedDict
+
 from instruction_matchers import *
 
-# returns an instruction object generated from the asm instruction
+OP_CODE_COUNT = 0x10000  # every possible 2 byte op code
+PROGRAM_START = 0x200  # roms are loaded at this address (same as PROGRAM_START in src/defs.h)
+OUTPUT_CHUNK_LINES = 4096  # lines of text buffered up per write by write_lines
+OUTPUT_CHUNK_BYTES = 8192  # bytes of rom buffered up per write by encode_chunks
+DISASSEMBLE_CHUNK = 512  # op codes disassemble unpacks from the rom at a time
+CHUNK_STRUCT = struct.Struct(">%dH" % DISASSEMBLE_CHUNK)
+MAX_ADDRESS = 0xFFF  # the most an Address argument can hold
+LABEL = re.compile(r"\s*([A-Za-z_.][\w.]*):")  # a label definition at the start of a line, e.g. "loop:"
+PARAMETER = re.compile(r"\\(\w+)")  # a use of a macro parameter in the macro's body, e.g. \x
+DIRECTIVES = {".macro", ".endm", ".rept", ".endr"}
+MAX_MACRO_DEPTH = 32  # macros using macros (or .rept blocks) this deep are taken to be recursive
+
+_op_code_table = None
+_op_code_bytes = None  # the 2 byte form of every op code, so decoding from an int never has to build/slice bytes
+
+
+# maps every possible op code to the matcher that handles it, so decoding is a single list index.
+# each op code is run through MATCHERS in order, so the same priority rules apply (CLS/RTN before SYS, FallBack last)
+def build_op_code_table():
+    table = []
+    op_code_bytes = []
+    for op_code in range(OP_CODE_COUNT):
+        op_code_bytes.append(op_code.to_bytes(2, byteorder="big"))
+        for matcher in MATCHERS:
+            if matcher.matches_op_code(op_code_bytes[op_code]):
+                table.append(matcher)
+                break
+    return table, op_code_bytes
+
+
+# the table is only built the first time it's needed, it takes a moment and the assembler never uses it
+def get_op_code_table():
+    global _op_code_table, _op_code_bytes
+    if _op_code_table is None:
+        _op_code_table, _op_code_bytes = build_op_code_table()
+    return _op_code_table
+
+
+# maps each mnemonic to the matchers that could take it (in MATCHERS order), followed by the matchers that accept
+# any mnemonic. Lines with an unknown mnemonic only get the any-mnemonic matchers (i.e. the FallBackMatcher)
+def build_asm_index():
+    wildcards = [matcher for matcher in MATCHERS if matcher.MNEMONIC is None]
+    index = {}
+    for matcher in MATCHERS:
+        if matcher.MNEMONIC is not None:
+            index.setdefault(matcher.MNEMONIC, []).append(matcher)
+    for candidates in index.values():
+        candidates.extend(wildcards)
+    return index, wildcards
+
+
+ASM_INDEX, ASM_WILDCARDS = build_asm_index()
+
+
+# returns an instruction object generated from the asm instruction, or None for blank/comment only lines
 def parse_asm(asm):
     # ignore everything after the ';' (; is used to denote comments)
     asm = asm.split(";")[0]
 
-    for matcher in MATCHERS:
-        if matcher.matches_asm(asm):
-            return matcher.from_asm(asm)
+    tokens = AsmParser.parse_asm(asm)  # the only place the line gets split and its arguments parsed
+    if tokens is None:
+        return None
+    ins, args = tokens
+    return match_asm(ins, args, asm)
+
+
+# returns the instruction object for an already tokenized line
+def match_asm(ins, args, asm):
+    for matcher in ASM_INDEX.get(ins, ASM_WILDCARDS):
+        if matcher.matches_args(args):
+            return matcher.from_args(args, asm)
     return None
 
 
+# splits the labels off the front of a line (and the comment off the end), returns (label names, the rest of the asm)
+def split_labels(line):
+    asm = line.strip().split(";")[0]
+    labels = []
+    label = LABEL.match(asm)
+    while label is not None:
+        labels.append(label.group(1))
+        asm = asm[label.end() :].lstrip()
+        label = LABEL.match(asm)
+    return labels, asm
+
+
+# gives the labels the address in symbols
+def define_labels(labels, address, number, symbols):
+    for name in labels:
+        if name in symbols:
+            raise UnknownAsmException("Label defined twice", label=name, line=number)
+        symbols[name] = address
+
+
+# the first pass over a line: gives its labels the address of its instruction (the next one when there's none) in
+# symbols. Returns the instruction as (mnemonic, args, asm), or None for lines with no instruction
+def tokenize_line(line, number, address, symbols):
+    labels, asm = split_labels(line)
+    define_labels(labels, address, number, symbols)
+    tokens = AsmParser.parse_asm(asm)
+    if tokens is None:
+        return None
+    return tokens[0], tokens[1], asm
+
+
+# the second pass over a line: swaps the labels in the args for their addresses, returns the instruction.
+# args isn't changed, so tokens can be resolved again
+def resolve_line(ins, args, asm, number, symbols):
+    resolved = []
+    for arg in args:
+        if type(arg) == Label:
+            if arg.value not in symbols:
+                raise UnknownAsmException("Unknown label", label=arg.value, line=number)
+            if symbols[arg.value] > MAX_ADDRESS:
+                raise UnknownAsmException("Label past the end of memory", label=arg.value, line=number)
+            arg = Address(symbols[arg.value])
+        resolved.append(arg)
+    return match_asm(ins, resolved, asm)
+
+
+class Macros:
+    """
+    The macros defined so far (".macro name param ..." up to ".endm") and their expansions. Expansions are memoized by
+    (name, args), so a macro is substituted, tokenized and matched into Instructions once for each set of args it's
+    used with, and every use after that is a dict lookup. hits/misses count the lookups.
+    Macros can't be redefined (or named after a mnemonic), which keeps the memoized expansions valid.
+    """
+
+    def __init__(self):
+        self.definitions = {}  # name -> (params, body as [(line number, line)])
+        self.expansions = {}  # (name, args) -> tuple of (mnemonic, args, asm, instruction), see expand_lines
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, name):
+        return name in self.definitions
+
+    def define(self, name, params, body, number):
+        if name in self.definitions or name in ASM_INDEX:
+            raise UnknownAsmException("Macro already defined", macro=name, line=number)
+        self.definitions[name] = (tuple(params), body)
+
+    # the instructions the macro expands to with the args (strings, as written after the macro's name)
+    def expand(self, name, args, number, depth=0):
+        key = (name, args)
+        expansion = self.expansions.get(key)
+        if expansion is not None:
+            self.hits += 1
+            return expansion
+        self.misses += 1
+        params, body = self.definitions[name]
+        if len(args) != len(params):
+            raise UnknownAsmException("Wrong number of macro arguments", macro=name, args=args, line=number)
+        values = dict(zip(params, args))
+
+        def substitute(match):
+            if match.group(1) not in values:
+                raise UnknownAsmException("Unknown macro parameter", macro=name, parameter=match.group(1), line=number)
+            return values[match.group(1)]
+
+        lines = ((at, PARAMETER.sub(substitute, line)) for at, line in body)
+        expansion = []
+        for at, labels, tokens in _expand(lines, self, depth + 1):
+            if labels:  # every use would define them again
+                raise UnknownAsmException("Labels can't be defined in a macro", macro=name, line=at)
+            expansion.extend(tokens)
+        expansion = self.expansions[key] = tuple(expansion)
+        return expansion
+
+
+# the first pass over a program, with the macros and repeat blocks (".rept count" up to ".endr") expanded. Yields
+# (line number, label names, instructions) for each line that has either, where the instructions are
+# (mnemonic, args, asm, instruction) tuples, and instruction is already matched unless the args have labels to resolve
+def expand_lines(lines, macros=None):
+    return _expand(enumerate(lines, 1), Macros() if macros is None else macros, 0)
+
+
+def _expand(numbered, macros, depth):
+    if depth > MAX_MACRO_DEPTH:
+        raise UnknownAsmException("Macros nested too deep", depth=depth)
+    for number, line in numbered:
+        labels, asm = split_labels(line)
+        words = asm.split()
+        if not words:
+            if labels:
+                yield number, labels, ()
+            continue
+        if words[0] in DIRECTIVES:
+            if labels:
+                raise UnknownAsmException("Labels can't be put on a directive", line=number)
+            if words[0] == ".macro" and len(words) > 1:
+                macros.define(words[1], words[2:], _block(numbered, ".macro", ".endm", number), number)
+            elif words[0] == ".rept" and len(words) == 2:
+                try:
+                    count = int(words[1], 0)
+                except ValueError:
+                    raise UnknownAsmException("Bad .rept count", count=words[1], line=number)
+                # the body is only expanded once, every repeat is the same
+                repeated = list(_expand(iter(_block(numbered, ".rept", ".endr", number)), macros, depth + 1))
+                for _ in range(count):
+                    yield from repeated
+            else:
+                raise UnknownAsmException("Bad directive", directive=asm, line=number)
+        elif words[0] in macros:
+            yield number, labels, macros.expand(words[0], tuple(words[1:]), number, depth)
+        else:
+            ins, args = words[0], AsmParser.parse_args(words[1:])
+            instruction = None if any(type(arg) == Label for arg in args) else match_asm(ins, args, asm)
+            yield number, labels, ((ins, args, asm, instruction),)
+
+
+# the lines of a .macro/.rept block, read up to the end that matches its start
+def _block(numbered, start, end, number):
+    body = []
+    depth = 1
+    for at, line in numbered:
+        words = line.split(";")[0].split()
+        if words and words[0] == start:
+            depth += 1
+        elif words and words[0] == end:
+            depth -= 1
+            if depth == 0:
+                return body
+        body.append((at, line))
+    raise UnknownAsmException("No " + end + " for " + start, line=number)
+
+
+# assembles a whole program in two passes. The first expands the macros and gives each label ("name:" in front of a
+# line, or on a line of its own) the address of the next instruction, the second swaps the references to them ("@name"
+# where an address goes) for their addresses. Both are a single walk over the lines with dict lookups, so forward
+# references cost nothing extra. Returns (instructions, symbols), symbols maps each label to its address
+def assemble(lines, base=PROGRAM_START, macros=None):
+    symbols = {}
+    tokenized = []  # (line number, tokens) of each instruction, from the first pass
+    address = base
+    for number, labels, expansion in expand_lines(lines, macros):
+        define_labels(labels, address, number, symbols)
+        for tokens in expansion:
+            tokenized.append((number, tokens))
+            address += 2
+    instructions = [
+        tokens[3] if tokens[3] is not None else resolve_line(*tokens[:3], number, symbols)
+        for number, tokens in tokenized
+    ]
+    return instructions, symbols
+
+
+# assembles lines as they come in (e.g. from a pipe), yielding each instruction as soon as its line is read. Both passes
+# happen line by line and nothing but the labels and macros is kept, so memory doesn't grow with the length of the
+# input, but labels have to be defined before they're used. The labels are added to symbols as they're defined
+def assemble_lines(lines, base=PROGRAM_START, symbols=None, macros=None):
+    symbols = {} if symbols is None else symbols
+    address = base
+    for number, labels, expansion in expand_lines(lines, macros):
+        define_labels(labels, address, number, symbols)
+        for ins, args, asm, instruction in expansion:
+            yield instruction if instruction is not None else resolve_line(ins, args, asm, number, symbols)
+            address += 2
+
+
+# the symbol map written next to an assembled binary, one "address<tab>label" line per label in address order
+def symbol_lines(symbols):
+    for name, address in sorted(symbols.items(), key=lambda item: item[1]):
+        yield "{:#05x}\t{}".format(address, name)
+
+
 # returns the instruction object generated from the op_code
 def parse_op_code(op_code):
-    for matcher in MATCHERS:
-        if matcher.matches_op_code(op_code):
-            return matcher.from_op_code(op_code)
-    return None
+    matcher = get_op_code_table()[int.from_bytes(op_code, byteorder="big")]
+    return matcher.from_op_code(op_code)
+
+
+# returns the instruction object generated from the op_code, given as an int instead of bytes
+def decode_op_code(op_code):
+    table = get_op_code_table()
+    return table[op_code].from_op_code(_op_code_bytes[op_code])
+
+
+class InstructionCache:
+    """
+    Interns decoded instructions, so every occurrence of an op code shares a single Instruction object.
+    With max_size set only the most recently used op codes are kept (LRU), otherwise every op code seen is kept.
+    populate() decodes all the op codes up front, after which lookups never miss.
+    Handing the same object to every caller is safe as Instructions and their Arguments refuse writes (AttributeError),
+    so no caller can change the instruction every other caller got.
+    """
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._instructions = OrderedDict() if max_size is not None else {}
+
+    def __len__(self):
+        return len(self._instructions)
+
+    def populate(self):
+        self.max_size = None
+        self._instructions = {op_code: decode_op_code(op_code) for op_code in range(OP_CODE_COUNT)}
+        return self
+
+    # returns the shared instruction for the op_code (given as an int)
+    def get(self, op_code):
+        instruction = self._instructions.get(op_code)
+        if instruction is not None:
+            self.hits += 1
+            if self.max_size is not None:
+                self._instructions.move_to_end(op_code)
+            return instruction
+
+        self.misses += 1
+        instruction = self._instructions[op_code] = decode_op_code(op_code)
+        if self.max_size is not None and len(self._instructions) > self.max_size:
+            self._instructions.popitem(last=False)
+        return instruction
+
+
+# returns the rom bytes for a sequence of instructions
+def encode(instructions):
+    return b"".join(instruction.op_code_bytes for instruction in instructions)
+
+
+# yields the rom bytes for a stream of instructions in chunks of about chunk_bytes, so they can be written out as they
+# come without holding the whole rom
+def encode_chunks(instructions, chunk_bytes=OUTPUT_CHUNK_BYTES):
+    chunk = bytearray()
+    for instruction in instructions:
+        chunk += instruction.op_code_bytes
+        if len(chunk) >= chunk_bytes:
+            yield bytes(chunk)
+            chunk.clear()
+    if chunk:
+        yield bytes(chunk)
+
+
+# yields the instruction objects for a whole rom held in a bytes, bytearray, memoryview or mmap.
+# start/end are memory addresses (end exclusive), where the first byte of the rom is loaded at base.
+# the op codes are unpacked straight from the rom's buffer DISASSEMBLE_CHUNK at a time, so they're never sliced
+# out/copied, and the buffer is only held while unpacking: nothing stops the caller closing an mmap it passed in
+# while the generator is suspended (or left unfinished).
+# passing an InstructionCache yields its shared instructions instead of decoding new ones
+def disassemble(rom, start=None, end=None, base=PROGRAM_START, cache=None):
+    table = get_op_code_table()
+    op_code_bytes = _op_code_bytes
+    first = 0 if start is None else max(start - base, 0)
+    last = len(rom) if end is None else max(min(end - base, len(rom)), first)
+    last -= (last - first) % 2  # a trailing odd byte isn't a full op code
+    for offset in range(first, last, 2 * DISASSEMBLE_CHUNK):
+        count = min(DISASSEMBLE_CHUNK, (last - offset) // 2)
+        unpack = CHUNK_STRUCT.unpack_from if count == DISASSEMBLE_CHUNK else struct.Struct(">%dH" % count).unpack_from
+        op_codes = unpack(rom, offset)
+        if cache is not None:
+            for op_code in op_codes:
+                yield cache.get(op_code)
+        else:
+            for op_code in op_codes:
+                yield table[op_code].from_op_code(op_code_bytes[op_code])
+
+
+# writes the lines out in large chunks, instead of one write (and flush when out is a terminal) per line
+def write_lines(lines, out, chunk_lines=OUTPUT_CHUNK_LINES):
+    chunk = []
+    for line in lines:
+        chunk.append(str(line))
+        if len(chunk) == chunk_lines:
+            out.write("\n".join(chunk) + "\n")
+            chunk.clear()
+    if chunk:
+        out.write("\n".join(chunk) + "\n")
@@ -0,0 +1,228 @@
+"""
+A peephole optimizer for assembled programs, between assembling and encoding:
+
+    instructions, symbols = assemble(lines)
+    instructions, report = optimize(instructions)
+    symbols = {name: report.relocate(address) for name, address in symbols.items()}
+
+It rewrites lists of Instructions into ones that do the same in less space and/or fewer executed instructions:
+
+- jumps (and calls) to a JMP go straight to the end of the chain
+- consecutive ADD vX cNN on the same register become one ADD
+- instructions that do nothing are dropped: LDR vX vX, ADD vX c0x0 and JMP to the next instruction
+- code that can't be reached from the start of the program is removed
+
+Skips are why most of this is careful: SE/SNE/SRE/SRNE/SKP/SKNP skip exactly the one 2 byte slot after them, so the
+instruction in that slot is never dropped or merged away, and an ADD that's jumped to is never merged into the one
+before it. Whatever moves, the addresses in JMP/CALL/LDI/JMPR that point into the program are moved with it.
+Unreachable runs that an LDI points into are data (sprites etc.) and are left as they are. When the program has a JMPR
+(so where it jumps can't be worked out) or reads its own code through I, nothing is moved or removed.
+"""
+from lib import *
+
+SKIPS = {
+    SkipNextInstructionIfEqualsConst,
+    SkipNextInstructionIfNotEqualsConst,
+    SkipNextInstructionIfRegistersEqual,
+    SkipNextInstructionIfRegistersNotEquals,
+    SkipIfKeyPressed,
+    SkipIfKeyNotPressed,
+}
+RELOCATED = {JumpToAddress, CallFunction, SetAddressRegister, JumpToAddressPlusV0}  # the instructions with addresses
+MAX_PASSES = 16  # each pass can open up more to do in the next, but not forever
+
+
+class Report:
+    """
+    What optimize did. merged, dropped and unreachable count the instructions each pass removed, threaded the jumps
+    that were pointed further down their chain. skipped is why nothing was moved or removed, when it wasn't.
+    """
+
+    def __init__(self, instructions, base):
+        self.before = self.after = len(instructions)
+        self.base = base
+        self.merged = 0
+        self.dropped = 0
+        self.unreachable = 0
+        self.threaded = 0
+        self.skipped = None
+        self.indexes = list(range(len(instructions) + 1))  # the index each instruction (and the end) ended up at
+
+    @property
+    def saved_instructions(self):
+        return self.before - self.after
+
+    @property
+    def saved_bytes(self):
+        return 2 * self.saved_instructions
+
+    # where an address in the original program ended up, the next instruction kept for one that was removed
+    def relocate(self, address):
+        offset = address - self.base
+        if offset < 0 or offset % 2 or offset // 2 >= len(self.indexes):
+            return address
+        return self.base + 2 * self.indexes[offset // 2]
+
+    def __str__(self):
+        text = "saved {} bytes, {} instructions ({} merged, {} dropped, {} unreachable), threaded {} jumps".format(
+            self.saved_bytes, self.saved_instructions, self.merged, self.dropped, self.unreachable, self.threaded
+        )
+        return text if self.skipped is None else "{} ({})".format(text, self.skipped)
+
+
+# returns (the optimized instructions, a Report). The program is the instructions from base on, like assemble makes
+def optimize(instructions, base=PROGRAM_START):
+    report = Report(instructions, base)
+    instructions = list(instructions)
+    for _ in range(MAX_PASSES):
+        threaded = _thread_jumps(instructions, base, report)
+        if report.skipped is None:
+            removed = _remove(instructions, base, report)
+        else:
+            removed = False
+        if not threaded and not removed:
+            break
+    report.after = len(instructions)
+    return instructions, report
+
+
+# the index of the instruction at address in the program, or None when it's outside of it (or not on a slot)
+def _index(address, base, count):
+    offset = address - base
+    if offset < 0 or offset % 2 or offset // 2 >= count:
+        return None
+    return offset // 2
+
+
+# which instructions can run, following every path from the start (both ways out of skips, calls and what's after
+# them). Returns (a flag per instruction, whether a JMPR can run), where a JMPR means there can be more than that
+def _reachable(instructions, base):
+    count = len(instructions)
+    reachable = [False] * count
+    computed = False
+    pending = [0] if count else []
+    while pending:
+        index = pending.pop()
+        if index is None or index >= count or reachable[index]:
+            continue
+        reachable[index] = True
+        instruction = instructions[index]
+        kind = type(instruction)
+        if kind == JumpToAddressPlusV0:
+            computed = True
+        elif kind == JumpToAddress:
+            pending.append(_index(instruction.address.value, base, count))
+        elif kind == ReturnFromFunction:
+            pass
+        else:
+            if kind == CallFunction:
+                pending.append(_index(instruction.address.value, base, count))
+            if kind in SKIPS:
+                pending.append(index + 2)
+            pending.append(index + 1)
+    return reachable, computed
+
+
+# points reachable jumps/calls at the end of their chain of jumps. Returns whether any changed
+def _thread_jumps(instructions, base, report):
+    reachable, computed = _reachable(instructions, base)
+    if computed:
+        report.skipped = "JMPR"  # the jumps that are known to run are still threaded, but nothing is removed
+    changed = False
+    for index, instruction in enumerate(instructions):
+        if not reachable[index] or type(instruction) not in (JumpToAddress, CallFunction):
+            continue
+        address, seen = instruction.address.value, {index}
+        target = _index(address, base, len(instructions))
+        while target is not None and target not in seen and type(instructions[target]) == JumpToAddress:
+            seen.add(target)
+            address = instructions[target].address.value
+            target = _index(address, base, len(instructions))
+        if address != instruction.address.value and target not in seen:
+            instructions[index] = type(instruction)(Address(address))
+            report.threaded += 1
+            changed = True
+    return changed
+
+
+# one pass of removing unreachable code, no-ops and merged ADDs, moving the addresses along. Returns whether anything
+# was removed
+def _remove(instructions, base, report):
+    count = len(instructions)
+    reachable = _reachable(instructions, base)[0]
+    targets = set()  # the instructions something points at
+    data = [False] * count  # unreachable runs with an LDI pointing into them
+    for index, instruction in enumerate(instructions):
+        if reachable[index] and type(instruction) in RELOCATED:
+            target = _index(instruction.address.value, base, count)
+            if target is None and base <= instruction.address.value < base + 2 * count:
+                report.skipped = "address between instructions"
+                return False
+            if target is not None and type(instruction) == SetAddressRegister:
+                if reachable[target]:
+                    report.skipped = "code read through I"
+                    return False
+                data[target] = True
+            targets.add(target)
+    for index in range(1, count):
+        if data[index - 1] and not reachable[index]:
+            data[index] = True
+    for index in range(count - 2, -1, -1):
+        if data[index + 1] and not reachable[index]:
+            data[index] = True
+
+    keep = [reachable[index] or data[index] for index in range(count)]
+    report.unreachable += keep.count(False)
+    for index, instruction in enumerate(instructions):
+        if not reachable[index] or not keep[index]:
+            continue
+        kind = type(instruction)
+        in_skip = index > 0 and reachable[index - 1] and type(instructions[index - 1]) in SKIPS
+        if kind == AddConstantToRegister and not in_skip:
+            register, total = instruction.register.value, instruction.const.value
+            following = index + 1
+            while (
+                following < count
+                and following not in targets
+                and type(instructions[following]) == AddConstantToRegister
+                and instructions[following].register.value == register
+            ):
+                total += instructions[following].const.value
+                keep[following] = False
+                report.merged += 1
+                following += 1
+            if following > index + 1:
+                instructions[index] = AddConstantToRegister(Register(register), Constant(total & 0xFF))
+        if in_skip:
+            continue
+        instruction = instructions[index]
+        if kind == LoadRegisterIntoRegister and instruction.args[0].value == instruction.args[1].value:
+            keep[index] = False
+        elif kind == AddConstantToRegister and instruction.const.value == 0:
+            keep[index] = False
+        elif kind == JumpToAddress:
+            target = _index(instruction.address.value, base, count)
+            if target is not None and target > index and not any(keep[index + 1 : target]):
+                keep[index] = False
+        if not keep[index]:
+            report.dropped += 1
+
+    if all(keep):
+        return False
+    indexes, kept = [], 0
+    for index in range(count):
+        indexes.append(kept)
+        kept += keep[index]
+    indexes.append(kept)
+    relocated = []
+    for index, instruction in enumerate(instructions):
+        if not keep[index]:
+            continue
+        if reachable[index] and type(instruction) in RELOCATED:
+            target = _index(instruction.address.value, base, count + 1)  # the end of the program moves too
+            if target is not None:
+                instruction = type(instruction)(Address(base + 2 * indexes[target]))
+        relocated.append(instruction)
+    instructions[:] = relocated
+    report.indexes = [indexes[index] for index in report.indexes]
+    return True
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+"""
+Opt-in profiling for emulator.Chip8: how often each op code (and so each Instruction class) ran, how often each
+address was executed, and how deep the call stack was while it ran.
+Profiling is its own run loop (run_profiled), one instruction at a time through emulate_cycle, so Chip8.run and the
+translated blocks don't have a single extra check in them when nothing is being profiled.
+The counters are flat arrays indexed by op code/address/stack depth, the report maps them back to asm.
+
+usage: python3 python/profiler.py --rom ./roms/INVADERS --cycles 200000 --top 20
+"""
+import argparse
+from array import array
+
+from emulator import *
+
+
+class Profile:
+    """
+    Counters filled in by run_profiled, which can be called again with the same Profile to add to it.
+    op_codes counts executions by op code, addresses by the address they were fetched from and depths by the stack
+    depth they ran at. An instruction that raises is counted, since it was fetched and dispatched.
+    """
+
+    def __init__(self):
+        self.op_codes = array("Q", bytes(8 * OP_CODE_COUNT))
+        self.addresses = array("Q", bytes(8 * MAX_MEMORY))
+        self.depths = array("Q", bytes(8 * (STACK_SIZE + 1)))
+        self.cycles = 0
+
+    # executions per Instruction class name, most executed first
+    def class_counts(self):
+        counts = {}
+        for op_code, count in enumerate(self.op_codes):
+            if count:
+                name = type(decode_op_code(op_code)).__name__
+                counts[name] = counts.get(name, 0) + count
+        return sorted(counts.items(), key=lambda item: -item[1])
+
+    # the top most executed addresses as (address, count)
+    def hot_addresses(self, top=20):
+        hot = sorted(range(MAX_MEMORY), key=lambda address: -self.addresses[address])[:top]
+        return [(address, self.addresses[address]) for address in hot if self.addresses[address]]
+
+    @property
+    def max_depth(self):
+        return max((depth for depth, count in enumerate(self.depths) if count), default=0)
+
+    @property
+    def calls(self):
+        return sum(self.op_codes[0x2000:0x3000])
+
+    @property
+    def returns(self):
+        return self.op_codes[0x00EE]
+
+
+# runs the machine for the given number of cycles (emulate_cycle, so the timers follow cycles_per_tick), counting
+# into profile (a new one by default). Returns the profile
+def run_profiled(machine, cycles, profile=None):
+    profile = Profile() if profile is None else profile
+    memory, op_codes, addresses, depths = machine.memory, profile.op_codes, profile.addresses, profile.depths
+    emulate_cycle = machine.emulate_cycle
+    for _ in range(cycles):
+        address = machine.program_counter & ADDRESS_MASK
+        op_codes[memory[address] << 8 | memory[(address + 1) & ADDRESS_MASK]] += 1
+        addresses[address] += 1
+        depths[machine.stack_pointer] += 1
+        profile.cycles += 1
+        emulate_cycle()
+    return profile
+
+
+# the profile as text, with the hot addresses disassembled from memory (as it is now)
+def report(profile, memory, top=20):
+    total = profile.cycles or 1
+    lines = ["{} cycles".format(profile.cycles), "", "instruction classes:"]
+    for name, count in profile.class_counts():
+        lines.append("{:>12} {:>6.2f}%\t{}".format(count, 100 * count / total, name))
+
+    lines += ["", "hot addresses:"]
+    for address, count in profile.hot_addresses(top):
+        op_code = bytes([memory[address], memory[(address + 1) & ADDRESS_MASK]])
+        lines.append(
+            "{:>12} {:>6.2f}%\t{:#05x}\t{}".format(count, 100 * count / total, address, parse_op_code(op_code).asm)
+        )
+
+    lines += ["", "stack depth: max {}, {} calls, {} returns".format(profile.max_depth, profile.calls, profile.returns)]
+    for depth, count in enumerate(profile.depths):
+        if count:
+            lines.append("{:>12} {:>6.2f}%\tdepth {}".format(count, 100 * count / total, depth))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="profile a chip8 rom on the python emulator")
+    parser.add_argument("--rom", type=str, required=True, help="path to the rom")
+    parser.add_argument("--cycles", type=int, default=100000, help="instructions to run")
+    parser.add_argument("--cycles_per_tick", type=int, default=1, help="instructions per timer tick")
+    parser.add_argument("--seed", type=int, default=0, help="seed for RNG")
+    parser.add_argument("--top", type=int, default=20, help="hot addresses to list")
+    args = parser.parse_args()
+
+    machine = Chip8(seed=args.seed, translate=False, cycles_per_tick=args.cycles_per_tick)
+    with open(args.rom, "rb") as f:
+        machine.load_rom(f.read())
+    profile = Profile()
+    try:
+        run_profiled(machine, args.cycles, profile)
+    except EmulatorException as e:
+        print("stopped after {} cycles: {!r}\n".format(profile.cycles, e))
+    print(report(profile, machine.memory, args.top))
+
+
+if __name__ == "__main__":
+    main()
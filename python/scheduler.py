@@ -0,0 +1,71 @@
+"""
+Runs a Chip8 on a virtual clock of TICKS_PER_SECOND ticks per emulated second, with the machine's cycles_per_tick
+instructions per tick (the timers count down once a tick, see Chip8.cycles_per_tick), e.g.
+
+    scheduler = Scheduler(Chip8(cycles_per_tick=CYCLES_PER_TICK), realtime=False)
+    scheduler.run_for(600)  # 10 emulated minutes, as fast as the machine goes
+
+In real time mode each tick waits for its deadline, start + ticks / TICKS_PER_SECOND, so sleeps that wake up late
+don't add up over a run. Falling more than MAX_LAG behind (e.g. stopped in a debugger) starts the deadlines again from
+now, instead of running all the missed ticks back to back. In turbo mode the ticks run back to back with no waiting.
+The machine only ever sees ticks and cycles, never the wall clock, so both modes run a rom exactly the same way.
+"""
+import time
+
+from emulator import *
+
+TICKS_PER_SECOND = 60
+CYCLES_PER_TICK = 10  # 600 instructions a second, about what most roms expect
+MAX_LAG = 0.25  # seconds behind the deadlines before they're moved up to now
+
+
+class Scheduler:
+    """
+    ticks is the virtual clock, the ticks run so far. clock/sleep can be swapped out, e.g. in tests.
+    resyncs counts the times real time mode fell more than MAX_LAG behind.
+    """
+
+    def __init__(self, machine, realtime=True, clock=time.perf_counter, sleep=time.sleep):
+        self.machine = machine
+        self.realtime = realtime
+        self.clock = clock
+        self.sleep = sleep
+        self.ticks = 0
+        self.resyncs = 0
+        self._start = None  # the real time tick 0 was (or would have been) due, set by the first wait
+
+    # emulated seconds so far
+    @property
+    def seconds(self):
+        return self.ticks / TICKS_PER_SECOND
+
+    # runs the given number of ticks, calling on_tick(machine) after each one (e.g. to read the keys or draw).
+    # Returns how many ran
+    def run(self, ticks, on_tick=None):
+        machine = self.machine
+        if not self.realtime and on_tick is None:
+            machine.run(ticks * machine.cycles_per_tick)  # one run, so translated blocks don't stop at each tick
+            self.ticks += ticks
+            return ticks
+        for _ in range(ticks):
+            if self.realtime:
+                self._wait()
+            machine.run(machine.cycles_per_tick)
+            self.ticks += 1
+            if on_tick is not None:
+                on_tick(machine)
+        return ticks
+
+    # runs the ticks in the given number of emulated seconds
+    def run_for(self, seconds, on_tick=None):
+        return self.run(round(seconds * TICKS_PER_SECOND), on_tick)
+
+    # sleeps until the next tick is due
+    def _wait(self):
+        now = self.clock()
+        if self._start is None or now - (self._start + self.ticks / TICKS_PER_SECOND) > MAX_LAG:
+            self.resyncs += self._start is not None
+            self._start = now - self.ticks / TICKS_PER_SECOND
+        deadline = self._start + self.ticks / TICKS_PER_SECOND
+        if deadline > now:
+            self.sleep(deadline - now)
@@ -0,0 +1,294 @@
+"""
+Save states for emulator.Chip8: memory, registers, I, PC, SP, stack, timers, keys, screen, the cycle count and the
+state of the machine's random number generator.
+
+In memory, a Snapshot keeps memory as PAGE_SIZE pages of immutable bytes. Taking a snapshot with base= shares every page
+that didn't change since the base, so keeping one per frame (for rewinding) costs about the pages the game wrote to,
+and restore only writes back (and invalidates the translated blocks of) the pages that differ from the machine.
+
+On disk (to_bytes/save), a snapshot is a small header followed by a little endian body, zlib compressed by default:
+
+    magic  "CH8S"
+    version, flags              B B         flags: FLAG_COMPRESSED, FLAG_RANDOM (FLAG_C_STRUCT, see below)
+    body:
+    pc, I, sp, delay, sound     <HHHHH
+    cycles, draw flag           <Q?
+    memory, reg                 4096s 16s
+    stack                       <16H
+    keys                        16s
+    screen                      <32Q        one int per row, the leftmost pixel is the highest bit
+    random state                <625Id      only with FLAG_RANDOM, the Mersenne Twister state and the cached gauss
+
+to_c_struct/from_c_struct read and write what saveState/loadState in src/chip8.c do instead, so states can go back and
+forth between the two emulators: the same header with FLAG_C_STRUCT as the flags, then the size of the struct and the
+Chip8 struct of src/chip8.h as is (which has no cycle count or random state):
+
+    struct size                 <I
+    struct                      the native layout of the compiler that built src/chip8.c
+"""
+import struct
+import zlib
+
+from emulator import *
+
+PAGE_SIZE = 256
+PAGES = MAX_MEMORY // PAGE_SIZE
+MAGIC = b"CH8S"
+VERSION = 1
+FLAG_COMPRESSED = 0x1
+FLAG_RANDOM = 0x2
+FLAG_C_STRUCT = 0x4  # a C save state, the only flag those have
+
+HEADER = struct.Struct("<4sBB")
+C_SIZE = struct.Struct("<I")
+BODY = struct.Struct("<HHHHHQ?{}s{}s{}H{}s{}Q".format(MAX_MEMORY, REGISTERS, STACK_SIZE, KEYS, GRAPHICS_HEIGHT))
+RANDOM_VERSION = 3  # the first item of random.getstate()
+RANDOM_STATE = struct.Struct("<625Id")  # random.getstate() of a Mersenne Twister, gauss_next is NaN when unset
+# the Chip8 struct in src/chip8.h, with the native sizes and padding of the compiler that built it
+C_STRUCT = struct.Struct(
+    "@HHH{}s{}s{}HHH{}s{}scI".format(MAX_MEMORY, REGISTERS, STACK_SIZE, GRAPHICS_WIDTH * GRAPHICS_HEIGHT, KEYS)
+)
+
+
+class SnapshotException(EmulatorException):  # raised for data that isn't a save state this version can read
+    pass
+
+
+class Snapshot:
+    """
+    The state of a Chip8 at one point, see snapshot(). Nothing in it is mutable, so snapshots can share pages and
+    restoring one doesn't change it.
+    """
+
+    __slots__ = (
+        "program_counter",
+        "index_counter",
+        "stack_pointer",
+        "pages",  # PAGES bytes objects of PAGE_SIZE
+        "reg",
+        "stack",
+        "delay_timer",
+        "sound_timer",
+        "screen",
+        "key",
+        "draw_flag",
+        "cycles",
+        "random_state",  # random.getstate() of the machine, or None to leave the machine's generator alone
+    )
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            object.__setattr__(self, name, fields.get(name))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Snapshot is immutable, use replace() for a changed copy")
+
+    def __delattr__(self, name):
+        raise AttributeError("Snapshot is immutable, use replace() for a changed copy")
+
+    # a copy with the given fields changed, sharing everything else (the pages too)
+    def replace(self, **fields):
+        return Snapshot(**dict({name: getattr(self, name) for name in self.__slots__}, **fields))
+
+    @property
+    def memory(self):
+        return b"".join(self.pages)
+
+    def __eq__(self, other):
+        return type(other) == type(self) and all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return "Snapshot(pc={:#x}, cycles={})".format(self.program_counter, self.cycles)
+
+
+# takes a snapshot of the machine. Pages of memory that are the same as in base are shared with it
+def snapshot(machine, base=None):
+    view = memoryview(machine.memory)
+    pages = []
+    for page in range(PAGES):
+        start = page * PAGE_SIZE
+        if base is not None and view[start : start + PAGE_SIZE] == base.pages[page]:
+            pages.append(base.pages[page])
+        else:
+            pages.append(bytes(view[start : start + PAGE_SIZE]))
+    view.release()
+    return Snapshot(
+        program_counter=machine.program_counter,
+        index_counter=machine.index_counter,
+        stack_pointer=machine.stack_pointer,
+        pages=tuple(pages),
+        reg=bytes(machine.reg),
+        stack=tuple(machine.stack),
+        delay_timer=machine.delay_timer,
+        sound_timer=machine.sound_timer,
+        screen=tuple(machine.screen),
+        key=bytes(machine.key),
+        draw_flag=machine.draw_flag,
+        cycles=machine.cycles,
+        random_state=machine.random.getstate(),
+    )
+
+
+# puts the machine back in the snapshot's state. Only the pages of memory that differ get written, so only their
+# decoded instructions and translated blocks are dropped
+def restore(machine, snapshot):
+    memory = machine.memory
+    for page, data in enumerate(snapshot.pages):
+        start = page * PAGE_SIZE
+        with memoryview(memory) as view:
+            same = view[start : start + PAGE_SIZE] == data
+        if not same:
+            machine.write_memory(start, data)
+    machine.program_counter = snapshot.program_counter
+    machine.index_counter = snapshot.index_counter
+    machine.stack_pointer = snapshot.stack_pointer
+    machine.reg[:] = snapshot.reg
+    machine.stack[:] = snapshot.stack
+    machine.delay_timer = snapshot.delay_timer
+    machine.sound_timer = snapshot.sound_timer
+    machine.screen[:] = snapshot.screen
+    machine.dirty_rows = ALL_ROWS  # the screen was swapped out from under whatever presented it
+    machine.key[:] = snapshot.key
+    machine.draw_flag = snapshot.draw_flag
+    machine.cycles = snapshot.cycles
+    if snapshot.random_state is not None:
+        machine.random.setstate(snapshot.random_state)
+    return machine
+
+
+def to_bytes(snapshot, compress=True):
+    flags = (FLAG_COMPRESSED if compress else 0) | (FLAG_RANDOM if snapshot.random_state is not None else 0)
+    body = BODY.pack(
+        snapshot.program_counter & 0xFFFF,
+        snapshot.index_counter & 0xFFFF,
+        snapshot.stack_pointer,
+        snapshot.delay_timer,
+        snapshot.sound_timer,
+        snapshot.cycles,
+        bool(snapshot.draw_flag),
+        snapshot.memory,
+        snapshot.reg,
+        *[address & 0xFFFF for address in snapshot.stack],
+        snapshot.key,
+        *snapshot.screen,
+    )
+    if snapshot.random_state is not None:
+        version, state, gauss_next = snapshot.random_state
+        body += RANDOM_STATE.pack(*state, float("nan") if gauss_next is None else gauss_next)
+    if compress:
+        body = zlib.compress(body)
+    return HEADER.pack(MAGIC, VERSION, flags) + body
+
+
+# returns the flags of a save state's header, after checking it's a save state of this version
+def _check_header(data):
+    magic, version, flags = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise SnapshotException("Not a save state", magic=magic)
+    if version != VERSION:
+        raise SnapshotException("Unsupported save state version", version=version)
+    return flags
+
+
+def from_bytes(data):
+    if len(data) < HEADER.size:
+        raise SnapshotException("Save state too short", size=len(data))
+    flags = _check_header(data)
+    if flags & FLAG_C_STRUCT:
+        raise SnapshotException("Save state is a Chip8 struct, see from_c_struct", flags=flags)
+    body = data[HEADER.size :]
+    if flags & FLAG_COMPRESSED:
+        try:
+            body = zlib.decompress(body)
+        except zlib.error as e:
+            raise SnapshotException("Corrupt save state", error=str(e))
+    expected = BODY.size + (RANDOM_STATE.size if flags & FLAG_RANDOM else 0)
+    if len(body) != expected:
+        raise SnapshotException("Save state has the wrong size", size=len(body), expected=expected)
+
+    fields = BODY.unpack_from(body)
+    pc, index, sp, delay, sound, cycles, draw_flag, memory, reg = fields[:9]
+    stack = fields[9 : 9 + STACK_SIZE]
+    key = fields[9 + STACK_SIZE]
+    screen = fields[10 + STACK_SIZE :]
+    random_state = None
+    if flags & FLAG_RANDOM:
+        *state, gauss_next = RANDOM_STATE.unpack_from(body, BODY.size)
+        random_state = (RANDOM_VERSION, tuple(state), None if gauss_next != gauss_next else gauss_next)
+    return Snapshot(
+        program_counter=pc,
+        index_counter=index,
+        stack_pointer=sp,
+        pages=tuple(memory[i : i + PAGE_SIZE] for i in range(0, MAX_MEMORY, PAGE_SIZE)),
+        reg=reg,
+        stack=stack,
+        delay_timer=delay,
+        sound_timer=sound,
+        screen=screen,
+        key=key,
+        draw_flag=draw_flag,
+        cycles=cycles,
+        random_state=random_state,
+    )
+
+
+def save(machine, path, compress=True):
+    with open(path, "wb") as f:
+        f.write(to_bytes(snapshot(machine), compress))
+
+
+def load(machine, path):
+    with open(path, "rb") as f:
+        return restore(machine, from_bytes(f.read()))
+
+
+# the snapshot as the Chip8 struct in src/chip8.h, with the header saveState writes
+def to_c_struct(snapshot):
+    header = HEADER.pack(MAGIC, VERSION, FLAG_C_STRUCT) + C_SIZE.pack(C_STRUCT.size)
+    return header + C_STRUCT.pack(
+        snapshot.program_counter & 0xFFFF,
+        snapshot.index_counter & 0xFFFF,
+        snapshot.stack_pointer,
+        snapshot.memory,
+        snapshot.reg,
+        *[address & 0xFFFF for address in snapshot.stack],
+        snapshot.delay_timer,
+        snapshot.sound_timer,
+        pixels_from_screen(snapshot.screen),
+        snapshot.key,
+        b"\x01" if snapshot.draw_flag else b"\x00",
+        ALL_ROWS,  # dirtyRows, whatever loads it hasn't presented this screen
+    )
+
+
+# a snapshot from what saveState writes, the Chip8 struct in src/chip8.h after a header. The struct doesn't have the
+# cycle count or the random state, so restoring it keeps the machine's random number generator as it is
+def from_c_struct(data):
+    if len(data) < HEADER.size + C_SIZE.size:
+        raise SnapshotException("Save state too short", size=len(data))
+    flags = _check_header(data)
+    if flags != FLAG_C_STRUCT:
+        raise SnapshotException("Save state isn't a Chip8 struct", flags=flags)
+    size = C_SIZE.unpack_from(data, HEADER.size)[0]
+    body = data[HEADER.size + C_SIZE.size :]
+    if size != C_STRUCT.size or len(body) != size:
+        raise SnapshotException("Wrong size for a Chip8 struct", size=size, length=len(body), expected=C_STRUCT.size)
+    fields = C_STRUCT.unpack(body)
+    pc, index, sp, memory, reg = fields[:5]
+    stack = fields[5 : 5 + STACK_SIZE]
+    delay, sound, graphics, key, draw_flag, dirty_rows = fields[5 + STACK_SIZE :]
+    return Snapshot(
+        program_counter=pc,
+        index_counter=index,
+        stack_pointer=sp,
+        pages=tuple(memory[i : i + PAGE_SIZE] for i in range(0, MAX_MEMORY, PAGE_SIZE)),
+        reg=reg,
+        stack=stack,
+        delay_timer=delay,
+        sound_timer=sound,
+        screen=tuple(screen_from_pixels(graphics)),
+        key=key,
+        draw_flag=draw_flag != b"\x00",
+        cycles=0,
+        random_state=None,
+    )
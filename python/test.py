@@ -5,6 +5,13 @@ This file has all the test cases for the assembler/disassembler/Instruction-clas
 There's better ways to implement this in python, but the purpose of this project was to learn about assemblers/disassemblers/emulators
 
 """
+import mmap
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+
 from lib import *
 
 cases = [
@@ -87,4 +94,306 @@ if __name__ == "__main__":
     )
     print("passed:\t{}\t{}\t\t\t{}".format(hex(op_code), asm, instruction))
 
+    # the decode table has to agree with walking MATCHERS in order, including the op codes that only the FallBack takes
+    table = get_op_code_table()
+    assert len(table) == OP_CODE_COUNT, "decode table has {} entries".format(len(table))
+    for op_code in range(OP_CODE_COUNT):
+        op_code_bytes = int.to_bytes(op_code, length=2, byteorder="big")
+        expected = next(matcher for matcher in MATCHERS if matcher.matches_op_code(op_code_bytes))
+        assert table[op_code] is expected, "decode table mismatch: {}\t{}\t{}".format(
+            "%#x" % op_code, table[op_code], expected
+        )
+    print("passed:\tdecode table")
+
+    # known mnemonics with the wrong argument types still end up in the FallBackMatcher, blank lines parse to nothing
+    parsed_asm = parse_asm("JMP v0x1 ; not an address")
+    assert type(parsed_asm) == Instruction and parsed_asm.args == (Register(0x1),), "fallback not used: {}".format(
+        parsed_asm
+    )
+    assert parse_asm("   ; only a comment") is None, "comment only line should not parse"
+    print("passed:\tasm fallback")
+
+    # disassembling a whole buffer should give the same instructions as decoding it 2 bytes at a time
+    rom = b"".join(int.to_bytes(op_code, length=2, byteorder="big") for op_code, _, _ in cases) + b"\xff"
+    expected = [parse_op_code(rom[i : i + 2]) for i in range(0, len(rom) - 1, 2)]
+    assert list(disassemble(rom)) == list(disassemble(memoryview(bytearray(rom)))) == expected, "disassembly differs"
+    assert list(disassemble(rom, start=0x202, end=0x206)) == expected[1:3], "disassembly offsets not respected"
+    assert encode(disassemble(rom)) == rom[:-1], "encoded rom differs"
+    big = bytes(range(256)) * (4 * DISASSEMBLE_CHUNK // 256) + b"\x12"  # spans chunks, with a short last one
+    expected = [parse_op_code(big[i : i + 2]) for i in range(0, len(big) - 1, 2)]
+    assert list(disassemble(big)) == expected, "chunked disassembly differs"
+    assert list(disassemble(big, start=0x201, end=0x205)) == list(disassemble(big[1:5])), "offsets across chunks"
+
+    # the rom's buffer isn't held while the generator is suspended, so an mmap can be closed under a partly consumed one
+    with tempfile.TemporaryFile() as f:
+        f.write(big)
+        f.flush()
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        instructions = disassemble(mapped)
+        assert next(instructions) == parse_op_code(big[:2]), "mmap disassembly differs"
+        mapped.close()
+        instructions.close()
+    print("passed:\tdisassemble")
+
+    # cached instructions are shared between occurrences of an op code, and the LRU mode drops the oldest op code
+    cache = InstructionCache(max_size=2)
+    instructions = list(disassemble(b"\x00\xe0\x00\xee\x00\xe0\x12\x00\x00\xee", cache=cache))
+    assert instructions[0] is instructions[2] and instructions[1] is not instructions[4], "cache not shared"
+    assert (cache.hits, cache.misses, len(cache)) == (1, 4, 2), "cache counts wrong: {}".format(
+        (cache.hits, cache.misses, len(cache))
+    )
+    cache = InstructionCache().populate()
+    assert cache.get(0x00E0) is cache.get(0x00E0) == ClearScreen() and cache.misses == 0, "populated cache missed"
+    shared = cache.get(0x1234)
+    for target, name in [(shared, "args"), (shared.address, "value")]:
+        try:
+            setattr(target, name, Address(0x200))
+        except AttributeError:
+            pass
+        else:
+            raise AssertionError("cached {} was changed through {}".format(shared, name))
+    assert cache.get(0x1234).asm == "JMP\ta0x234", "cached instruction changed"
+    print("passed:\tinstruction cache")
+
+    # instructions and their args refuse writes, so the cached encodings can't go stale. Pickling/copying still works
+    instruction = JumpToAddress(Address(0x234))
+    assert instruction.op_code == 0x1234 and instruction.asm == "JMP\ta0x234", "wrong encoding"
+    for target, name in [(instruction, "args"), (instruction, "_cached_op_code"), (instruction.address, "value")]:
+        try:
+            setattr(target, name, None)
+        except AttributeError:
+            pass
+        else:
+            raise AssertionError("{} of {} was changed".format(name, type(target).__name__))
+    assert instruction.op_code == 0x1234 and instruction.op_code_bytes == b"\x12\x34", "cached encoding changed"
+    copied = pickle.loads(pickle.dumps(instruction))
+    assert copied == instruction and copied.asm == instruction.asm, "pickled instruction differs"
+    print("passed:\timmutable instructions")
+
+    # --batch writes the same listings as disassembling each rom on its own, and rejects less than 1 worker
+    with tempfile.TemporaryDirectory() as directory:
+        rom_dir, output_dir = os.path.join(directory, "roms"), os.path.join(directory, "asm")
+        os.makedirs(rom_dir)
+        roms = {"A": rom, "B": rom[::-1], "C": rom[4:]}
+        for name, contents in roms.items():
+            with open(os.path.join(rom_dir, name), "wb") as f:
+                f.write(contents)
+        disassembler = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "disassembler.py")]
+        index = os.path.join(directory, "index.tsv")
+        subprocess.run(
+            disassembler + ["--batch", rom_dir, "--output_dir", output_dir, "--index", index, "--workers", "2", "-asm"],
+            check=True,
+        )
+        for name in roms:
+            serial = subprocess.run(
+                disassembler + ["--file", os.path.join(rom_dir, name), "-asm"], check=True, stdout=subprocess.PIPE
+            ).stdout.decode()
+            with open(os.path.join(output_dir, name + ".asm")) as f:
+                assert f.read() == serial, "batch listing differs for {}".format(name)
+        with open(index) as f:
+            assert [line.split("\t")[1] for line in f.read().splitlines()[1:]] == [
+                os.path.join(output_dir, name + ".asm") for name in sorted(roms)
+            ], "index out of order"
+        assert (
+            subprocess.run(
+                disassembler + ["--batch", rom_dir, "--output_dir", output_dir, "--workers", "0"],
+                stderr=subprocess.DEVNULL,
+            ).returncode
+            == 2
+        ), "--workers 0 not rejected"
+    print("passed:\tbatch disassemble")
+
+    # the numpy decoder is optional, so it's only checked when numpy is installed
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+    if numpy is not None:
+        from array_decoder import decode_rom, get_kind_classes
+
+        decoded = decode_rom(numpy.arange(OP_CODE_COUNT, dtype=">u2").tobytes(), base=0)
+        assert decoded["kind"].tolist() == [MATCHERS.index(matcher) for matcher in table], "kinds disagree with MATCHERS"
+        assert get_kind_classes()[decoded["kind"][0x00E0]] == ClearScreen, "wrong class for kind"
+        print("passed:\tarray decoder")
+
+    # labels resolve to the address of the instruction after them, whether they're used before or after that
+    program = [
+        "start:  LD v0x0 c0x5 ; a label in front of an instruction",
+        "        CALL @Count",
+        "        JMP @start",
+        "",
+        "Count:",
+        "loop:   ADD v0x0 c0xff",
+        "        SE v0x0 c0x0",
+        "        JMP @loop",
+        "        RTN",
+    ]
+    instructions, symbols = assemble(program)
+    assert symbols == {"start": 0x200, "Count": 0x206, "loop": 0x206}, "wrong symbols: {}".format(symbols)
+    assert [instruction.op_code for instruction in instructions] == [
+        0x6005,
+        0x2206,
+        0x1200,
+        0x70FF,
+        0x3000,
+        0x1206,
+        0x00EE,
+    ]
+    assert list(symbol_lines(symbols)) == ["0x200\tstart", "0x206\tCount", "0x206\tloop"], "wrong symbol map"
+    assert parse_asm("JMP @loop").args == (Label("loop"),), "label reference not parsed"
+    for program in [["JMP @nowhere"], ["a: CLS", "a: CLS"], ["JMP @end"] + ["CLS"] * 0x700 + ["end:"]]:
+        try:
+            assemble(program)
+            assert False, "should not assemble: {}".format(program[:2])
+        except UnknownAsmException:
+            pass
+
+    # a long generated program with a forward and a backward reference per line still assembles in one go
+    program = ["l{}: JMP @l{}".format(i, (i + 1000) % 1500) for i in range(1500)]
+    instructions, symbols = assemble(program, base=0)
+    assert len(symbols) == 1500 and instructions[600].op_code == 0x1000 | 2 * 100, "generated program wrong"
+    print("passed:\tlabels")
+
+    # streaming gives the same instructions as assembling the whole program when the labels come first, one line at a
+    # time as the lines are read, and the rom comes out the same in chunks
+    program = ["l{}: LD v0x{:x} c0x{:x}".format(i, i % 16, i % 256) for i in range(300)] + ["JMP @l0", "CALL @l299"]
+    symbols, read = {}, []
+    streamed = assemble_lines((read.append(line) or line for line in program), symbols=symbols)
+    instructions = [next(streamed)]
+    assert len(read) == 1, "stream read ahead"
+    instructions += streamed
+    assert (instructions, symbols) == assemble(program), "stream differs"
+    chunks = list(encode_chunks(instructions, chunk_bytes=64))
+    assert b"".join(chunks) == encode(instructions) and len(chunks) == 10, "chunks wrong"
+    try:
+        list(assemble_lines(["JMP @later", "later: CLS"]))
+        assert False, "stream resolved a forward reference"
+    except UnknownAsmException:
+        pass
+    print("passed:\tstreaming")
+
+    # incremental builds come out the same as assembling from scratch, re-parsing only new lines, and the patches turn
+    # the last rom into the new one
+    from incremental import IncrementalAssembler
+
+    program = ["l{}: ADD v0x{:x} c0x{:x}".format(i, i % 16, i) for i in range(200)] + ["JMP @l5", "end: CALL @l150"]
+    edits = [
+        lambda lines: lines.__setitem__(100, "l100: LD v0x1 c0x2"),  # same length, nothing moves
+        lambda lines: lines.insert(3, "CLS ; moves every label after it"),
+        lambda lines: lines.insert(0, "JMP @end"),  # forward reference
+        lambda lines: lines.__delitem__(4),
+        lambda lines: lines.append("; comment only"),
+        lambda lines: lines.__setitem__(-3, "JMP @l6"),
+    ]
+    incremental = IncrementalAssembler()
+    incremental.update(program)
+    for edit in edits:
+        edit(program)
+        rom, misses = bytearray(incremental.rom), incremental.misses
+        for offset, data in incremental.update(program):
+            rom[offset : offset + len(data)] = data
+        del rom[len(incremental.rom) :]
+        instructions, symbols = assemble(program)
+        assert (incremental.instructions, incremental.symbols) == (instructions, symbols), "incremental build differs"
+        assert incremental.rom == rom == encode(instructions), "incremental rom/patches differ"
+        assert incremental.misses - misses <= 1, "unchanged lines parsed again"
+    try:
+        incremental.update(program[:-2])  # drops the definition of end
+        assert False, "removed label still resolved"
+    except UnknownAsmException:
+        pass
+    misses = incremental.misses
+    assert incremental.update(program) == [(0, encode(assemble(program)[0]))], "not rebuilt after an error"
+    assert incremental.misses == misses, "rebuild after an error parsed lines again"
+    print("passed:\tincremental")
+
+    # macros and repeat blocks expand to the same instructions as writing them out, and each macro/args pair is only
+    # expanded and matched once
+    program = [
+        ".macro print_bcd reg x y",
+        "    LDI @digits",
+        "    BCD \\reg",
+        "    LDIR v0x2",
+        "    SISR v0x0",
+        "    DRAW \\x \\y n0x5",
+        ".endm",
+        ".macro twice reg",
+        "    .rept 2",
+        "        ADD \\reg c0x1",
+        "    .endr",
+        ".endm",
+        "start: print_bcd v0x5 v0xa v0xb",
+        "    print_bcd v0x5 v0xa v0xb ; same args",
+        "    print_bcd v0x6 v0xa v0xb",
+        ".rept 0x3",
+        "    twice v0x1",
+        ".endr",
+        "digits: JMP @start",
+    ]
+    print_five = ["LDI @digits", "BCD v0x5", "LDIR v0x2", "SISR v0x0", "DRAW v0xa v0xb n0x5"]
+    written = ["start:"] + print_five * 2 + ["LDI @digits", "BCD v0x6", "LDIR v0x2", "SISR v0x0", "DRAW v0xa v0xb n0x5"]
+    written += ["ADD v0x1 c0x1"] * 6 + ["digits: JMP @start"]
+    macros = Macros()
+    instructions, symbols = assemble(program, macros=macros)
+    assert (instructions, symbols) == assemble(written), "macros expanded wrong"
+    assert instructions[1] is instructions[6] and instructions[15] is instructions[20], "expansion not shared"
+    assert (macros.hits, macros.misses) == (1, 3), "wrong memo counts: {}".format((macros.hits, macros.misses))
+    streamed = ["digits: CLS"] + program[:-1]
+    assert list(assemble_lines(streamed)) == assemble(streamed)[0], "streamed macros differ"
+    for program in [
+        [".macro m a", "CLS", ".endm", "m"],
+        [".macro m", "here: CLS", ".endm", "m"],
+        [".macro m", "CLS"],
+        [".macro m", "m", ".endm", "m"],
+        [".macro m \\a", "ADD \\b c0x1", ".endm", "m v0x1"],
+        [".macro CLS", ".endm"],
+        [".rept many", "CLS", ".endr"],
+        [".endr"],
+    ]:
+        try:
+            assemble(program)
+            assert False, "should not assemble: {}".format(program)
+        except UnknownAsmException:
+            pass
+    print("passed:\tmacros")
+
+    # the optimizer merges/drops/threads/removes, but never the instruction in a skip's slot, an ADD that's jumped to,
+    # or data, and moves the addresses along
+    from optimizer import optimize
+
+    def optimized(program):
+        instructions, symbols = assemble(program)
+        instructions, report = optimize(instructions)
+        return [instruction.asm for instruction in instructions], report
+
+    program = ["start: ADD v0x0 c0x1", "ADD v0x0 c0x2", "LDR v0x1 v0x1", "JMP @mid", "CLS", "mid: JMP @start"]
+    listing, report = optimized(program)
+    assert listing == ["ADD\tv0x0 c0x3", "JMP\ta0x200"], listing
+    assert (report.merged, report.dropped, report.unreachable, report.threaded) == (1, 1, 2, 1), str(report)
+    assert (report.saved_instructions, report.saved_bytes, report.relocate(0x20A)) == (4, 8, 0x204), str(report)
+
+    program = ["SE v0x0 c0x1", "ADD v0x1 c0x1", "ADD v0x1 c0x1", "SKP v0x0", "LDR v0x2 v0x2", "again: ADD v0x3 c0x1"]
+    program += ["ADD v0x3 c0x1", "LDI @sprite", "SNE v0x3 c0x4", "JMP @again", "end: JMP @end"]
+    program += ["sprite: SYS a0x0ff", "CLS"]
+    listing, report = optimized(program)
+    assert listing == [
+        "SE\tv0x0 c0x1",
+        "ADD\tv0x1 c0x1",  # skipped on its own, so not merged with the next
+        "ADD\tv0x1 c0x1",
+        "SKP\tv0x0",
+        "LDR\tv0x2 v0x2",  # the skip would skip something else without it
+        "ADD\tv0x3 c0x2",  # the first of the ADDs is jumped to, the second isn't
+        "LDI\ta0x214",
+        "SNE\tv0x3 c0x4",
+        "JMP\ta0x20a",
+        "JMP\ta0x212",
+        "SYS\ta0xff",  # unreachable, but an LDI points there
+        "CLS",
+    ], listing
+    # with a JMPR, the jumps are still threaded but nothing can move
+    listing, report = optimized(["JMP @here", "here: JMP @there", "there: LDR v0x0 v0x0", "JMPR a0x200", "CLS"])
+    assert listing == ["JMP\ta0x204", "JMP\ta0x204", "LDR\tv0x0 v0x0", "JMPR\ta0x200", "CLS"], listing
+    assert report.saved_bytes == 0 and report.skipped == "JMPR", str(report)
+    print("passed:\toptimizer")
+
     print("All test cases passed")
@@ -0,0 +1,629 @@
+#!/usr/bin/env python3
+
+"""
+Test cases for the python emulator, ported from tst/test_chip8.c (plus the cases that file is missing)
+"""
+
+import os
+
+from emulator import *
+
+
+def test_return():
+    to_test = Chip8()
+    to_test.load_instructions([0x20FC])
+    to_test.write_memory(0x0FC, b"\x00\xee")
+
+    to_test.emulate_cycle()
+    assert to_test.program_counter == 0x0FC
+    assert to_test.stack_pointer == 1
+    assert to_test.stack[0] == 0x200
+
+    to_test.emulate_cycle()
+    assert to_test.program_counter == 0x202
+    assert to_test.stack_pointer == 0
+
+
+def test_clear_screen():
+    to_test = Chip8()
+    to_test.load_instructions([0x00E0])
+    to_test.graphics = bytes(7) + b"\x01" + bytes(GRAPHICS_WIDTH * GRAPHICS_HEIGHT - 8)
+
+    to_test.emulate_cycle()
+    assert to_test.program_counter == 0x0202
+    assert to_test.graphics[7] == 0
+    assert to_test.draw_flag
+
+
+def test_jump():
+    to_test = Chip8()
+    to_test.load_instructions([0x10FC])
+    to_test.emulate_cycle()
+    assert to_test.program_counter == 0x00FC
+
+
+def test_subroutine():
+    to_test = Chip8()
+    to_test.load_instructions([0x20FC])
+    to_test.emulate_cycle()
+    assert to_test.program_counter == 0x00FC
+    assert to_test.stack_pointer == 1
+    assert to_test.stack[0] == 0x200
+
+
+def test_skip_if_equal():
+    to_test = Chip8()
+    to_test.load_instructions([0x34FC, 0xFFFF, 0x34FF])
+    to_test.reg[4] = 0xFC
+
+    to_test.emulate_cycle()
+    assert to_test.program_counter == 0x204  # skipped
+
+    to_test.emulate_cycle()
+    assert to_test.program_counter == 0x206  # not skipped
+
+
+def test_skip_if_not_equal():
+    to_test = Chip8()
+    to_test.load_instructions([0x40FC, 0x40FF, 0xFFFF])
+    to_test.reg[0] = 0xFC
+
+    to_test.emulate_cycle()
+    assert to_test.program_counter == 0x202  # not skipped
+
+    to_test.emulate_cycle()
+    assert to_test.program_counter == 0x206  # skipped
+
+
+def test_skip_if_reg_equal():
+    to_test = Chip8()
+    to_test.load_instructions([0x5010, 0xFFFF, 0x5230])
+    to_test.reg[0:4] = bytes([0xFC, 0xFC, 0x00, 0xFF])
+
+    to_test.emulate_cycle()
+    assert to_test.program_counter == 0x204  # equal - skip
+
+    to_test.emulate_cycle()
+    assert to_test.program_counter == 0x206  # not equal - don't skip
+
+
+def test_set_register():
+    to_test = Chip8()
+    to_test.load_instructions([0x61FC])
+
+    to_test.emulate_cycle()
+    assert to_test.program_counter == 0x202
+    assert to_test.reg[1] == 0xFC
+
+
+def test_add_register():
+    to_test = Chip8()
+    to_test.load_instructions([0x6622, 0x7622, 0x76FF])
+
+    to_test.emulate_cycle()
+    assert to_test.reg[6] == 0x22
+
+    to_test.emulate_cycle()
+    assert to_test.program_counter == 0x204
+    assert to_test.reg[6] == 0x44
+
+    to_test.emulate_cycle()
+    assert to_test.reg[6] == 0x43  # wraps, without touching the carry flag
+    assert to_test.reg[0xF] == 0
+
+
+def test_register_logic():
+    to_test = Chip8()
+    to_test.load_instructions([0x8AB0, 0x8CD1, 0x8792, 0x81A3])
+    to_test.reg[0xB] = 0xAB
+    to_test.reg[0xC], to_test.reg[0xD] = 0xF0, 0x0F
+    to_test.reg[0x7], to_test.reg[0x9] = 0xFA, 0xAF
+    to_test.reg[0x1], to_test.reg[0xA] = 0x7A, 0x92
+
+    to_test.emulate_cycle()
+    assert to_test.reg[0xA] == 0xAB
+
+    to_test.emulate_cycle()
+    assert to_test.reg[0xC] == 0xFF
+
+    to_test.emulate_cycle()
+    assert to_test.reg[0x7] == 0xAA
+
+    to_test.reg[0xA] = 0x92
+    to_test.emulate_cycle()
+    assert to_test.program_counter == 0x208
+    assert to_test.reg[0x1] == 0xE8
+
+
+def test_add_registers():
+    to_test = Chip8()
+    to_test.load_instructions([0x8134, 0x8134, 0x8134])
+    to_test.reg[0x1] = 0xFE
+    to_test.reg[0x3] = 0x01
+
+    expected = [(0xFF, 0), (0x00, 1), (0x01, 0)]
+    for value, carry in expected:
+        to_test.emulate_cycle()
+        assert (to_test.reg[0x1], to_test.reg[0x3], to_test.reg[0xF]) == (value, 0x01, carry)
+    assert to_test.program_counter == 0x206
+
+
+def test_subtract_registers():
+    to_test = Chip8()
+    to_test.load_instructions([0x8135, 0x8135, 0x8135])
+    to_test.reg[0x1] = 0x01
+    to_test.reg[0x3] = 0x01
+
+    expected = [(0x00, 1), (0xFF, 0), (0xFE, 1)]
+    for value, no_borrow in expected:
+        to_test.emulate_cycle()
+        assert (to_test.reg[0x1], to_test.reg[0x3], to_test.reg[0xF]) == (value, 0x01, no_borrow)
+
+
+def test_shifts():
+    to_test = Chip8()
+    to_test.load_instructions([0x8006, 0x8006, 0x8006, 0x850E, 0x850E, 0x850E])
+    to_test.reg[0x0] = 0x05
+    to_test.reg[0x5] = 0x2A
+
+    for value, flag in [(0x02, 1), (0x01, 0), (0x00, 1)]:
+        to_test.emulate_cycle()
+        assert (to_test.reg[0x0], to_test.reg[0xF]) == (value, flag)
+    for value, flag in [(0x54, 0), (0xA8, 0), (0x50, 1)]:
+        to_test.emulate_cycle()
+        assert (to_test.reg[0x5], to_test.reg[0xF]) == (value, flag)
+
+
+def test_reverse_subtract():
+    to_test = Chip8()
+    to_test.load_instructions([0x8A57, 0x8A57])
+    to_test.reg[0xA] = 0x01
+    to_test.reg[0x5] = 0x03
+
+    to_test.emulate_cycle()
+    assert (to_test.reg[0xA], to_test.reg[0x5], to_test.reg[0xF]) == (0x02, 0x03, 1)
+
+    to_test.reg[0xA] = 0x03
+    to_test.reg[0x5] = 0x01
+    to_test.emulate_cycle()
+    assert (to_test.reg[0xA], to_test.reg[0x5], to_test.reg[0xF]) == (0xFE, 0x01, 0)
+
+
+def test_skip_if_reg_not_equal():
+    to_test = Chip8()
+    to_test.load_instructions([0x9010, 0x9230, 0xFFFF])
+    to_test.reg[0:4] = bytes([0xFC, 0xFC, 0x00, 0xFF])
+
+    to_test.emulate_cycle()
+    assert to_test.program_counter == 0x202  # equal - don't skip
+
+    to_test.emulate_cycle()
+    assert to_test.program_counter == 0x206  # not equal - skip
+
+
+def test_index_counter():
+    to_test = Chip8()
+    to_test.load_instructions([0xAEC2, 0xF01E, 0xF129])
+    to_test.reg[0x0] = 0x40
+    to_test.reg[0x1] = 0x3
+
+    to_test.emulate_cycle()
+    assert to_test.index_counter == 0x0EC2
+
+    to_test.emulate_cycle()
+    assert to_test.index_counter == 0x0F02
+    assert to_test.reg[0xF] == 0
+
+    to_test.emulate_cycle()
+    assert to_test.index_counter == 0x0F  # font sprite for 3
+
+
+def test_jump_to_address_and_reg():
+    to_test = Chip8()
+    to_test.load_instructions([0xB001])
+    to_test.reg[0] = 0x01
+
+    to_test.emulate_cycle()
+    assert to_test.program_counter == 0x002
+
+
+def test_rand_mask():
+    to_test, same_seed = Chip8(seed=8), Chip8(seed=8)
+    for machine in (to_test, same_seed):
+        machine.load_instructions([0xC00F, 0xC00F, 0xC00F])
+        machine.run(3)
+    assert to_test.program_counter == 0x206
+    assert to_test.reg[0] <= 0x0F
+    assert to_test.reg == same_seed.reg
+
+
+def test_draw():
+    to_test = Chip8()
+    to_test.load_instructions([0xD015, 0xD015, 0xD235])  # font sprite for 0, drawn twice, then over the edge
+    to_test.reg[0x2], to_test.reg[0x3] = 62, 30
+
+    to_test.emulate_cycle()
+    assert to_test.graphics[0:8] == bytes([1, 1, 1, 1, 0, 0, 0, 0])
+    assert to_test.screen[0] == 0xF0 << 56 and to_test.screen[1] == 0x90 << 56  # the leftmost pixel is the high bit
+    assert to_test.reg[0xF] == 0
+
+    to_test.emulate_cycle()  # erases it again, which is a collision
+    assert sum(to_test.graphics) == 0
+    assert to_test.reg[0xF] == 1
+
+    to_test.emulate_cycle()
+    assert to_test.graphics[30 * GRAPHICS_WIDTH + 62] == 1  # top left stays put
+    assert to_test.graphics[30 * GRAPHICS_WIDTH + 0] == 1  # the right half wraps to the left edge
+    assert to_test.graphics[0 * GRAPHICS_WIDTH + 62] == 1  # the bottom rows wrap to the top
+    assert to_test.reg[0xF] == 0
+
+
+def test_keys():
+    to_test = Chip8()
+    to_test.load_instructions([0xE09E, 0xE0A1, 0xF30A, 0xF30A])
+    to_test.reg[0] = 0x5
+
+    to_test.emulate_cycle()
+    assert to_test.program_counter == 0x202  # not pressed - don't skip
+
+    to_test.key[0x5] = 1
+    to_test.emulate_cycle()
+    assert to_test.program_counter == 0x204  # pressed - don't skip
+
+    to_test.key[0x5] = 0
+    to_test.delay_timer = 2
+    to_test.emulate_cycle()
+    assert to_test.program_counter == 0x204  # waits for a key
+    assert to_test.delay_timer == 1  # while the timers keep counting down
+
+    to_test.key[0x9] = 1
+    to_test.emulate_cycle()
+    assert to_test.program_counter == 0x206
+    assert to_test.reg[0x3] == 0x9
+
+
+def test_timers():
+    to_test = Chip8()
+    to_test.load_instructions([0x6005, 0xF015, 0xF018, 0xF107])
+
+    to_test.run(3)
+    assert (to_test.delay_timer, to_test.sound_timer) == (3, 4)  # both count down once per cycle after being set
+
+    to_test.emulate_cycle()
+    assert to_test.reg[0x1] == 3
+    assert to_test.delay_timer == 2
+
+
+def test_memory():
+    to_test = Chip8()
+    to_test.load_instructions([0xA300, 0xF233, 0xA300, 0xF265, 0xA206, 0xF155])
+    to_test.reg[2] = 234
+
+    to_test.run(2)
+    assert to_test.memory[0x300:0x303] == bytes([2, 3, 4])
+
+    to_test.run(2)
+    assert to_test.reg[0:3] == bytes([2, 3, 4])
+    assert to_test.index_counter == 0x303
+
+    to_test.run(2)  # overwrites the LDI at 0x206 with 0x0203
+    assert to_test.memory[0x206:0x208] == bytes([2, 3])
+    assert to_test.program_counter == 0x20C
+
+    to_test.program_counter = 0x206
+    try:
+        to_test.emulate_cycle()  # the rewritten op code is SYS 0x203, not the LDI that was decoded there before
+        assert False, "expected the rewritten op code to be decoded again"
+    except EmulatorException as e:
+        assert e.kwargs["op_code"] == 0x203
+
+
+def test_errors():
+    for op_codes in ([0x00EE], [0x0123], [0x800F], [0xE0FF]):
+        to_test = Chip8()
+        to_test.load_instructions(op_codes)
+        try:
+            to_test.emulate_cycle()
+            assert False, "expected an error for {}".format(op_codes)
+        except EmulatorException:
+            pass
+
+    to_test = Chip8()
+    to_test.load_instructions([0x2200])  # calls itself until the stack is full
+    for _ in range(STACK_SIZE):
+        to_test.emulate_cycle()
+    try:
+        to_test.emulate_cycle()
+        assert False, "expected the stack to run out after {} calls".format(STACK_SIZE)
+    except EmulatorException:
+        assert to_test.stack_pointer == STACK_SIZE
+
+    to_test = Chip8()
+    to_test.load_instructions([0xF0FF])  # unknown 0xF... op codes are skipped, like src/chip8.c
+    to_test.emulate_cycle()
+    assert to_test.program_counter == 0x202
+
+
+ROM_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "roms")
+
+# programs for checking the faster ways of running against Chip8 one instruction at a time: skips over jumps, calls,
+# timers, code that writes over itself, VF as an operand, errors that depend on the keys/RNG, sprites and LDIR that wrap
+# around the screen/memory, a RTN in the same block as its CALL, and some real roms
+PROGRAMS = [
+    [0x6005, 0xF015, 0x2210, 0x3100, 0x7101, 0x4102, 0x1206, 0xF107, 0x120C, 0x0000],
+    [0x6003, 0x3003, 0x6104, 0x3104, 0x2208, 0x1200, 0x0000, 0x0000, 0x8014, 0x00EE],
+    [0xA300, 0x6201, 0xF233, 0xF265, 0x7201, 0x120A, 0xC0FF, 0xD015, 0x00E0, 0x2200],
+    [0x6FF0, 0x6120, 0x8F14, 0x81F5, 0x8FF7, 0x8FF6, 0x8FFE, 0xFF1E, 0xFF29, 0x1200],
+    [0xF00A, 0x3003, 0x120A, 0xC101, 0x1206, 0x3005, 0x00EE, 0x0123],
+    [0x2200],
+    [0x6030, 0x7101, 0xF015, 0x7201, 0xF307, 0xF318, 0x3110, 0x1202, 0xF307, 0x120E],
+    [0x6040, 0xF015, 0xF018, 0xF107, 0x3100, 0x1206, 0x7011, 0x1202],
+    [0x6106, 0xE19E, 0x1202, 0xF20A, 0x6020, 0xF015, 0x120C],
+    [0x6000, 0x3001, 0x4105, 0x0000, 0x1200],
+    [0xAFFE, 0xF233, 0xF265, 0x220E, 0xD34F, 0x7338, 0x1200, 0x641C, 0x7225, 0x8514, 0x00EE],
+]
+PROGRAMS += [open(os.path.join(ROM_DIR, name), "rb").read() for name in ["BLINKY", "INVADERS", "PONG"]]
+STATE = ["program_counter", "index_counter", "stack_pointer", "memory", "reg", "stack", "delay_timer", "sound_timer"]
+STATE += ["graphics", "draw_flag", "dirty_rows", "cycles"]
+
+
+def load(machine, program):
+    if isinstance(program, list):
+        machine.load_instructions(program)
+    else:
+        machine.load_rom(program)
+
+
+def run(machine, cycles):
+    try:
+        machine.run(cycles)
+    except EmulatorException as e:
+        return repr(e)
+
+
+def assert_same_state(expected, actual):
+    for name in STATE:
+        assert getattr(expected, name) == getattr(actual, name), name
+
+
+# translated blocks have to leave the machine in the same state as running one instruction at a time, wherever a run
+# stops (including in the middle of a block, or on an error)
+def test_blocks_match_interpreter():
+    for program, cycles_per_tick in [(program, 1) for program in PROGRAMS] + [(program, 7) for program in PROGRAMS]:
+        interpreted = Chip8(seed=3, translate=False, cycles_per_tick=cycles_per_tick)
+        translated = Chip8(seed=3, cycles_per_tick=cycles_per_tick)
+        load(interpreted, program)
+        load(translated, program)
+        for key in range(KEYS):
+            interpreted.key[key] = translated.key[key] = key % 3 == 0
+            error = run(interpreted, 1 + key * 91)
+            assert error == run(translated, 1 + key * 91), error
+            assert_same_state(interpreted, translated)
+            if error:
+                break
+
+
+# every instance of a batch has to match its own Chip8, including the ones that halt while the others carry on
+def test_batch_matches_chip8():
+    try:
+        from batch_emulator import Chip8Batch
+    except ImportError:  # numpy isn't installed
+        return
+    count = 8
+    for program, cycles_per_tick in [(program, 1) for program in PROGRAMS] + [(PROGRAMS[0], 3), (PROGRAMS[-1], 9)]:
+        batch = Chip8Batch(count, seed=5, cycles_per_tick=cycles_per_tick)
+        machines = [Chip8(seed=5 + i, cycles_per_tick=cycles_per_tick) for i in range(count)]
+        load(batch, program)
+        errors = []
+        for i, machine in enumerate(machines):
+            machine.key[i] = batch.key[i, i] = 1
+            load(machine, program)
+            errors.append(run(machine, 1500))
+        batch.run(1500)
+        for i, machine in enumerate(machines):
+            assert_same_state(machine, batch.machine(i))
+            assert errors[i] == (repr(batch.errors[i]) if i in batch.errors else None), i
+            assert batch.halted[i] == bool(errors[i])
+
+
+# idle loops get skipped instead of run, ending up where running them would
+def test_idle_loops():
+    memory = lambda code: bytes.fromhex(code).ljust(MAX_MEMORY, b"\0")
+    assert find_idle_loop(memory("1000"), 0) == (IDLE_FOREVER, 1)
+    assert find_idle_loop(memory("f30ae3a11002"), 2) == (IDLE_FOREVER, 2)
+    assert find_idle_loop(memory("f40734001000"), 0) == (IDLE_DELAY, 3)
+    assert find_idle_loop(memory("f40735001000"), 0) is None  # SE on another register
+    assert find_idle_loop(memory("e39e1202"), 0) is None  # jumps somewhere else
+
+    # waits for the delay timer, then a key, then spins
+    program = [0x60FF, 0xF015, 0xF107, 0x3100, 0x1204, 0xF20A, 0x120C]
+    for cycles_per_tick in [1, 4]:
+        interpreted = Chip8(translate=False, cycles_per_tick=cycles_per_tick)
+        translated = Chip8(cycles_per_tick=cycles_per_tick)
+        for machine in [interpreted, translated]:
+            machine.load_instructions(program)
+            machine.run(255 * cycles_per_tick + 5000)
+        assert_same_state(interpreted, translated)
+        assert translated.program_counter == 0x20A and translated.delay_timer == 0
+        assert translated.skipped_cycles > 255 * cycles_per_tick + 4000
+
+        interpreted.key[7] = translated.key[7] = 1
+        interpreted.run(1000)
+        translated.run(1000)
+        assert_same_state(interpreted, translated)
+        assert translated.program_counter == 0x20C and translated.reg[2] == 7
+
+
+def test_block_cache():
+    to_test = Chip8()
+    to_test.load_instructions([0xA20A, 0x6012, 0x6134, 0xF155, 0x120A, 0x6007])
+
+    to_test.program_counter = 0x208
+    to_test.run(2)  # JMP, LD v0 7 as one block, which stops in front of the SYS after it
+    assert (to_test.program_counter, to_test.reg[0]) == (0x20C, 0x07)
+    assert (to_test.blocks.hits, to_test.blocks.misses, to_test.blocks.invalidations) == (0, 1, 0)
+
+    to_test.program_counter = 0x200
+    to_test.run(4)  # ends with the STR, which overwrites the LD v0 7 with JMP 0x234
+    assert to_test.memory[0x20A:0x20C] == bytes([0x12, 0x34])
+    assert (to_test.blocks.hits, to_test.blocks.misses, to_test.blocks.invalidations) == (0, 2, 1)
+
+    to_test.program_counter = 0x200
+    to_test.run(4)
+    to_test.run(2)  # the JMP at 0x208 now goes on to the rewritten JMP
+    assert to_test.program_counter == 0x234
+    assert (to_test.blocks.hits, to_test.blocks.misses, to_test.blocks.invalidations) == (1, 3, 1)
+
+
+# only rows that really changed since the last frame come out of frame_diff, and the packed diff rebuilds the screen
+def test_frame_diff():
+    to_test = Chip8()
+    to_test.load_instructions([0x6002, 0x611E, 0xD015, 0x00E0, 0xD015, 0xD013])
+    to_test.run(3)
+    assert to_test.dirty_rows == 0b11 << 30 | 0b111
+    diff = to_test.frame_diff()
+    assert [y for y, row in diff] == [0, 1, 2, 30, 31] and diff[-1] == (31, 0x90 << 54)
+    assert to_test.dirty_rows == 0 and to_test.frame_diff() == []
+
+    to_test.run(2)  # cleared and drawn again the same
+    assert to_test.dirty_rows == ALL_ROWS and to_test.frame_diff() == []
+
+    to_test.run(1)  # the top 3 rows of the sprite get erased
+    diff = to_test.frame_diff()
+    assert [y for y, row in diff] == [0, 30, 31]
+    screen = [0] * GRAPHICS_HEIGHT
+    applied = apply_frame_diff(screen, pack_frame_diff(diff))
+    assert applied == [y for y, row in diff] and [screen[y] for y in applied] == [to_test.screen[y] for y in applied]
+    assert len(pack_frame_diff(diff)) == 4 + 8 * len(diff)
+
+
+# the timers count down once a tick, a real time run waits for absolute deadlines, and turbo runs the same as real time
+def test_scheduler():
+    from scheduler import Scheduler, TICKS_PER_SECOND, MAX_LAG
+
+    to_test = Chip8(cycles_per_tick=4)
+    to_test.load_instructions([0x6005, 0xF015, 0xF107, 0x1204])
+    to_test.run(2)
+    to_test.run(5)  # LDD reads 5 before the first tick ends, and 4 after
+    assert (to_test.delay_timer, to_test.reg[1]) == (4, 4)
+    to_test.run(20)
+    assert (to_test.cycles, to_test.delay_timer, to_test.reg[1]) == (27, 0, 0)
+
+    now, sleeps = [0.0], []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    realtime = Scheduler(Chip8(seed=2, cycles_per_tick=10), clock=lambda: now[0], sleep=sleep)
+    turbo = Scheduler(Chip8(seed=2, cycles_per_tick=10), realtime=False)
+    for scheduler in realtime, turbo:
+        load(scheduler.machine, PROGRAMS[-1])
+    realtime.run(3, on_tick=lambda machine: now.__setitem__(0, now[0] + 0.001))  # each tick takes 1ms
+    assert [round(seconds * 1000, 3) for seconds in sleeps] == [round(1000 / TICKS_PER_SECOND - 1, 3)] * 2
+    now[0] += MAX_LAG + 1  # stalled, so it starts again from now instead of catching up
+    realtime.run_for(0.5)
+    turbo.run(3)
+    turbo.run_for(0.5)
+    assert realtime.resyncs == 1 and realtime.ticks == turbo.ticks == 33 and turbo.seconds == 33 / TICKS_PER_SECOND
+    assert_same_state(turbo.machine, realtime.machine)
+
+
+# the profiled run counts every instruction where it ran, and leaves the machine as a plain run would
+def test_profiler():
+    from profiler import Profile, run_profiled, report
+
+    program = [0x6003, 0x2208, 0x7001, 0x1202, 0x220C, 0x00EE, 0x00EE]
+    to_test, expected = Chip8(seed=1, translate=False), Chip8(seed=1)
+    to_test.load_instructions(program)
+    expected.load_instructions(program)
+    profile = run_profiled(to_test, 10)
+    run_profiled(to_test, 10, profile)
+    expected.run(20)
+    assert_same_state(expected, to_test)
+
+    assert profile.cycles == 20 and sum(profile.op_codes) == sum(profile.addresses) == sum(profile.depths) == 20
+    assert (profile.addresses[0x202], profile.calls, profile.returns, profile.max_depth) == (4, 7, 6, 2)
+    assert profile.class_counts()[:2] == [("CallFunction", 7), ("ReturnFromFunction", 6)]
+    assert profile.hot_addresses(1) == [(0x202, 4)]
+    assert "0x202\tCALL\ta0x208" in report(profile, to_test.memory)
+
+
+# restoring a snapshot has to rewind the machine to exactly where it was, so running on from it gives the same states
+# (including RNG and translated code that was overwritten since), and a round trip through bytes changes nothing
+def test_snapshots():
+    import snapshot
+
+    for program in PROGRAMS:
+        to_test, expected = Chip8(seed=7), Chip8(seed=7, translate=False)
+        load(to_test, program)
+        load(expected, program)
+        run(to_test, 300)
+        run(expected, 300)
+        saved = snapshot.snapshot(to_test)
+        assert snapshot.from_bytes(snapshot.to_bytes(saved)) == saved
+        assert snapshot.from_bytes(snapshot.to_bytes(saved, compress=False)) == saved
+
+        error = run(to_test, 700)
+        snapshot.restore(to_test, snapshot.from_bytes(snapshot.to_bytes(saved)))
+        to_test.dirty_rows = expected.dirty_rows  # restore leaves every row dirty
+        assert_same_state(expected, to_test)
+        assert error == run(to_test, 700) == run(expected, 700), error
+        assert_same_state(expected, to_test)
+
+        # the C struct doesn't have the cycle count or the RNG state
+        converted = snapshot.from_c_struct(snapshot.to_c_struct(saved))
+        assert converted.replace(cycles=saved.cycles, random_state=saved.random_state) == saved
+
+
+def test_snapshot_pages():
+    import snapshot
+
+    to_test = Chip8()
+    to_test.load_instructions([0xA300, 0x6042, 0xF055, 0x1206])
+    first = snapshot.snapshot(to_test)
+    to_test.run(3)
+    second = snapshot.snapshot(to_test, base=first)
+    assert [a is b for a, b in zip(first.pages, second.pages)] == [page != 3 for page in range(snapshot.PAGES)]
+    assert second.memory[0x300] == 0x42 and first.memory[0x300] == 0
+
+    # snapshots share pages, so none of them can be changed in place
+    for name in ["pages", "reg"]:
+        try:
+            setattr(second, name, first.pages)
+            assert False, "{} of a snapshot was changed".format(name)
+        except AttributeError:
+            pass
+    assert second.replace(cycles=7).pages is second.pages and second.cycles != 7
+
+    invalidations = to_test.blocks.invalidations
+    snapshot.restore(to_test, first)
+    assert to_test.memory == first.memory and to_test.program_counter == 0x200 and to_test.reg[0] == 0
+    assert to_test.blocks.invalidations == invalidations  # page 3 has no translated code under it
+
+    c_struct = snapshot.to_c_struct(first)
+    for data in [b"", b"CH8S\x02\x00", b"CH8S\x01\x01" + bytes(10), snapshot.to_bytes(first, False)[:-1], c_struct]:
+        try:
+            snapshot.from_bytes(data)
+            assert False, data
+        except snapshot.SnapshotException:
+            pass
+
+    # C save states have the same header, then the struct's size: a bad magic, version, flags or size is rejected
+    assert c_struct[:10] == b"CH8S\x01\x04" + snapshot.C_STRUCT.size.to_bytes(4, "little")
+    for data in [c_struct[:-1], c_struct + b"\x00", snapshot.to_bytes(first, False)] + [
+        c_struct[:i] + bytes([c_struct[i] ^ 0x10]) + c_struct[i + 1 :] for i in range(10)
+    ]:
+        try:
+            snapshot.from_c_struct(data)
+            assert False, data[:10]
+        except snapshot.SnapshotException:
+            pass
+
+
+if __name__ == "__main__":
+    tests = [value for name, value in list(globals().items()) if name.startswith("test_")]
+    for test in tests:
+        test()
+        print("passed:\t{}".format(test.__name__))
+    print("All test cases passed")
@@ -40,6 +40,7 @@ Chip8 *initChip8() {
   out->soundTimer = 0;
 
   out->drawFlag = false;
+  out->dirtyRows = 0;
 
   for (int i = 0; i < FONT_SIZE; i++) {
     out->memory[i + FONT_OFFSET] = chip8_fontset[i];
@@ -56,6 +57,11 @@ void loadInstructions(Chip8 *chip8, opcode *opcodes, int size) {
 }
 
 void emulateCycle(Chip8 *chip8) {
+  executeInstruction(chip8);
+  updateTimers(chip8);
+}
+
+void executeInstruction(Chip8 *chip8) {
 
   // fetch opcode. The opcode is 2 bytes, so need to shift and then or
   opcode oc = chip8->memory[chip8->programCounter] << 8 |
@@ -75,6 +81,7 @@ void emulateCycle(Chip8 *chip8) {
       for (int i = 0; i < GRAPHICS_WIDTH * GRAPHICS_HEIGHT; i++) {
         chip8->graphics[i] = 0;
       }
+      chip8->dirtyRows = ALL_ROWS;
       chip8->drawFlag = true;
       chip8->programCounter += 2;
     } else { // (0x0NNN) Call RCA 1802 at NNN. Not needed for most ROMs, so just
@@ -194,13 +201,18 @@ void emulateCycle(Chip8 *chip8) {
     memory pixel;
     for (int yline = 0; yline < height; yline++) {
       pixel = chip8->memory[chip8->indexCounter + yline];
+      if (pixel != 0) {
+        chip8->dirtyRows |= 1u << ((y + yline) % GRAPHICS_HEIGHT);
+      }
       for (int xline = 0; xline < 8; xline++) {
         if ((pixel & (0x80 >> xline)) != 0) {
-          if (chip8->graphics[((x + xline) % GRAPHICS_WIDTH +
-                               (((y + yline) % GRAPHICS_HEIGHT) * 64))] == 1) {
+          // the same wrapped position for the collision check and the write
+          int position = (x + xline) % GRAPHICS_WIDTH +
+                         ((y + yline) % GRAPHICS_HEIGHT) * GRAPHICS_WIDTH;
+          if (chip8->graphics[position] == 1) {
             chip8->reg[0xf] = 1;
           }
-          chip8->graphics[x + xline + ((y + yline) * 64)] ^= 1;
+          chip8->graphics[position] ^= 1;
         }
       }
     }
@@ -291,17 +303,25 @@ void emulateCycle(Chip8 *chip8) {
     printf("Unknown opcode %.4x \n", oc);
     exit(EXIT_FAILURE);
   }
+}
 
-  // update timers
+void updateTimers(Chip8 *chip8) {
   if (chip8->delayTimer > 0) {
     --chip8->delayTimer;
   }
   if (chip8->soundTimer > 0) {
     if (chip8->soundTimer == 1) {
-      printf("\a"); // Beep control character}
-      --chip8->soundTimer;
+      printf("\a"); // Beep control character
     }
+    --chip8->soundTimer;
+  }
+}
+
+void runTick(Chip8 *chip8, int cyclesPerTick) {
+  for (int i = 0; i < cyclesPerTick; i++) {
+    executeInstruction(chip8);
   }
+  updateTimers(chip8);
 }
 
 void print(Chip8 *chip8, bool printMem, bool printReg, bool printStack) {
@@ -338,3 +358,60 @@ void print(Chip8 *chip8, bool printMem, bool printReg, bool printStack) {
 
   printf("\n");
 }
+
+int frameDiff(Chip8 *chip8, unsigned long long presented[GRAPHICS_HEIGHT],
+              unsigned char changed[GRAPHICS_HEIGHT]) {
+  int count = 0;
+  for (int y = 0; y < GRAPHICS_HEIGHT; y++) {
+    if (chip8->dirtyRows & (1u << y)) {
+      unsigned long long row = 0;
+      for (int x = 0; x < GRAPHICS_WIDTH; x++) {
+        row = row << 1 | chip8->graphics[y * GRAPHICS_WIDTH + x];
+      }
+      if (row != presented[y]) {
+        presented[y] = row;
+        changed[count++] = y;
+      }
+    }
+  }
+  chip8->dirtyRows = 0;
+  return count;
+}
+
+Chip8 *copyChip8(Chip8 *chip8) {
+  Chip8 *out = malloc(sizeof(Chip8));
+  memcpy(out, chip8, sizeof(Chip8));
+  return out;
+}
+
+void saveState(Chip8 *chip8, FILE *fp) {
+  fwrite(STATE_MAGIC, 1, 4, fp);
+  fputc(STATE_VERSION, fp);
+  fputc(STATE_FLAG_C_STRUCT, fp);
+  for (int i = 0; i < 4; i++) {
+    fputc((sizeof(Chip8) >> (8 * i)) & 0xFF, fp);
+  }
+  fwrite(chip8, sizeof(Chip8), 1, fp);
+}
+
+bool loadState(Chip8 *chip8, FILE *fp) {
+  unsigned char header[10];
+  if (fread(header, 1, 10, fp) != 10 || memcmp(header, STATE_MAGIC, 4) != 0 ||
+      header[4] != STATE_VERSION || header[5] != STATE_FLAG_C_STRUCT) {
+    return false;
+  }
+  unsigned long size = 0;
+  for (int i = 0; i < 4; i++) {
+    size |= (unsigned long)header[6 + i] << (8 * i);
+  }
+  if (size != sizeof(Chip8)) {
+    return false;
+  }
+  Chip8 state;
+  if (fread(&state, sizeof(Chip8), 1, fp) != 1) {
+    return false;
+  }
+  memcpy(chip8, &state, sizeof(Chip8));
+  chip8->dirtyRows = ALL_ROWS; // the screen changed under whatever presented it
+  return true;
+}
@@ -1,6 +1,8 @@
 #ifndef CHIP_8_H
 #define CHIP_8_H
 
+#include <stdio.h>
+
 #include "defs.h"
 
 typedef struct {
@@ -18,14 +20,44 @@ typedef struct {
   memory graphics[GRAPHICS_WIDTH * GRAPHICS_HEIGHT];
   key key[KEYS];
   bool drawFlag;
+  unsigned int dirtyRows; // bit y is set when graphics row y may have changed
 } Chip8;
 
 Chip8 *initChip8(); // Constructor
 
 void loadInstructions(Chip8 *chip8, opcode *opcodes, int size);
 
-void emulateCycle(Chip8 *chip8);
+void emulateCycle(Chip8 *chip8); // executeInstruction then updateTimers
+
+void executeInstruction(Chip8 *chip8);
+
+void updateTimers(Chip8 *chip8); // one 60 Hz tick
+
+// cyclesPerTick instructions, then the timers count down once
+void runTick(Chip8 *chip8, int cyclesPerTick);
 
 void print(Chip8 *chip8, bool printMem, bool printReg, bool printStack);
 
+// Puts the rows that changed since the last call in presented (the screen as
+// last presented, one row per entry with the leftmost pixel in the highest
+// bit) and their indices in changed, in order. Returns how many changed
+int frameDiff(Chip8 *chip8, unsigned long long presented[GRAPHICS_HEIGHT],
+              unsigned char changed[GRAPHICS_HEIGHT]);
+
+// Save states are "CH8S", the version and the flags (1 byte each, the same
+// header python/snapshot.py writes), the size of the struct (4 bytes, little
+// endian), then the struct as is, so taking or restoring one is a single copy.
+// STATE_FLAG_C_STRUCT tells them apart from python's own save states
+#define STATE_MAGIC "CH8S"
+#define STATE_VERSION 1
+#define STATE_FLAG_C_STRUCT 0x4
+
+Chip8 *copyChip8(Chip8 *chip8);
+
+void saveState(Chip8 *chip8, FILE *fp);
+
+// false, leaving chip8 as it was, if fp didn't have a full state or its
+// magic, version, flags or struct size aren't the ones saveState writes
+bool loadState(Chip8 *chip8, FILE *fp);
+
 #endif // CHIP_8_H
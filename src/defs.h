@@ -11,8 +11,10 @@
 #define KEYS 16
 #define GRAPHICS_WIDTH 64
 #define GRAPHICS_HEIGHT 32
+#define ALL_ROWS 0xFFFFFFFFu // dirtyRows with every row set
 
-#define SLEEP_TIME_MS 16 // Refresh at 60 times/second
+#define TICKS_PER_SECOND 60 // the timers count down at 60 Hz
+#define CYCLES_PER_TICK 10  // 600 instructions a second by default
 
 #define MEM_START 0x00
 #define INTERPRETER_END 0x1FF
@@ -1,9 +1,12 @@
 #include <stdio.h>
 #include <stdlib.h>
+#include <string.h>
 #include <time.h>
 
 #include "chip8.h"
 #include "defs.h"
+#include "replay.h"
+#include "scheduler.h"
 
 #include "SDL2/SDL.h"
 
@@ -15,8 +18,10 @@ key keyMap[KEYS] = {SDLK_1, SDLK_2, SDLK_3, SDLK_4, SDLK_q, SDLK_w,
                     SDLK_z, SDLK_x, SDLK_c, SDLK_v};
 
 void loadRom(Chip8 *chip8, int argc, char **argv) {
-  if (argc != 2) {
-    printf("1st argument must be path to rom\n");
+  if (argc < 2) {
+    printf("usage: %s rom [--speed INSTRUCTIONS_PER_TICK] [--turbo] "
+           "[--seed N] [--record FILE | --replay FILE]\n",
+           argv[0]);
     exit(EXIT_FAILURE);
   }
   FILE *fp;
@@ -53,13 +58,99 @@ void loadRom(Chip8 *chip8, int argc, char **argv) {
   free(romBuffer);
 }
 
+// the value after option in argv, or NULL
+char *getOption(int argc, char **argv, char *option) {
+  for (int i = 2; i + 1 < argc; i++) {
+    if (strcmp(argv[i], option) == 0) {
+      return argv[i + 1];
+    }
+  }
+  return NULL;
+}
+
+bool hasFlag(int argc, char **argv, char *flag) {
+  for (int i = 2; i < argc; i++) {
+    if (strcmp(argv[i], flag) == 0) {
+      return true;
+    }
+  }
+  return false;
+}
+
+double realTime() {
+  return (double)SDL_GetPerformanceCounter() / SDL_GetPerformanceFrequency();
+}
+
+FILE *openFile(char *path, char *mode) {
+  FILE *fp = fopen(path, mode);
+  if (fp == NULL) {
+    printf("Failed to open: %s\n", path);
+    exit(EXIT_FAILURE);
+  }
+  return fp;
+}
+
+// runs a recording headless, as fast as it goes
+int runReplay(Chip8 *chip8, char *path) {
+  FILE *fp = openFile(path, "rb");
+  unsigned long cycles;
+  clock_t start = clock();
+  replayResult result = replay(chip8, fp, &cycles);
+  double seconds = (double)(clock() - start) / CLOCKS_PER_SEC;
+  fclose(fp);
+
+  switch (result) {
+  case REPLAY_OK:
+    printf("Replayed %lu cycles in %.2fs\n", cycles, seconds);
+    return EXIT_SUCCESS;
+  case REPLAY_BAD_FILE:
+    printf("Not a recording, or the recording is cut off: %s\n", path);
+    break;
+  case REPLAY_WRONG_ROM:
+    printf("The recording was made with a different rom\n");
+    break;
+  case REPLAY_MISMATCH:
+    printf("Framebuffer differs from the recording at cycle %lu\n", cycles);
+    break;
+  }
+  return EXIT_FAILURE;
+}
+
 int main(int argc, char **argv) {
   Chip8 *chip8 = initChip8();
 
-  srand(time(0)); // set rand seed
-
   loadRom(chip8, argc, argv);
 
+  char *replayPath = getOption(argc, argv, "--replay");
+  if (replayPath != NULL) {
+    return runReplay(chip8, replayPath);
+  }
+
+  // set rand seed, printed so a session can be run again with --seed
+  char *seedOption = getOption(argc, argv, "--seed");
+  unsigned int seed =
+      seedOption != NULL ? strtoul(seedOption, NULL, 0) : time(0);
+  srand(seed);
+  printf("Seed: %u\n", seed);
+
+  char *speedOption = getOption(argc, argv, "--speed");
+  int cyclesPerTick =
+      speedOption != NULL ? atoi(speedOption) : CYCLES_PER_TICK;
+  if (cyclesPerTick < 1) {
+    printf("--speed must be at least 1\n");
+    exit(EXIT_FAILURE);
+  }
+  Scheduler scheduler;
+  initScheduler(&scheduler, cyclesPerTick, hasFlag(argc, argv, "--turbo"));
+
+  Recorder recorder;
+  char *recordPath = getOption(argc, argv, "--record");
+  if (recordPath != NULL) {
+    startRecording(&recorder, openFile(recordPath, "wb"), chip8, seed,
+                   cyclesPerTick);
+  }
+  unsigned long cycle = 0;
+
   print(chip8, true, true, true);
 
   // Initialize SDL
@@ -73,21 +164,36 @@ int main(int argc, char **argv) {
       renderer, SDL_PIXELFORMAT_ARGB8888, SDL_TEXTUREACCESS_STREAMING, 64, 32);
   SDL_RenderClear(renderer);
 
+  // the screen as last uploaded to the texture, only rows that changed since
+  // then get converted and uploaded again
   uint32_t pixels[GRAPHICS_WIDTH * GRAPHICS_HEIGHT];
+  unsigned long long presented[GRAPHICS_HEIGHT] = {0};
+  unsigned char changed[GRAPHICS_HEIGHT];
+  for (int i = 0; i < GRAPHICS_WIDTH * GRAPHICS_HEIGHT; ++i) {
+    pixels[i] = 0xFF000000;
+  }
+  SDL_UpdateTexture(sdlTexture, NULL, pixels, 64 * sizeof(Uint32));
 
   while (true) {
-    emulateCycle(chip8);
+    double wait = timeUntilTick(&scheduler, realTime());
+    if (wait > 0) {
+      SDL_Delay(wait * 1000);
+    }
+    tick(&scheduler, chip8);
+    cycle += cyclesPerTick;
 
     SDL_Event e;
     while (SDL_PollEvent(&e)) {
-      if (e.type == SDL_QUIT) {
+      if (e.type == SDL_QUIT ||
+          (e.type == SDL_KEYDOWN && e.key.keysym.sym == SDLK_ESCAPE)) {
+        if (recordPath != NULL) {
+          recordCheckpoint(&recorder, chip8, cycle);
+          fclose(recorder.fp);
+        }
         exit(0);
       }
       // Process keydown events
       if (e.type == SDL_KEYDOWN) {
-        if (e.key.keysym.sym == SDLK_ESCAPE) {
-          exit(0);
-        }
 
         for (int i = 0; i < KEYS; ++i) {
           if (e.key.keysym.sym == keyMap[i]) {
@@ -104,24 +210,40 @@ int main(int argc, char **argv) {
       }
     }
 
+    if (recordPath != NULL) {
+      recordKeys(&recorder, chip8, cycle);
+      if (scheduler.ticks % CHECKPOINT_TICKS == 0) {
+        recordCheckpoint(&recorder, chip8, cycle);
+      }
+    }
+
     if (chip8->drawFlag == true) {
       chip8->drawFlag = false;
 
-      // Store pixels in temporary buffer
-      for (int i = 0; i < GRAPHICS_WIDTH * GRAPHICS_HEIGHT; ++i) {
-        memory pixel = chip8->graphics[i];
-        pixels[i] = (0x00FFFFFF * pixel) | 0xFF000000;
+      // Store the changed rows in temporary buffer
+      int count = frameDiff(chip8, presented, changed);
+      for (int i = 0; i < count; ++i) {
+        uint32_t *row = pixels + changed[i] * GRAPHICS_WIDTH;
+        for (int x = 0; x < GRAPHICS_WIDTH; ++x) {
+          memory pixel =
+              (presented[changed[i]] >> (GRAPHICS_WIDTH - 1 - x)) & 1;
+          row[x] = (0x00FFFFFF * pixel) | 0xFF000000;
+        }
       }
 
-      // Update SDL texture
-      SDL_UpdateTexture(sdlTexture, NULL, pixels, 64 * sizeof(Uint32));
+      // Update SDL texture, from the first to the last changed row
+      if (count > 0) {
+        SDL_Rect rect = {0, changed[0], GRAPHICS_WIDTH,
+                         changed[count - 1] - changed[0] + 1};
+        SDL_UpdateTexture(sdlTexture, &rect,
+                          pixels + changed[0] * GRAPHICS_WIDTH,
+                          64 * sizeof(Uint32));
+      }
       // Clear screen and render
       SDL_RenderClear(renderer);
       SDL_RenderCopy(renderer, sdlTexture, NULL, NULL);
       SDL_RenderPresent(renderer);
     }
-
-    // SDL_Delay(SLEEP_TIME_MS);
   }
   return 0;
 }
@@ -0,0 +1,151 @@
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+
+#include "chip8.h"
+#include "defs.h"
+#include "replay.h"
+
+unsigned int hashBytes(const unsigned char *bytes, int size) {
+  unsigned int hash = 2166136261u;
+  for (int i = 0; i < size; i++) {
+    hash = (hash ^ bytes[i]) * 16777619u;
+  }
+  return hash;
+}
+
+static unsigned short keyMask(Chip8 *chip8) {
+  unsigned short keys = 0;
+  for (int i = 0; i < KEYS; i++) {
+    keys |= (chip8->key[i] != 0) << i;
+  }
+  return keys;
+}
+
+static void writeInt(FILE *fp, unsigned int value, int size) {
+  for (int i = 0; i < size; i++) {
+    fputc((value >> (8 * i)) & 0xFF, fp);
+  }
+}
+
+static bool readInt(FILE *fp, unsigned int *value, int size) {
+  *value = 0;
+  for (int i = 0; i < size; i++) {
+    int c = fgetc(fp);
+    if (c == EOF) {
+      return false;
+    }
+    *value |= (unsigned int)c << (8 * i);
+  }
+  return true;
+}
+
+static void writeVarint(FILE *fp, unsigned long value) {
+  while (value >= 0x80) {
+    fputc((value & 0x7F) | 0x80, fp);
+    value >>= 7;
+  }
+  fputc(value, fp);
+}
+
+static bool readVarint(FILE *fp, unsigned long *value) {
+  *value = 0;
+  for (int shift = 0; shift < 64; shift += 7) {
+    int c = fgetc(fp);
+    if (c == EOF) {
+      return false;
+    }
+    *value |= (unsigned long)(c & 0x7F) << shift;
+    if (!(c & 0x80)) {
+      return true;
+    }
+  }
+  return false;
+}
+
+static void writeEvent(Recorder *recorder, int type, unsigned long cycle) {
+  fputc(type, recorder->fp);
+  writeVarint(recorder->fp, cycle - recorder->cycle);
+  recorder->cycle = cycle;
+}
+
+void startRecording(Recorder *recorder, FILE *fp, Chip8 *chip8,
+                    unsigned int seed, int cyclesPerTick) {
+  recorder->fp = fp;
+  recorder->cycle = 0;
+  recorder->keys = 0;
+
+  fwrite(RECORDING_MAGIC, 1, 4, fp);
+  fputc(RECORDING_VERSION, fp);
+  writeInt(fp, seed, 4);
+  writeInt(fp, hashBytes(chip8->memory, MAX_MEMORY), 4);
+  writeInt(fp, cyclesPerTick, 4);
+  recordKeys(recorder, chip8, 0); // keys held from the start
+}
+
+void recordKeys(Recorder *recorder, Chip8 *chip8, unsigned long cycle) {
+  unsigned short keys = keyMask(chip8);
+  if (keys != recorder->keys) {
+    writeEvent(recorder, EVENT_KEYS, cycle);
+    writeInt(recorder->fp, keys, 2);
+    recorder->keys = keys;
+  }
+}
+
+void recordCheckpoint(Recorder *recorder, Chip8 *chip8, unsigned long cycle) {
+  writeEvent(recorder, EVENT_CHECKPOINT, cycle);
+  writeInt(recorder->fp, hashBytes(chip8->graphics, sizeof(chip8->graphics)),
+           4);
+}
+
+replayResult replay(Chip8 *chip8, FILE *fp, unsigned long *cycles) {
+  char magic[4];
+  unsigned int seed, romHash, cyclesPerTick;
+  *cycles = 0;
+  if (fread(magic, 1, 4, fp) != 4 || memcmp(magic, RECORDING_MAGIC, 4) != 0) {
+    return REPLAY_BAD_FILE;
+  }
+  if (fgetc(fp) != RECORDING_VERSION || !readInt(fp, &seed, 4) ||
+      !readInt(fp, &romHash, 4) || !readInt(fp, &cyclesPerTick, 4) ||
+      cyclesPerTick == 0) {
+    return REPLAY_BAD_FILE;
+  }
+  if (romHash != hashBytes(chip8->memory, MAX_MEMORY)) {
+    return REPLAY_WRONG_ROM;
+  }
+  srand(seed);
+
+  int type;
+  while ((type = fgetc(fp)) != EOF) {
+    unsigned long delta;
+    unsigned int value;
+    if (!readVarint(fp, &delta)) {
+      return REPLAY_BAD_FILE;
+    }
+    for (unsigned long end = *cycles + delta; *cycles < end;) {
+      executeInstruction(chip8);
+      if (++*cycles % cyclesPerTick == 0) {
+        updateTimers(chip8);
+      }
+    }
+
+    if (type == EVENT_KEYS) {
+      if (!readInt(fp, &value, 2)) {
+        return REPLAY_BAD_FILE;
+      }
+      for (int i = 0; i < KEYS; i++) {
+        chip8->key[i] = (value >> i) & 1;
+      }
+    } else if (type == EVENT_CHECKPOINT) {
+      if (!readInt(fp, &value, 4)) {
+        return REPLAY_BAD_FILE;
+      }
+      if (value != hashBytes(chip8->graphics, sizeof(chip8->graphics))) {
+        return REPLAY_MISMATCH;
+      }
+    } else {
+      return REPLAY_BAD_FILE;
+    }
+  }
+  return REPLAY_OK;
+}
@@ -0,0 +1,55 @@
+#ifndef REPLAY_H
+#define REPLAY_H
+
+#include <stdio.h>
+
+#include "chip8.h"
+#include "defs.h"
+
+// A recording is the rand() seed of a session plus every change to the keys,
+// stamped with the number of cycles run before it, so running it again gives
+// the same session. Checkpoints hold a hash of the framebuffer to check that
+// it does.
+//
+// Format: "CH8R", version (1 byte), seed, hash of memory after the rom was
+// loaded and cycles per tick (4 bytes each, little endian), then events until
+// the end of the file: the event type (1 byte), the cycles since the last
+// event (LEB128 varint), then the keys (2 bytes, bit i is key i) or the
+// framebuffer hash (4 bytes)
+#define RECORDING_MAGIC "CH8R"
+#define RECORDING_VERSION 1
+#define CHECKPOINT_TICKS 600
+
+#define EVENT_KEYS 0
+#define EVENT_CHECKPOINT 1
+
+typedef struct {
+  FILE *fp;
+  unsigned long cycle;  // cycle of the last event written
+  unsigned short keys;  // keys as of the last event written
+} Recorder;
+
+typedef enum {
+  REPLAY_OK,
+  REPLAY_BAD_FILE,  // not a recording, or cut off in the middle of an event
+  REPLAY_WRONG_ROM, // memory didn't match the recording before the first cycle
+  REPLAY_MISMATCH   // a checkpoint didn't match, at the cycle it was taken
+} replayResult;
+
+unsigned int hashBytes(const unsigned char *bytes, int size); // FNV-1a
+
+// call after the rom is loaded and before the first cycle
+void startRecording(Recorder *recorder, FILE *fp, Chip8 *chip8,
+                    unsigned int seed, int cyclesPerTick);
+
+// writes an event if the keys changed since the last one
+void recordKeys(Recorder *recorder, Chip8 *chip8, unsigned long cycle);
+
+void recordCheckpoint(Recorder *recorder, Chip8 *chip8, unsigned long cycle);
+
+// runs a recording on chip8 (with the rom loaded and nothing run yet) as fast
+// as it goes, seeding rand() from it. cycles is set to the cycles run, which is
+// the cycle of the checkpoint that didn't match for REPLAY_MISMATCH
+replayResult replay(Chip8 *chip8, FILE *fp, unsigned long *cycles);
+
+#endif // REPLAY_H
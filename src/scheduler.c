@@ -0,0 +1,33 @@
+#include "scheduler.h"
+#include "chip8.h"
+#include "defs.h"
+
+void initScheduler(Scheduler *scheduler, int cyclesPerTick, bool turbo) {
+  scheduler->cyclesPerTick = cyclesPerTick;
+  scheduler->turbo = turbo;
+  scheduler->ticks = 0;
+  scheduler->start = 0;
+  scheduler->started = false;
+  scheduler->resyncs = 0;
+}
+
+double timeUntilTick(Scheduler *scheduler, double now) {
+  if (scheduler->turbo) {
+    return 0;
+  }
+  double elapsed = (double)scheduler->ticks / TICKS_PER_SECOND;
+  if (!scheduler->started || now - (scheduler->start + elapsed) > MAX_LAG) {
+    if (scheduler->started) {
+      scheduler->resyncs++;
+    }
+    scheduler->start = now - elapsed;
+    scheduler->started = true;
+  }
+  double wait = scheduler->start + elapsed - now;
+  return wait > 0 ? wait : 0;
+}
+
+void tick(Scheduler *scheduler, Chip8 *chip8) {
+  runTick(chip8, scheduler->cyclesPerTick);
+  scheduler->ticks++;
+}
@@ -0,0 +1,31 @@
+#ifndef SCHEDULER_H
+#define SCHEDULER_H
+
+#include "chip8.h"
+#include "defs.h"
+
+// Runs a chip8 on a virtual clock of TICKS_PER_SECOND ticks per emulated
+// second, cyclesPerTick instructions per tick, with the timers counting down
+// once a tick. Each tick is due at start + ticks / TICKS_PER_SECOND, a fixed
+// deadline, so waits that wake up late don't add up. Turbo runs the ticks back
+// to back. The chip8 only sees ticks either way, so roms run the same
+#define MAX_LAG 0.25 // seconds behind before the deadlines restart from now
+
+typedef struct {
+  int cyclesPerTick;
+  bool turbo;
+  unsigned long ticks;   // ticks run so far, the virtual clock
+  double start;          // real time (in seconds) tick 0 was due
+  bool started;          // false until the first call to timeUntilTick
+  unsigned long resyncs; // times it fell more than MAX_LAG behind
+} Scheduler;
+
+void initScheduler(Scheduler *scheduler, int cyclesPerTick, bool turbo);
+
+// seconds to wait from now (the real time in seconds) until the next tick is
+// due, 0 when it's due already or in turbo mode
+double timeUntilTick(Scheduler *scheduler, double now);
+
+void tick(Scheduler *scheduler, Chip8 *chip8);
+
+#endif // SCHEDULER_H
@@ -1,8 +1,11 @@
 #include <assert.h>
 #include <stdlib.h>
+#include <string.h>
 
 #include "../src/chip8.h"
 #include "../src/defs.h"
+#include "../src/replay.h"
+#include "../src/scheduler.h"
 
 void testReturn() {
   Chip8 *toTest = initChip8();
@@ -358,6 +361,213 @@ void testRandMask() {
   // Can't really test random value here;
 }
 
+void testDrawWraps() {
+  Chip8 *toTest = initChip8();
+
+  opcode ocs[] = {0xD015, 0xD015}; // font sprite for 0, drawn twice
+  loadInstructions(toTest, ocs, 2);
+  toTest->reg[0] = 62;
+  toTest->reg[1] = 30;
+
+  emulateCycle(toTest);
+  assert(toTest->graphics[30 * GRAPHICS_WIDTH + 62] == 1);
+  assert(toTest->graphics[30 * GRAPHICS_WIDTH + 0] == 1); // wraps to the left
+  assert(toTest->graphics[0 * GRAPHICS_WIDTH + 62] == 1); // wraps to the top
+  assert(toTest->reg[0xf] == 0);
+
+  emulateCycle(toTest); // erases it again, including the wrapped pixels
+  for (int i = 0; i < GRAPHICS_WIDTH * GRAPHICS_HEIGHT; i++) {
+    assert(toTest->graphics[i] == 0);
+  }
+  assert(toTest->reg[0xf] == 1);
+  free(toTest);
+}
+
+void testSaveState() {
+  Chip8 *toTest = initChip8();
+
+  opcode ocs[] = {0x6012, 0x2300, 0xD015};
+  loadInstructions(toTest, ocs, 3);
+  emulateCycle(toTest);
+  emulateCycle(toTest);
+  Chip8 *copy = copyChip8(toTest);
+  copy->dirtyRows = ALL_ROWS; // loading a state leaves every row dirty
+
+  FILE *fp = tmpfile();
+  saveState(toTest, fp);
+  toTest->reg[0] = 0;
+  toTest->programCounter = 0x200;
+  toTest->graphics[5] = 1;
+
+  rewind(fp);
+  assert(loadState(toTest, fp));
+  assert(memcmp(toTest, copy, sizeof(Chip8)) == 0);
+  assert(toTest->reg[0] == 0x12);
+  assert(toTest->programCounter == 0x300);
+  assert(toTest->stack[0] == 0x202);
+  assert(!loadState(toTest, fp)); // nothing left to read
+  assert(memcmp(toTest, copy, sizeof(Chip8)) == 0);
+
+  // a bad magic, version, flags or struct size is rejected, leaving toTest as
+  // it was
+  unsigned char saved[10 + sizeof(Chip8)];
+  rewind(fp);
+  assert(fread(saved, 1, sizeof(saved), fp) == sizeof(saved));
+  assert(memcmp(saved, "CH8S\x01\x04", 6) == 0);
+  for (int i = 0; i < 10; i++) {
+    FILE *bad = tmpfile();
+    saved[i] ^= 0x10;
+    fwrite(saved, 1, sizeof(saved), bad);
+    saved[i] ^= 0x10;
+    rewind(bad);
+    assert(!loadState(toTest, bad));
+    assert(memcmp(toTest, copy, sizeof(Chip8)) == 0);
+    fclose(bad);
+  }
+
+  fclose(fp);
+  free(copy);
+  free(toTest);
+}
+
+void testFrameDiff() {
+  Chip8 *toTest = initChip8();
+  unsigned long long presented[GRAPHICS_HEIGHT] = {0};
+  unsigned char changed[GRAPHICS_HEIGHT];
+
+  opcode ocs[] = {0x6002, 0x611E, 0xD015, 0x00E0, 0xD015, 0xD013};
+  loadInstructions(toTest, ocs, 6);
+  for (int i = 0; i < 3; i++) {
+    emulateCycle(toTest);
+  }
+  assert(toTest->dirtyRows == (3u << 30 | 7u));
+  assert(frameDiff(toTest, presented, changed) == 5);
+  assert(changed[0] == 0 && changed[3] == 30 && changed[4] == 31);
+  assert(presented[31] == 0x90ull << 54);
+  assert(toTest->dirtyRows == 0);
+
+  emulateCycle(toTest); // cleared and drawn again the same
+  emulateCycle(toTest);
+  assert(toTest->dirtyRows == ALL_ROWS);
+  assert(frameDiff(toTest, presented, changed) == 0);
+
+  emulateCycle(toTest); // the top 3 rows of the sprite get erased
+  assert(frameDiff(toTest, presented, changed) == 3);
+  assert(changed[0] == 0 && changed[1] == 30 && changed[2] == 31);
+  assert(presented[0] == 0 && presented[1] == 0x90ull << 54);
+  free(toTest);
+}
+
+void testScheduler() {
+  Chip8 *toTest = initChip8();
+  opcode ocs[] = {0x6005, 0xF015, 0xF107, 0x1204};
+  loadInstructions(toTest, ocs, 4);
+
+  Scheduler scheduler;
+  initScheduler(&scheduler, 4, false);
+  assert(timeUntilTick(&scheduler, 10.0) == 0); // the first tick is due now
+  tick(&scheduler, toTest);
+  assert(toTest->delayTimer == 4 && toTest->reg[1] == 5);
+  tick(&scheduler, toTest);
+  assert(toTest->delayTimer == 3 && toTest->reg[1] == 4);
+
+  // deadlines are fixed, so being late for one tick leaves less wait for
+  // the next
+  double wait = timeUntilTick(&scheduler, 10.01);
+  assert(wait > 0.0233 && wait < 0.0234);
+  assert(timeUntilTick(&scheduler, 10.04) == 0);
+  assert(timeUntilTick(&scheduler, 11.0) == 0); // too far behind, resyncs
+  assert(scheduler.resyncs == 1);
+  tick(&scheduler, toTest);
+  wait = timeUntilTick(&scheduler, 11.0);
+  assert(wait > 0.0166 && wait < 0.0167);
+
+  initScheduler(&scheduler, 4, true);
+  assert(timeUntilTick(&scheduler, 0) == 0);
+  tick(&scheduler, toTest);
+  assert(scheduler.ticks == 1);
+  free(toTest);
+}
+
+void testSoundTimer() {
+  Chip8 *toTest = initChip8();
+  opcode ocs[] = {0x6003, 0xF018, 0x1204};
+  loadInstructions(toTest, ocs, 3);
+
+  runTick(toTest, 2);
+  assert(toTest->soundTimer == 2); // set to 3, then counted down once
+  runTick(toTest, 2);
+  assert(toTest->soundTimer == 1);
+  runTick(toTest, 2);
+  assert(toTest->soundTimer == 0);
+  runTick(toTest, 2);
+  assert(toTest->soundTimer == 0);
+  free(toTest);
+}
+
+// draws random digits at random places while key 1 is held
+opcode replayProgram[] = {0x6201, 0xE29E, 0x1202, 0xC00F,
+                          0xC11F, 0xF029, 0xD015, 0x1202};
+
+void testRecordReplay() {
+  Chip8 *recorded = initChip8();
+  loadInstructions(recorded, replayProgram, 8);
+  FILE *fp = tmpfile();
+  Recorder recorder;
+  srand(1234);
+  startRecording(&recorder, fp, recorded, 1234, 5);
+
+  unsigned long cycle = 0;
+  for (; cycle < 3000; cycle += 5) {
+    recorded->key[1] = (cycle / 200) % 3 == 1;
+    recordKeys(&recorder, recorded, cycle);
+    if (cycle % 1000 == 0) {
+      recordCheckpoint(&recorder, recorded, cycle);
+    }
+    runTick(recorded, 5);
+  }
+  recordCheckpoint(&recorder, recorded, cycle);
+
+  Chip8 *replayed = initChip8();
+  loadInstructions(replayed, replayProgram, 8);
+  srand(99); // replay seeds rand itself
+  rewind(fp);
+  assert(replay(replayed, fp, &cycle) == REPLAY_OK);
+  assert(cycle == 3000);
+  assert(memcmp(replayed, recorded, sizeof(Chip8)) == 0);
+
+  // a different seed draws different sprites, so a checkpoint fails
+  free(replayed);
+  replayed = initChip8();
+  loadInstructions(replayed, replayProgram, 8);
+  rewind(fp);
+  fseek(fp, 5, SEEK_SET);
+  fputc(0x35, fp);
+  rewind(fp);
+  assert(replay(replayed, fp, &cycle) == REPLAY_MISMATCH);
+  assert(cycle % 1000 == 0 && cycle > 0);
+
+  free(replayed);
+  replayed = initChip8();
+  rewind(fp);
+  assert(replay(replayed, fp, &cycle) == REPLAY_WRONG_ROM);
+
+  fseek(fp, 4, SEEK_SET);
+  fputc(RECORDING_VERSION + 1, fp);
+  rewind(fp);
+  assert(replay(replayed, fp, &cycle) == REPLAY_BAD_FILE);
+
+  fclose(fp);
+  fp = tmpfile();
+  fputs("CH8", fp);
+  rewind(fp);
+  assert(replay(replayed, fp, &cycle) == REPLAY_BAD_FILE);
+
+  fclose(fp);
+  free(replayed);
+  free(recorded);
+}
+
 int main(int argc, char **argv) {
   testReturn();
   testClearScreen();
@@ -381,5 +591,11 @@ int main(int argc, char **argv) {
   testSetIndexCounter();
   testJumpToAddressAndReg();
   testRandMask();
+  testDrawWraps();
+  testSaveState();
+  testFrameDiff();
+  testRecordReplay();
+  testScheduler();
+  testSoundTimer();
   // TODO: test cases for draw and later
 }